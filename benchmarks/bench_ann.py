@@ -0,0 +1,72 @@
+"""
+Compare exact and approximate VectorIndex types: build time, per-query latency and recall@k.
+
+Embeddings are drawn from a Gaussian mixture in a low-dimensional latent space and
+projected up, so the data has cluster structure like real sentence embeddings. Recall is measured against the exact flat index.
+
+Usage:
+    python benchmarks/bench_ann.py --entries 200000 --queries 500 --nprobe 8,16,32 --ef-search 32,64,128
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from VectorIndex import VectorIndex
+
+def clustered_embeddings(rng, count, dim, clusters=256, latent_dim=32):
+    # Sentence embeddings have a much lower intrinsic dimension than their size,
+    # so sample clusters in a small latent space and project them up
+    rng_projection = np.random.default_rng(1)
+    centers = rng_projection.standard_normal((clusters, latent_dim), dtype=np.float32)
+    projection = rng_projection.standard_normal((latent_dim, dim), dtype=np.float32)
+    latent = centers[rng.integers(clusters, size=count)] + 0.5 * rng.standard_normal((count, latent_dim), dtype=np.float32)
+    return latent @ projection + 0.05 * rng.standard_normal((count, dim), dtype=np.float32)
+
+def measure(index, queries, truth, k):
+    start = time.perf_counter()
+    found = [index.search(query, k)[1][0] for query in queries]
+    latency = (time.perf_counter() - start) / len(queries)
+    recall = np.mean([len(set(ids) & set(expected)) / k for ids, expected in zip(found, truth)])
+    return latency, recall
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=200000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", default="8,16,32")
+    parser.add_argument("--ef-search", default="32,64,128")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    embeddings = clustered_embeddings(rng, args.entries, args.dim)
+    queries = clustered_embeddings(rng, args.queries, args.dim)
+    ids = np.arange(args.entries)
+
+    print(f"{'index':>9} {'setting':>14} {'build (s)':>10} {'latency (ms)':>13} {f'recall@{args.k}':>10}")
+    flat = VectorIndex.build(ids, embeddings, args.dim, "cosine", "flat")
+    truth = [flat.search(query, args.k)[1][0] for query in queries]
+    latency, recall = measure(flat, queries, truth, args.k)
+    print(f"{'flat':>9} {'exact':>14} {'-':>10} {latency * 1000:>13.3f} {recall:>10.3f}")
+
+    sweeps = {
+        "hnsw": ("ef_search", [int(value) for value in args.ef_search.split(",")]),
+        "ivf_flat": ("nprobe", [int(value) for value in args.nprobe.split(",")]),
+        "ivf_pq": ("nprobe", [int(value) for value in args.nprobe.split(",")]),
+    }
+    for index_type, (param, values) in sweeps.items():
+        start = time.perf_counter()
+        index = VectorIndex.build(ids, embeddings, args.dim, "cosine", index_type)
+        build_time = time.perf_counter() - start
+        for value in values:
+            index.set_search_params(**{param: value})
+            latency, recall = measure(index, queries, truth, args.k)
+            print(f"{index_type:>9} {f'{param}={value}':>14} {build_time:>10.2f} {latency * 1000:>13.3f} {recall:>10.3f}")
+
+if __name__ == "__main__":
+    main()
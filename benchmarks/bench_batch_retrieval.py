@@ -0,0 +1,58 @@
+"""
+Compare DataManager.retrieve_entries in a loop against retrieve_entries_batch.
+
+Builds a synthetic profile store in a temporary directory and times both paths
+with the query cache disabled, so every query is encoded.
+
+Usage:
+    python benchmarks/bench_batch_retrieval.py --entries 100000 --queries 256 --metric mmr
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from EmbeddingStore import EmbeddingStore
+from Operations import DataManager
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=256)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--metric", default="cosine", choices=["cosine", "l2", "mmr"])
+    parser.add_argument("--fetch-k", type=int, default=None, help="MMR candidate pool size")
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--dim", type=int, default=384, help="embedding dimension of the model")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    queries = [f"query {i} about topic {rng.integers(1000)}" for i in range(args.queries)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        store_path = os.path.join(directory, "total_profile_data")
+        EmbeddingStore(store_path).save_texts([f"entry {i}" for i in range(args.entries)], rng.standard_normal((args.entries, args.dim), dtype=np.float32))
+        with contextlib.redirect_stdout(io.StringIO()):
+            manager = DataManager(store_path, model_name=args.model, metric=args.metric, mmr_fetch_k=args.fetch_k, query_cache_size=0)
+
+            start = time.perf_counter()
+            looped = [manager.retrieve_entries(query, k=args.k) for query in queries]
+            loop_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            batched = manager.retrieve_entries_batch(queries, k=args.k)
+            batch_time = time.perf_counter() - start
+
+    print(f"entries={args.entries} queries={args.queries} metric={args.metric}")
+    print(f"loop : {loop_time:8.3f} s  {args.queries / loop_time:10.1f} queries/s")
+    print(f"batch: {batch_time:8.3f} s  {args.queries / batch_time:10.1f} queries/s  ({loop_time / batch_time:.1f}x)")
+    print(f"same results: {looped == batched}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Ingestion encoding throughput, in chunks per second, of TextProcessor with 1, 4, 8 and 16
+worker processes. Chunks are synthetic ~300-character texts like the ones TextChunker
+produces. The on-disk embedding cache is bypassed, and pool start-up is excluded from the timing.
+
+Usage:
+    python benchmarks/bench_encoding.py --chunks 20000 --workers 1,4,8,16 --batch-size 64
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from TextProcessor import TextProcessor
+from config import EMBEDDING_MODEL
+
+WORDS = "the a profile user work project team data city year travel music family study language book".split()
+
+def synthetic_chunks(count, seed=0):
+    rng = np.random.default_rng(seed)
+    chunks = []
+    for _ in range(count):
+        words = []
+        while sum(len(word) + 1 for word in words) < 300:
+            words.append(WORDS[rng.integers(len(WORDS))] + str(rng.integers(100)))
+        chunks.append(" ".join(words))
+    return chunks
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--workers", default="1,4,8,16")
+    parser.add_argument("--batch-size", type=int, default=64, help="texts per model forward pass")
+    args = parser.parse_args()
+
+    chunks = synthetic_chunks(args.chunks)
+    print(f"{len(chunks)} chunks, model {args.model}, batch size {args.batch_size}, {os.cpu_count()} CPUs")
+    print(f"{'workers':>8} {'start (s)':>10} {'chunks/s':>10} {'speedup':>8}")
+    baseline = None
+    for workers in [int(value) for value in args.workers.split(",")]:
+        processor = TextProcessor(args.model, num_workers=workers, encode_batch_size=args.batch_size)
+        start = time.perf_counter()
+        # Warm-up starts the pool and loads the model in every worker
+        processor.encode_uncached(chunks[:workers * args.batch_size])
+        start_time = time.perf_counter() - start
+        start = time.perf_counter()
+        embeddings = processor.encode_uncached(chunks)
+        throughput = len(chunks) / (time.perf_counter() - start)
+        processor.close()
+        assert embeddings.shape[0] == len(chunks) and embeddings.dtype == np.float32
+        baseline = baseline or throughput
+        print(f"{workers:>8} {start_time:>10.1f} {throughput:>10.0f} {throughput / baseline:>8.2f}")
+
+if __name__ == "__main__":
+    main()
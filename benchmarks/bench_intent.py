@@ -0,0 +1,56 @@
+"""
+Compare intent classifiers on a labelled query set: zero-shot BART on every query,
+the embedding classifier alone, and the embedding classifier with BART as fallback.
+Reports accuracy, per-query latency and how often the fallback was used.
+
+Usage:
+    python benchmarks/bench_intent.py --queries benchmarks/intent_queries.csv --thresholds 0.02,0.05,0.1
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from utils import classify_intent
+from ModelRegistry import registry
+from IntentClassifier import IntentClassifier
+from config import CLASSIFIER_MODEL, EMBEDDING_MODEL
+
+def evaluate(name, classifier, queries, intents):
+    latencies = []
+    correct = 0
+    for query, intent in zip(queries, intents):
+        start = time.perf_counter()
+        correct += classify_intent(query, classifier) == intent
+        latencies.append(time.perf_counter() - start)
+    fallback_rate = classifier.stats()["fallback_rate"] if isinstance(classifier, IntentClassifier) else 1.0
+    print(f"{name:>24} {correct / len(queries):>9.3f} {np.mean(latencies) * 1000:>11.1f} {np.percentile(latencies, 95) * 1000:>10.1f} {fallback_rate:>9.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", default=os.path.join(os.path.dirname(__file__), "intent_queries.csv"))
+    parser.add_argument("--thresholds", default="0.02,0.05,0.1")
+    args = parser.parse_args()
+
+    labelled = pd.read_csv(args.queries)
+    queries, intents = list(labelled['query']), list(labelled['intent'])
+    registry.warm_up([("zero-shot-classification", CLASSIFIER_MODEL), ("sentence-transformer", EMBEDDING_MODEL)])
+    zero_shot = registry.zero_shot_classifier(CLASSIFIER_MODEL)
+    classifiers = [("zero-shot", zero_shot), ("embedding only", IntentClassifier())]
+    for threshold in (float(value) for value in args.thresholds.split(",")):
+        classifiers.append((f"embedding, margin {threshold}", IntentClassifier(fallback=zero_shot, margin_threshold=threshold)))
+
+    print(f"{len(queries)} labelled queries")
+    print(f"{'classifier':>24} {'accuracy':>9} {'mean (ms)':>11} {'p95 (ms)':>10} {'fallback':>9}")
+    for name, classifier in classifiers:
+        if isinstance(classifier, IntentClassifier):
+            # Encode the examples before timing
+            classifier.prototypes()
+        evaluate(name, classifier, queries, intents)
+
+if __name__ == "__main__":
+    main()
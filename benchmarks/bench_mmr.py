@@ -0,0 +1,81 @@
+"""
+Benchmark the vectorized MMR in Operations against the original loop implementation.
+
+Usage:
+    python benchmarks/bench_mmr.py --sizes 10000,100000,1000000 --top-k 5
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import faiss
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from Operations import maximal_marginal_relevance
+
+def loop_mmr(query_embedding, doc_embeddings, top_k=5, lambda_param=0.5):
+    """
+    The original DataManager.mmr selection loop.
+    """
+    sim_scores = np.dot(doc_embeddings, query_embedding.T).flatten()
+    selected = []
+    while len(selected) < top_k:
+        if not selected:
+            selected_idx = np.argmax(sim_scores)
+        else:
+            mmr_scores = []
+            for idx in range(len(doc_embeddings)):
+                if idx not in selected:
+                    diversity = max([np.dot(doc_embeddings[idx], doc_embeddings[sel_idx]) for sel_idx in selected])
+                    mmr_scores.append((lambda_param * sim_scores[idx] - (1 - lambda_param) * diversity, idx))
+            selected_idx = max(mmr_scores)[1]
+        selected.append(selected_idx)
+    return selected
+
+def timed(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--fetch-factor", type=int, default=10, help="candidate pool size as a multiple of top-k")
+    parser.add_argument("--loop-max", type=int, default=100000, help="largest corpus to run the loop implementation on")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'entries':>10} {'loop (s)':>10} {'vectorized (s)':>15} {'pool (s)':>10} {'speedup':>9} {'match':>6}")
+    for size in (int(value) for value in args.sizes.split(",")):
+        docs = rng.standard_normal((size, args.dim), dtype=np.float32)
+        docs /= np.linalg.norm(docs, axis=1, keepdims=True)
+        query = docs[0] + 0.1 * rng.standard_normal(args.dim, dtype=np.float32)
+        query /= np.linalg.norm(query)
+
+        index = faiss.IndexFlatIP(args.dim)
+        index.add(docs)
+
+        def pooled():
+            _, candidates = index.search(query.reshape(1, -1), args.top_k * args.fetch_factor)
+            rows = np.sort(candidates[0])
+            return rows[maximal_marginal_relevance(query, docs[rows], args.top_k)]
+
+        vector_time, vector_result = timed(lambda: maximal_marginal_relevance(query, docs, args.top_k), args.repeat)
+        pool_time, _ = timed(pooled, args.repeat)
+        if size <= args.loop_max:
+            loop_time, loop_result = timed(lambda: loop_mmr(query, docs, args.top_k), 1)
+            match = list(vector_result) == list(loop_result)
+            print(f"{size:>10} {loop_time:>10.3f} {vector_time:>15.4f} {pool_time:>10.4f} {loop_time / vector_time:>8.0f}x {str(match):>6}")
+        else:
+            print(f"{size:>10} {'skipped':>10} {vector_time:>15.4f} {pool_time:>10.4f} {'-':>9} {'-':>6}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Wall time and peak memory of PDF extraction: the previous approach, which opened the document
+three times (PyMuPDF for text and for images, pdfplumber for tables) and built up the whole
+text in memory, against PDFExtraction's single-pass page pipeline.
+
+A synthetic PDF with text, an image and a header rule on every page and a ruled table on every
+--table-every'th page is generated first. Pages without a table show what the table pre-check
+saves. Each variant runs in a fresh process so its peak RSS can be measured.
+
+Usage:
+    python benchmarks/bench_pdf.py --pages 500 --table-every 1
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import fitz
+from PDFExtraction import PDFExtraction
+
+def make_pdf(path, pages, table_every=1):
+    doc = fitz.open()
+    pixmap = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 256, 256), 0)
+    pixmap.clear_with(96)
+    for number in range(pages):
+        page = doc.new_page()
+        page.insert_textbox(fitz.Rect(72, 72, 540, 300), f"Page {number + 1}. " + "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 15)
+        page.insert_image(fitz.Rect(72, 560, 272, 760), pixmap=pixmap)
+        # A header rule, like most real documents have, so pages without a table still have vector graphics
+        page.draw_line((72, 60), (540, 60))
+        if number % table_every:
+            continue
+        for i in range(6):
+            page.draw_line((72, 320 + i * 40), (472, 320 + i * 40))
+        for j in range(5):
+            page.draw_line((72 + j * 100, 320), (72 + j * 100, 520))
+        for i in range(5):
+            for j in range(4):
+                page.insert_text((80 + j * 100, 345 + i * 40), f"r{i}c{j}")
+    doc.save(path)
+
+def legacy(extractor):
+    import pdfplumber
+    import pandas as pd
+    doc = fitz.open(extractor.pdf_path)
+    text = ""
+    for page in doc:
+        text += page.get_text()
+    with open(extractor.text_file, "w", encoding="utf-8") as file:
+        file.write(text)
+    doc = fitz.open(extractor.pdf_path)
+    for page_number in range(len(doc)):
+        for img_index, img in enumerate(doc.get_page_images(page_number)):
+            base_image = doc.extract_image(img[0])
+            with open(os.path.join(extractor.image_dir, f"page{page_number+1}_img{img_index+1}.{base_image['ext']}"), "wb") as image_file:
+                image_file.write(base_image["image"])
+    with pdfplumber.open(extractor.pdf_path) as pdf:
+        for i, page in enumerate(pdf.pages):
+            for j, table in enumerate(page.extract_tables()):
+                if table:
+                    pd.DataFrame(table[1:], columns=table[0]).to_csv(os.path.join(extractor.table_dir, f"table_page{i+1}_{j+1}.csv"), index=False)
+
+def run_variant(variant, pdf_path, output_dir):
+    extractor = PDFExtraction(pdf_path, output_dir)
+    start = time.perf_counter()
+    if variant == "legacy":
+        legacy(extractor)
+    else:
+        extractor.extract_all()
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"seconds": elapsed, "peak_rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, "tables": len(os.listdir(extractor.table_dir))}))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--table-every", type=int, default=1, help="put a table on every n-th page")
+    parser.add_argument("--variant", choices=["legacy", "pipeline"], help=argparse.SUPPRESS)
+    parser.add_argument("--pdf", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.variant:
+        run_variant(args.variant, args.pdf, args.output)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        pdf_path = os.path.join(directory, "bench.pdf")
+        make_pdf(pdf_path, args.pages, args.table_every)
+        print(f"{args.pages} pages, a table every {args.table_every}, {os.path.getsize(pdf_path) / 2**20:.1f} MiB")
+        print(f"{'variant':>10} {'wall (s)':>9} {'peak RSS (MiB)':>15} {'tables':>7}")
+        for variant in ("legacy", "pipeline"):
+            output = subprocess.run(
+                [sys.executable, __file__, "--variant", variant, "--pdf", pdf_path, "--output", os.path.join(directory, variant)],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{variant:>10} {result['seconds']:>9.1f} {result['peak_rss_mib']:>15.0f} {result['tables']:>7}")
+
+if __name__ == "__main__":
+    main()
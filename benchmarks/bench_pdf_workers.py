@@ -0,0 +1,48 @@
+"""
+Wall time of extracting a batch of PDFs with extract_pdfs and 1, 2, 4 and 8 worker processes.
+The batch mixes short documents with one long one, which is split into page ranges so that it
+does not leave the other workers idle at the end.
+
+Usage:
+    python benchmarks/bench_pdf_workers.py --documents 32 --pages 20 --long-pages 400 --workers 1,2,4,8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from PDFExtraction import extract_pdfs
+from bench_pdf import make_pdf
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=32)
+    parser.add_argument("--pages", type=int, default=20, help="pages per short document")
+    parser.add_argument("--long-pages", type=int, default=400, help="pages of the long document")
+    parser.add_argument("--workers", default="1,2,4,8")
+    parser.add_argument("--pages-per-task", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        pdf_paths = [os.path.join(directory, "long.pdf")]
+        make_pdf(pdf_paths[0], args.long_pages)
+        make_pdf(os.path.join(directory, "short.pdf"), args.pages)
+        for number in range(args.documents - 1):
+            pdf_paths.append(os.path.join(directory, f"short{number}.pdf"))
+            os.link(os.path.join(directory, "short.pdf"), pdf_paths[-1])
+        pages = args.long_pages + (args.documents - 1) * args.pages
+        print(f"{args.documents} documents, {pages} pages, {os.cpu_count()} CPUs")
+        print(f"{'workers':>8} {'wall (s)':>9} {'pages/s':>8} {'speedup':>8}")
+        baseline = None
+        for workers in [int(value) for value in args.workers.split(",")]:
+            start = time.perf_counter()
+            extract_pdfs(pdf_paths, os.path.join(directory, f"out{workers}"), max_workers=workers, pages_per_task=args.pages_per_task)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f"{workers:>8} {elapsed:>9.1f} {pages / elapsed:>8.0f} {baseline / elapsed:>8.2f}")
+
+if __name__ == "__main__":
+    main()
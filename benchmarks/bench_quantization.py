@@ -0,0 +1,73 @@
+"""
+Compare the float32 index with float16, int8 and PQ-compressed indexes: index memory,
+per-query latency and recall@k, with and without exact rescoring of the top candidates.
+
+Rescoring reads the candidates' original embeddings, as DataManager does from the
+memory-mapped store; the store itself takes half the space when saved as float16.
+
+Usage:
+    python benchmarks/bench_quantization.py --entries 100000 --queries 500 --rescore-factor 4
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import faiss
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from VectorIndex import VectorIndex
+from bench_ann import clustered_embeddings
+
+def index_bytes(index):
+    return faiss.serialize_index(index.index).nbytes
+
+def measure(index, queries, truth, k, store=None, rescore_factor=0):
+    found = []
+    start = time.perf_counter()
+    for query in queries:
+        if store is None:
+            found.append(index.search(query, k)[1][0])
+        else:
+            _, candidates = index.search(query, k * rescore_factor)
+            vectors = np.asarray(store[np.maximum(candidates, 0)], dtype=np.float32)
+            found.append(index.rescore(query, candidates, vectors, k)[1][0])
+    latency = (time.perf_counter() - start) / len(queries)
+    recall = np.mean([len(set(ids) & set(expected)) / k for ids, expected in zip(found, truth)])
+    return latency, recall
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--index-type", default="flat", choices=["flat", "hnsw", "ivf_flat"])
+    parser.add_argument("--rescore-factor", type=int, default=4)
+    parser.add_argument("--pq-m", type=int, default=48, help="PQ sub-quantizers (bytes per vector)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    embeddings = clustered_embeddings(rng, args.entries, args.dim)
+    queries = clustered_embeddings(rng, args.queries, args.dim)
+    ids = np.arange(args.entries)
+    stores = {"float32": embeddings, "float16": embeddings.astype(np.float16)}
+    print(f"Store: {stores['float32'].nbytes / 2**20:.1f} MiB as float32, {stores['float16'].nbytes / 2**20:.1f} MiB as float16")
+
+    exact = VectorIndex.build(ids, embeddings, args.dim, "cosine", "flat")
+    truth = [exact.search(query, args.k)[1][0] for query in queries]
+    baseline = None
+
+    print(f"{'quantization':>12} {'rescore':>10} {'index (MiB)':>12} {'memory':>8} {'latency (ms)':>13} {f'recall@{args.k}':>10}")
+    for quantization in (None, "fp16", "int8", "pq"):
+        index = VectorIndex.build(ids, embeddings, args.dim, "cosine", args.index_type, params={"quantization": quantization, "pq_m": args.pq_m})
+        size = index_bytes(index)
+        baseline = baseline or size
+        runs = [("-", None)] if quantization is None else [("-", None)] + [(f"{dtype} x{args.rescore_factor}", stores[dtype]) for dtype in stores]
+        for label, store in runs:
+            latency, recall = measure(index, queries, truth, args.k, store, args.rescore_factor)
+            print(f"{quantization or 'float32':>12} {label:>10} {size / 2**20:>12.1f} {size / baseline:>8.2f} {latency * 1000:>13.3f} {recall:>10.3f}")
+
+if __name__ == "__main__":
+    main()
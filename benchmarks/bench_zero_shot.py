@@ -0,0 +1,62 @@
+"""
+Per-query latency of the zero-shot classifier backends on the intent labels: the transformers
+pipeline against ZeroShotClassifier's batched torch, torch-int8, onnx and onnx-int8 backends.
+Agreement is the share of queries whose top label matches the pipeline.
+
+Usage:
+    python benchmarks/bench_zero_shot.py --backends torch,torch-int8,onnx,onnx-int8 --limit 30
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from transformers import pipeline
+from ZeroShotClassifier import ZeroShotClassifier
+from config import CLASSIFIER_MODEL
+
+LABELS = ['save', 'question', 'update', 'delete', 'suggestion', 'emotion']
+
+def run(classifier, queries):
+    # The first call warms up kernels and is not timed
+    classifier(queries[0], LABELS)
+    latencies = []
+    top_labels = []
+    for query in queries:
+        start = time.perf_counter()
+        top_labels.append(classifier(query, LABELS)['labels'][0])
+        latencies.append(time.perf_counter() - start)
+    return np.array(latencies), top_labels
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", default=os.path.join(os.path.dirname(__file__), "intent_queries.csv"))
+    parser.add_argument("--model", default=CLASSIFIER_MODEL)
+    parser.add_argument("--backends", default="torch,torch-int8,onnx,onnx-int8")
+    parser.add_argument("--limit", type=int, default=30, help="number of queries to time")
+    args = parser.parse_args()
+
+    queries = list(pd.read_csv(args.queries)['query'])[:args.limit]
+    print(f"{len(queries)} queries x {len(LABELS)} labels, model {args.model}")
+    print(f"{'backend':>10} {'load (s)':>9} {'mean (ms)':>10} {'p95 (ms)':>9} {'speedup':>8} {'agreement':>10}")
+
+    start = time.perf_counter()
+    reference = pipeline("zero-shot-classification", model=args.model, device=-1)
+    load_time = time.perf_counter() - start
+    baseline, expected = run(reference, queries)
+    print(f"{'pipeline':>10} {load_time:>9.1f} {baseline.mean() * 1000:>10.1f} {np.percentile(baseline, 95) * 1000:>9.1f} {1:>8.2f} {1:>10.2f}")
+
+    for backend in args.backends.split(","):
+        start = time.perf_counter()
+        classifier = ZeroShotClassifier(args.model, backend)
+        load_time = time.perf_counter() - start
+        latencies, top_labels = run(classifier, queries)
+        agreement = np.mean([a == b for a, b in zip(top_labels, expected)])
+        print(f"{backend:>10} {load_time:>9.1f} {latencies.mean() * 1000:>10.1f} {np.percentile(latencies, 95) * 1000:>9.1f} {baseline.mean() / latencies.mean():>8.2f} {agreement:>10.2f}")
+
+if __name__ == "__main__":
+    main()
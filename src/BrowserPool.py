@@ -0,0 +1,120 @@
+import asyncio
+from contextlib import asynccontextmanager
+from requests_html import AsyncHTMLSession
+from pyppeteer.errors import TimeoutError as PageTimeoutError
+from config import BROWSER_POOL_SIZE
+
+class BrowserPool:
+    """
+    A pool of reusable headless Chromium pages for rendering URLs, shared by the HTMLExtraction
+    instances of a run. A single AsyncHTMLSession serves plain HTTP fetches over pooled
+    connections and launches one browser when the first page is needed. Each of up to size
+    pages lives in its own incognito browser context, so pages do not share cookies or storage.
+    Pages are returned to the pool after each render instead of being left open, and close()
+    tears down the contexts and the browser.
+    """
+    def __init__(self, size=BROWSER_POOL_SIZE):
+        """
+        Initialize the pool with the maximum number of pages rendering at the same time.
+        """
+        if size < 1:
+            raise ValueError(f"Browser pool size must be at least 1, got {size}.")
+        self.size = size
+        self.session = AsyncHTMLSession()
+        self.contexts = []
+        self.idle_pages = asyncio.Queue()
+        self.created = 0
+        self.renders = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def launch(self):
+        """
+        Return the session's browser, launching it on first use.
+        """
+        return await self.session.browser
+
+    async def new_page(self):
+        """
+        Open a page in a new incognito context of the browser.
+        """
+        browser = await self.launch()
+        context = await browser.createIncognitoBrowserContext()
+        self.contexts.append(context)
+        return await context.newPage()
+
+    @asynccontextmanager
+    async def page(self):
+        """
+        Borrow a page from the pool, opening a new one while fewer than size exist, and otherwise
+        waiting for one to be returned.
+        """
+        while True:
+            if self.idle_pages.empty() and self.created < self.size:
+                self.created += 1
+                try:
+                    page = await self.new_page()
+                except BaseException:
+                    self.created -= 1
+                    raise
+                break
+            page = await self.idle_pages.get()
+            if not page.isClosed():
+                break
+            # A page that crashed frees its slot, so a fresh one is opened in its place
+            self.created -= 1
+        try:
+            yield page
+        finally:
+            if page.isClosed():
+                self.created -= 1
+            else:
+                self.idle_pages.put_nowait(page)
+
+    async def fetch(self, url, timeout=10, headers=None):
+        """
+        GET a URL with a plain HTTP request over the session's pooled connections, without
+        starting the browser. headers are sent in addition to the session's. Returns the response.
+        """
+        return await self.session.get(url, timeout=timeout, headers=headers)
+
+    async def render(self, url, sleep=1, scrolldown=1, timeout=8.0, retries=8):
+        """
+        Load a URL in a pooled page, scroll down scrolldown times, sleeping sleep seconds after
+        each, and return the rendered HTML, as requests_html's arender does. Loads that time out
+        are retried up to retries times.
+        """
+        async with self.page() as page:
+            for attempt in range(retries):
+                try:
+                    await page.goto(url, options={'timeout': int(timeout * 1000)})
+                    break
+                except PageTimeoutError:
+                    if attempt == retries - 1:
+                        raise
+            if scrolldown:
+                for _ in range(scrolldown):
+                    await page.keyboard.down('PageDown')
+                    await asyncio.sleep(sleep)
+                await page.keyboard.up('PageDown')
+            else:
+                await asyncio.sleep(sleep)
+            self.renders += 1
+            return await page.content()
+
+    async def close(self):
+        """
+        Close all browser contexts with their pages, then the browser and the session.
+        """
+        for context in self.contexts:
+            await context.close()
+        if self.contexts:
+            print(f"Browser pool rendered {self.renders} URLs with {len(self.contexts)} pages")
+        self.contexts = []
+        self.created = 0
+        self.idle_pages = asyncio.Queue()
+        await self.session.close()
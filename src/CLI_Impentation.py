@@ -1,18 +1,16 @@
 import asyncio
 import os
-from HTMLExtraction import HTMLExtraction
-from PDFExtraction import PDFExtraction
+from HTMLExtraction import extract_urls
+from PDFExtraction import extract_pdfs
 from TextProcessor import TextProcessor
-from transformers import pipeline
 from Operations import DataManager
 from LLMManager import LLMManager
 from ProfileProcessor import ProfileProcessor
+from ModelRegistry import registry
 
-import torch
 import re
 
-device = "mps" if torch.backends.mps.is_available() else "cpu"
-classifier = pipeline("zero-shot-classification", model="facebook/bart-large-mnli", device=0 if device == "mps" else -1)
+classifier = registry.lazy("zero-shot-classification", "facebook/bart-large-mnli")
 # follow_up_classifier = pipeline("zero-shot-classification", model="facebook/bart-large-mnli", device=0 if device == "mps" else -1)
 
 def get_valid_input(prompt, valid_options, max_retries=3):
@@ -107,20 +105,14 @@ def main():
     
     
     if pdf_paths:
-        for pdf_path in pdf_paths:
-            pdf_extractor = PDFExtraction(pdf_path, base_extraction_dir=user_dir)
-            extracted_text = pdf_extractor.extract_all()
-            print(f"Extracted text from {pdf_path}:\n{extracted_text}\n")
+        for pdf_extractor in extract_pdfs(pdf_paths, base_extraction_dir=user_dir):
+            print(f"Extracted text from {pdf_extractor.pdf_path} to {pdf_extractor.text_file}")
             print(f"Extracted files are saved in: {pdf_extractor.base_dir}")
     
     if urls:
         save_intermediate = get_valid_input("Do you want to save intermediate files? (yes/no): ", ['yes', 'no']) == 'yes'
         loop = asyncio.get_event_loop()
-        tasks = []
-        for url in urls:
-            html_extractor = HTMLExtraction(url, save_intermediate=save_intermediate, base_extraction_dir=user_dir)
-            tasks.append(loop.create_task(html_extractor.extract_all()))
-        loop.run_until_complete(asyncio.gather(*tasks))
+        loop.run_until_complete(extract_urls(urls, save_intermediate=save_intermediate, base_extraction_dir=user_dir))
     
     # Process all text files and save to a single CSV
     text_processor = TextProcessor()
@@ -136,6 +128,7 @@ def main():
 
     print("Processing summary profile file to create database")
     text_processor.process_profile(user_dir)
+    text_processor.close()
 
     print("Your personal assistant is now ready!")
 
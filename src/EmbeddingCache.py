@@ -0,0 +1,81 @@
+import time
+import hashlib
+import numpy as np
+from SQLiteLRUCache import SQLiteLRUCache
+from config import EMBEDDING_CACHE_SIZE
+
+class EmbeddingCache(SQLiteLRUCache):
+    """
+    A persistent, content-addressed cache of embeddings keyed by (model name, text hash),
+    shared by every user and run on the machine. The total size of the cached vectors is
+    kept under max_bytes by evicting the least recently used entries, see SQLiteLRUCache.
+    """
+    TABLE = "embeddings"
+    COLUMNS = "model TEXT NOT NULL, hash BLOB NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL"
+    KEY = ("model", "hash")
+    SIZE = "length({row}.vector)"
+    # SQLite limits the number of parameters per statement
+    LOOKUP_BATCH = 500
+
+    def __init__(self, path, max_bytes=EMBEDDING_CACHE_SIZE, timeout=30.0):
+        """
+        Open (or create) the cache database at path.
+        """
+        super().__init__(path, max_bytes, timeout)
+
+    @staticmethod
+    def text_hash(text):
+        """
+        Return the SHA-256 digest that identifies a text in the cache.
+        """
+        return hashlib.sha256(text.encode("utf-8")).digest()
+
+    def get_many(self, model_name, texts):
+        """
+        Return the cached float32 embedding of each text, or None for texts that are not cached.
+        """
+        hashes = [self.text_hash(text) for text in texts]
+        found = {}
+        with self.lock:
+            for start in range(0, len(hashes), self.LOOKUP_BATCH):
+                batch = list(set(hashes[start:start + self.LOOKUP_BATCH]))
+                placeholders = ",".join("?" * len(batch))
+                rows = self.connection.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({placeholders})", [model_name, *batch]
+                ).fetchall()
+                found.update(rows)
+            if found:
+                # Touch the hits so eviction removes the least recently used entries
+                now = time.time()
+                keys = list(found)
+                for start in range(0, len(keys), self.LOOKUP_BATCH):
+                    batch = keys[start:start + self.LOOKUP_BATCH]
+                    placeholders = ",".join("?" * len(batch))
+                    self.connection.execute(f"UPDATE embeddings SET last_used = ? WHERE model = ? AND hash IN ({placeholders})", [now, model_name, *batch])
+        embeddings = [np.frombuffer(found[key], dtype=np.float32) if key in found else None for key in hashes]
+        hits = sum(embedding is not None for embedding in embeddings)
+        self.hits += hits
+        self.misses += len(embeddings) - hits
+        return embeddings
+
+    def put_many(self, model_name, texts, embeddings):
+        """
+        Cache the embeddings of texts, then evict the least recently used entries if the cache is over its size.
+        """
+        now = time.time()
+        rows = [(model_name, self.text_hash(text), np.ascontiguousarray(embedding, dtype=np.float32).tobytes(), now) for text, embedding in zip(texts, embeddings)]
+        with self.transaction() as connection:
+            connection.executemany("INSERT OR IGNORE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+
+    def encode(self, model_name, texts, encode):
+        """
+        Return the float32 embeddings of texts as a matrix, calling encode(texts) once for the cache misses only.
+        """
+        embeddings = self.get_many(model_name, texts)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            encoded = np.asarray(encode([texts[i] for i in missing]), dtype=np.float32)
+            self.put_many(model_name, [texts[i] for i in missing], encoded)
+            for i, embedding in zip(missing, encoded):
+                embeddings[i] = embedding
+        return np.vstack(embeddings) if embeddings else np.empty((0, 0), dtype=np.float32)
@@ -0,0 +1,246 @@
+import os
+import sys
+import shutil
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+class EmbeddingStore:
+    """
+    A binary storage backend for profile databases. Texts and metadata are kept in a
+    columnar Parquet file and embeddings in a contiguous float32 .npy file that is
+    memory-mapped on load, so no per-row parsing is needed at startup.
+
+    Every entry has a stable integer ID ('Index') assigned at ingestion. IDs are never
+    reused: the next free ID is kept in the Parquet metadata. Deleted entries stay in
+    the store as tombstones ('Deleted') until their space is reclaimed.
+
+    Embeddings can be stored as float16 to halve the file and the memory it maps.
+
+    Each save writes a new generation of both files under versioned names and then switches
+    to it by atomically replacing a small pointer file, so a crash mid-save leaves the
+    previous pair in place. Stores written before the pointer existed are generation 0,
+    kept under the unversioned names.
+    """
+    EXTENSIONS = (".csv", ".parquet", ".npy")
+
+    def __init__(self, path, dtype="float32"):
+        """
+        Initialize the store for a database path. The path may be given with or without
+        an extension, so the legacy CSV path of a database can be used directly.
+        'dtype' ('float32' or 'float16') is the precision embeddings are saved with.
+        """
+        base, ext = os.path.splitext(path)
+        self.base_path = base if ext in self.EXTENSIONS else path
+        self.pointer_file = f"{self.base_path}.current"
+        self.generation = self.read_generation()
+        self.csv_file = f"{self.base_path}.csv"
+        self.next_id = 0
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in (np.float32, np.float16):
+            raise ValueError(f"Unsupported embedding dtype '{dtype}'. Expected 'float32' or 'float16'.")
+
+    def read_generation(self):
+        """
+        Return the generation named by the pointer file, or 0 if there is none.
+        """
+        try:
+            with open(self.pointer_file) as file:
+                return int(file.read())
+        except FileNotFoundError:
+            return 0
+
+    def files(self, generation):
+        """
+        Return the (Parquet, .npy) paths of a generation of the store.
+        """
+        suffix = f".{generation}" if generation else ""
+        return f"{self.base_path}{suffix}.parquet", f"{self.base_path}{suffix}.npy"
+
+    @property
+    def table_file(self):
+        return self.files(self.generation)[0]
+
+    @property
+    def embeddings_file(self):
+        return self.files(self.generation)[1]
+
+    def switch_to(self, generation):
+        """
+        Make a completely written generation current with a single atomic rename of the
+        pointer file, then remove the files of the previous generation.
+        """
+        tmp_pointer_file = f"{self.pointer_file}.tmp"
+        with open(tmp_pointer_file, "w") as file:
+            file.write(str(generation))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_pointer_file, self.pointer_file)
+        previous, self.generation = self.generation, generation
+        for path in self.files(previous):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def exists(self):
+        """
+        Check whether the store, or a legacy CSV it can be migrated from, exists.
+        """
+        self.generation = self.read_generation()
+        return (os.path.exists(self.table_file) and os.path.exists(self.embeddings_file)) or os.path.exists(self.csv_file)
+
+    def mtime(self):
+        """
+        Return the last modification time of the store files.
+        """
+        return max(os.path.getmtime(self.table_file), os.path.getmtime(self.embeddings_file))
+
+    def load(self):
+        """
+        Load the texts and metadata as a DataFrame indexed by entry ID, and the embeddings
+        as a read-only memory-mapped matrix in the precision they were saved with.
+        Migrates a legacy CSV on first use.
+        """
+        self.generation = self.read_generation()
+        if not (os.path.exists(self.table_file) and os.path.exists(self.embeddings_file)):
+            self.migrate_csv()
+        table = pq.read_table(self.table_file)
+        df = table.to_pandas().set_index('Index')
+        if 'Deleted' not in df.columns:
+            df['Deleted'] = False
+        metadata = table.schema.metadata or {}
+        self.next_id = max(int(metadata.get(b"next_id", 0)), int(df.index.max()) + 1 if len(df) else 0)
+        embeddings = np.load(self.embeddings_file, mmap_mode='r')
+        if len(df) != len(embeddings):
+            raise ValueError(f"Embedding store {self.base_path} is inconsistent: {len(df)} rows but {len(embeddings)} embeddings.")
+        return df, embeddings
+
+    def save(self, df, embeddings, next_id=None):
+        """
+        Save a DataFrame indexed by entry ID and its row-aligned embeddings, together with
+        the next free entry ID. Both files are written as a new generation before it is switched to.
+        """
+        embeddings = np.ascontiguousarray(embeddings, dtype=self.dtype)
+        if embeddings.ndim != 2 or len(embeddings) != len(df):
+            raise ValueError("Embeddings must be a 2D matrix with one row per entry.")
+        table = df.copy()
+        table.index = table.index.astype(np.int64)
+        table.index.name = 'Index'
+        self.next_id = max(next_id or 0, self.next_id, int(table.index.max()) + 1 if len(table) else 0)
+        table = pa.Table.from_pandas(table.reset_index(), preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), b"next_id": str(self.next_id).encode()})
+
+        generation = self.read_generation() + 1
+        table_file, embeddings_file = self.files(generation)
+        pq.write_table(table, table_file)
+        with open(embeddings_file, "wb") as file:
+            np.save(file, embeddings)
+            file.flush()
+            os.fsync(file.fileno())
+        self.switch_to(generation)
+
+    def save_texts(self, texts, embeddings):
+        """
+        Save a list of texts and their embeddings as a new store with IDs 0..n-1.
+        """
+        df = pd.DataFrame({"Text": list(texts)}, index=pd.RangeIndex(len(texts), name='Index'))
+        self.save(df, np.asarray(embeddings, dtype=np.float32).reshape(len(texts), -1))
+
+    def save_batches(self, batches, next_id=None):
+        """
+        Save an iterable of (ids, texts, embeddings) batches as a new store, together with
+        the next free entry ID. Each batch is written out as it arrives, so only one batch
+        is held in memory. Returns the number of entries written.
+        """
+        generation = self.read_generation() + 1
+        table_file, embeddings_file = self.files(generation)
+        tmp_raw_file = f"{embeddings_file}.raw.tmp"
+        schema = pa.schema([("Index", pa.int64()), ("Text", pa.string())])
+        count = 0
+        next_id = next_id or 0
+        dim = None
+        with pq.ParquetWriter(table_file, schema) as writer, open(tmp_raw_file, "wb") as raw:
+            for ids, texts, embeddings in batches:
+                ids = np.asarray(ids, dtype=np.int64)
+                embeddings = np.ascontiguousarray(embeddings, dtype=self.dtype).reshape(len(texts), -1)
+                if dim is not None and embeddings.shape[1] != dim:
+                    raise ValueError(f"Embedding dimension changed from {dim} to {embeddings.shape[1]} between batches.")
+                dim = embeddings.shape[1]
+                writer.write_table(pa.table({"Index": ids, "Text": list(texts)}, schema=schema))
+                raw.write(embeddings.tobytes())
+                count += len(texts)
+                next_id = max(next_id, int(ids.max()) + 1 if len(ids) else 0)
+            # Reading this store's batches while writing may have raised its next_id
+            self.next_id = max(next_id, self.next_id)
+            writer.add_key_value_metadata({"next_id": str(self.next_id)})
+
+        # The .npy header needs the final shape, so it is written once all rows are known
+        with open(embeddings_file, "wb") as file, open(tmp_raw_file, "rb") as raw:
+            np.lib.format.write_array_header_1_0(file, {"descr": np.lib.format.dtype_to_descr(self.dtype), "fortran_order": False, "shape": (count, dim or 0)})
+            shutil.copyfileobj(raw, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.remove(tmp_raw_file)
+        self.switch_to(generation)
+        return count
+
+    def iter_batches(self, batch_size=10000):
+        """
+        Yield the live entries of the store as (ids, texts, embeddings) batches, skipping
+        tombstones, without loading the whole store into memory. next_id is updated as
+        the batches are read.
+        """
+        self.generation = self.read_generation()
+        if not (os.path.exists(self.table_file) and os.path.exists(self.embeddings_file)):
+            self.migrate_csv()
+        embeddings = np.load(self.embeddings_file, mmap_mode='r')
+        table = pq.ParquetFile(self.table_file)
+        columns = [name for name in ('Index', 'Text', 'Deleted') if name in table.schema_arrow.names]
+        self.next_id = max(self.next_id, int((table.schema_arrow.metadata or {}).get(b"next_id", 0)))
+        start = 0
+        for batch in table.iter_batches(batch_size=batch_size, columns=columns):
+            rows = slice(start, start + batch.num_rows)
+            start += batch.num_rows
+            ids = batch.column('Index').to_numpy()
+            self.next_id = max(self.next_id, int(ids.max()) + 1 if len(ids) else 0)
+            texts = batch.column('Text').to_pylist()
+            live = ~batch.column('Deleted').to_numpy(zero_copy_only=False) if 'Deleted' in columns else np.ones(len(ids), dtype=bool)
+            yield ids[live], [text for text, keep in zip(texts, live) if keep], np.asarray(embeddings[rows])[live]
+
+    def migrate_csv(self, chunksize=10000):
+        """
+        Convert the legacy CSV database (Index, Text, stringified Embeddings) into the binary store.
+        """
+        if not os.path.exists(self.csv_file):
+            raise FileNotFoundError(f"No embedding store or CSV database found at {self.base_path}")
+        print(f"Migrating {self.csv_file} to binary embedding store...")
+        frames = []
+        embeddings = []
+        for chunk in pd.read_csv(self.csv_file, chunksize=chunksize):
+            embeddings.extend(np.fromstring(value.strip("[]"), sep=",", dtype=np.float32) for value in chunk.pop('Embeddings'))
+            frames.append(chunk)
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['Index', 'Text'])
+
+        # Rows appended by older versions may be missing their ID, so renumber unless IDs are usable
+        if 'Index' in df.columns and df['Index'].notna().all() and df['Index'].is_unique:
+            df = df.set_index(df['Index'].astype(np.int64)).drop(columns='Index')
+        else:
+            df = df.drop(columns='Index', errors='ignore').reset_index(drop=True)
+
+        matrix = np.vstack(embeddings) if embeddings else np.empty((0, 0), dtype=np.float32)
+        self.save(df, matrix)
+        print(f"Embedding store written to {self.table_file} and {self.embeddings_file}")
+
+def migrate_directory(directory):
+    """
+    Migrate every legacy profile CSV (summary_profile.csv, total_profile_data.csv) under a directory.
+    """
+    for root, _, files in os.walk(directory):
+        for file in files:
+            if file in ("summary_profile.csv", "total_profile_data.csv"):
+                EmbeddingStore(os.path.join(root, file)).migrate_csv()
+
+if __name__ == "__main__":
+    # One-shot migration: python src/EmbeddingStore.py <user_dir> [<user_dir> ...]
+    for directory in sys.argv[1:]:
+        migrate_directory(directory)
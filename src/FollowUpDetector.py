@@ -0,0 +1,95 @@
+import re
+import time
+from LRUCache import LRUCache
+from utils import is_follow_up
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+OPTION_LIST = re.compile(r"^\s*(?:\d+[.)]|[a-zA-Z][.)]|[-*•])\s+\S", re.MULTILINE)
+REPLY_CUES = re.compile(r"\b(let me know|please|would you|could you|can you|do you|tell me|share|provide|choose|select|confirm|prefer)\b", re.IGNORECASE)
+
+class FollowUpDetector:
+    """
+    Decides whether an assistant response asks the user to follow up. Cheap structural
+    signals settle most responses: a question mark near the end means yes, and a response
+    with no question mark, option list or reply cue means no. Only the remaining responses
+    are passed to the classifier, and then only their last sentences. Classifier results
+    are cached by text, and the detector is also used as the classifier for follow-up
+    replies so those are cached too. The time spent classifying and the classifier calls
+    made in each turn are kept in metrics.
+    """
+    def __init__(self, classifier, tail_sentences=2, cache_size=256):
+        """
+        Initialize the detector around a zero-shot style classifier called as classifier(text, labels).
+        """
+        self.classifier = classifier
+        self.tail_sentences = tail_sentences
+        self.cache = LRUCache(cache_size)
+        self.metrics = {"checks": 0, "structural": 0, "classifier_calls": 0, "turns": []}
+        self.turn = {"latency": 0.0, "classifier_calls": 0}
+        self.depth = 0
+
+    def timed(self, function, *args):
+        """
+        Call a function and add its duration to the current turn, unless it is nested in a timed call.
+        """
+        if self.depth:
+            return function(*args)
+        self.depth += 1
+        started = time.perf_counter()
+        try:
+            return function(*args)
+        finally:
+            self.depth -= 1
+            self.turn["latency"] += time.perf_counter() - started
+
+    def classify(self, text, labels):
+        """
+        Classify a text, reusing the result for identical text and labels.
+        """
+        return self.timed(self._classify, text, labels)
+
+    def _classify(self, text, labels):
+        key = (text, tuple(labels))
+        result = self.cache.get(key)
+        if result is None:
+            self.metrics["classifier_calls"] += 1
+            self.turn["classifier_calls"] += 1
+            result = self.classifier(text, labels)
+            self.cache.put(key, result)
+        return result
+
+    def tail(self, text):
+        """
+        Return the last tail_sentences sentences of a text.
+        """
+        sentences = [sentence for sentence in SENTENCE_END.split(text.strip()) if sentence]
+        return " ".join(sentences[-self.tail_sentences:])
+
+    def __call__(self, text):
+        return self.timed(self.detect, text)
+
+    def detect(self, text):
+        self.metrics["checks"] += 1
+        tail = self.tail(text)
+        if "?" in tail:
+            self.metrics["structural"] += 1
+            return True
+        if "?" not in text and not OPTION_LIST.search(text) and not REPLY_CUES.search(tail):
+            self.metrics["structural"] += 1
+            return False
+        return is_follow_up(tail, self.classify)
+
+    def end_turn(self):
+        """
+        Record and print the classification latency and classifier calls since the last turn ended.
+        """
+        turn = self.turn
+        self.metrics["turns"].append(turn)
+        self.turn = {"latency": 0.0, "classifier_calls": 0}
+        print(f"Follow-up turn {len(self.metrics['turns'])}: {turn['latency'] * 1000:.0f} ms classifying, {turn['classifier_calls']} classifier calls")
+
+    def stats(self):
+        """
+        Return the detector counters together with the classifier cache hit rate.
+        """
+        return {key: value for key, value in self.metrics.items() if key != "turns"} | {"cache_hit_rate": self.cache.stats()["hit_rate"]}
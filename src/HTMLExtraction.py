@@ -1,5 +1,4 @@
 import asyncio
-from requests_html import AsyncHTMLSession
 import nest_asyncio
 from bs4 import BeautifulSoup
 from urllib.parse import urlparse
@@ -7,6 +6,9 @@ from pathlib import Path
 import re
 import os
 import validators
+from BrowserPool import BrowserPool
+from HTTPCache import HTTPCache
+from config import BROWSER_POOL_SIZE, STATIC_MIN_TEXT, STATIC_MIN_TEXT_RATIO, HTTP_CACHE_PATH
 
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
@@ -19,13 +21,27 @@ class HTMLExtraction:
     A class for extracting and processing HTML content from a URL.
     This class fetches, renders, cleans, and extracts text from HTML content,
     and optionally saves intermediate results.
+    Pages are first fetched with a plain HTTP GET and only rendered in a headless browser if
+    their static HTML lacks the text, e.g. because it is built by JavaScript; tier records which
+    of 'static' and 'rendered' served the page. Both go through a BrowserPool, which is shared
+    when one is passed in; otherwise the instance uses a pool of its own, closed by close().
+    With an HTTPCache, pages fetched before are revalidated with a conditional GET, and a 304
+    Not Modified reuses the cached text without rendering, cleaning or extracting again.
     """
-    def __init__(self, url, save_intermediate=False, base_extraction_dir='extracted_html_files'):
+    def __init__(self, url, save_intermediate=False, base_extraction_dir='extracted_html_files', pool=None, cache=None):
         if not validators.url(url):
             raise ValueError("Invalid URL provided. Please enter a valid URL.")
         self.url = url
         self.save_intermediate = save_intermediate
-        self.session = AsyncHTMLSession()
+        self.owns_pool = pool is None
+        self.pool = BrowserPool(size=1) if pool is None else pool
+        self.cache = cache
+        self.tier = None
+        # Cache entry of the page if the server confirmed it is unchanged, else the response to store
+        self.cached = None
+        self.raw_html = None
+        self.etag = None
+        self.last_modified = None
         self.base_dir = self._create_base_dir(base_extraction_dir)
     
     def _create_base_dir(self, base_extraction_dir):
@@ -45,20 +61,63 @@ class HTMLExtraction:
         folder_name = parsed_url.netloc + parsed_url.path.replace("/", "_")
         return folder_name.strip('_')
 
-    async def fetch_and_save_html(self):
+    async def fetch_static(self):
         """
-        Fetch and render HTML content from the specified URL,
-        and optionally save the rendered HTML to a file.
+        Fetch the URL with a plain HTTP GET, made conditional on the validators of its cache
+        entry if there is one. Returns the HTML if it already holds the page's text, or None if
+        the page has to be rendered. On 304 Not Modified, self.cached is set to the cache entry
+        and its HTML is returned.
         """
+        entry = self.cache.get(self.url) if self.cache is not None else None
+        headers = {}
+        if entry is not None:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
         try:
-            # Fetch the page
-            r = await self.session.get(self.url)
+            response = await self.pool.fetch(self.url, headers=headers)
+        except Exception as e:
+            print(f"Static fetch of {self.url} failed, rendering it instead: {e}")
+            return None
+        revalidated = response.status_code == 304 and entry is not None
+        if self.cache is not None:
+            self.cache.record(revalidated)
+        if revalidated:
+            self.cached = entry
+            return entry["rendered"] or entry["raw"]
+        if response.status_code != 200 or 'html' not in response.headers.get('Content-Type', 'text/html'):
+            return None
+        self.raw_html = response.text
+        self.etag = response.headers.get('ETag')
+        self.last_modified = response.headers.get('Last-Modified')
+        return self.raw_html if self._has_meaningful_text(self.raw_html) else None
 
-            # Render the page
-            await r.html.arender(sleep=1, keep_page=True, scrolldown=1)
+    def _has_meaningful_text(self, html_content):
+        """
+        Check whether static HTML holds enough visible text to skip rendering: at least
+        STATIC_MIN_TEXT characters, making up at least STATIC_MIN_TEXT_RATIO of the markup.
+        Pages built by JavaScript ship little more than scripts and an empty root element.
+        """
+        soup = BeautifulSoup(html_content, 'html.parser')
+        # noscript holds the "enable JavaScript" notice of such pages, which is not content
+        for tag in soup(["script", "style", "noscript", "template"]):
+            tag.decompose()
+        text_length = len(self._normalize_whitespace(soup.get_text(separator='\n')))
+        return text_length >= STATIC_MIN_TEXT and text_length >= STATIC_MIN_TEXT_RATIO * len(html_content)
 
-            # Get the entire HTML content
-            html_content = r.html.html
+    async def fetch_and_save_html(self):
+        """
+        Fetch HTML content from the specified URL, rendering it only if the static HTML lacks
+        the text, and optionally save the HTML to a file.
+        """
+        try:
+            html_content = await self.fetch_static()
+            self.tier = self.cached["tier"] if self.cached is not None else 'static'
+            if html_content is None:
+                # Render the page in a pooled browser page
+                html_content = await self.pool.render(self.url, sleep=1, scrolldown=1)
+                self.tier = 'rendered'
 
             if self.save_intermediate:
                 # Save the HTML content to a file
@@ -122,27 +181,76 @@ class HTMLExtraction:
         # Normalize whitespace
         normalized_text = self._normalize_whitespace(text)
 
-        text_file = self.base_dir / 'extracted_text.txt'
-        with open(text_file, 'w', encoding='utf-8') as file:
-            file.write(normalized_text)
-        
+        text_file = self._write_text(normalized_text)
         print(f"Text extracted to file: {text_file}")
         return normalized_text
 
+    def _write_text(self, text):
+        """
+        Write the extracted text to the text file of the URL and return its path.
+        """
+        text_file = self.base_dir / 'extracted_text.txt'
+        with open(text_file, 'w', encoding='utf-8') as file:
+            file.write(text)
+        return text_file
+
     async def extract_all(self):
         """
         Perform the complete extraction process: fetch, clean, and extract text from HTML content.
         """
         html_content = await self.fetch_and_save_html()
+        if self.cached is not None:
+            text_file = self._write_text(self.cached["text"])
+            print(f"Page unchanged since it was cached, text written to file: {text_file}")
+            return self.cached["text"]
         cleaned_html_content = await self.clean_html(html_content)
         text = await self.extract_text_from_html(cleaned_html_content)
+        # Only pages with validators can be revalidated later, so only those are cached
+        if self.cache is not None and self.raw_html is not None and (self.etag or self.last_modified):
+            rendered = html_content if self.tier == 'rendered' else None
+            self.cache.put(self.url, self.etag, self.last_modified, self.tier, self.raw_html, rendered, text)
         return text
 
     async def close(self):
         """
-        Close the asynchronous HTML session.
+        Close the browser pool, unless it is shared with other instances.
         """
-        await self.session.close()
+        if self.owns_pool:
+            await self.pool.close()
+
+async def extract_urls(urls, save_intermediate=False, base_extraction_dir='extracted_html_files', pool_size=BROWSER_POOL_SIZE, cache_path=HTTP_CACHE_PATH):
+    """
+    Extract a batch of URLs in one shared BrowserPool. URLs are handed out in order to pool_size
+    workers, so no more than pool_size pages are ever open, and the pool is torn down when all
+    are done. A URL that fails is reported and skipped. Pages are cached in the HTTPCache at
+    cache_path, unless it is falsy, and revalidated on later runs.
+    Returns the HTMLExtraction of each URL in the order of urls, with its tier, or None for
+    those that failed.
+    """
+    results = [None] * len(urls)
+    pending = iter(enumerate(urls))
+
+    async def worker(pool, cache):
+        # The workers share one iterator, so each URL is taken by exactly one of them
+        for index, url in pending:
+            try:
+                html_extractor = HTMLExtraction(url, save_intermediate=save_intermediate, base_extraction_dir=base_extraction_dir, pool=pool, cache=cache)
+                await html_extractor.extract_all()
+                results[index] = html_extractor
+            except Exception as e:
+                print(f"Error processing {url}: {e}")
+
+    cache = HTTPCache(cache_path) if cache_path else None
+    try:
+        async with BrowserPool(size=pool_size) as pool:
+            await asyncio.gather(*(worker(pool, cache) for _ in range(min(pool_size, len(urls)))))
+    finally:
+        if cache is not None:
+            print(f"HTTP cache: {cache.stats()}")
+            cache.close()
+    tiers = [html_extractor.tier for html_extractor in results if html_extractor is not None]
+    print(f"Extracted {len(tiers)} of {len(urls)} URLs: {tiers.count('static')} from static HTML, {tiers.count('rendered')} rendered")
+    return results
 
 # Test the HTMLExtraction class
 async def test_html_extraction(url, save_intermediate):
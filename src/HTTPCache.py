@@ -0,0 +1,72 @@
+import time
+from SQLiteLRUCache import SQLiteLRUCache
+from config import HTTP_CACHE_SIZE
+
+class HTTPCache(SQLiteLRUCache):
+    """
+    A persistent cache of fetched web pages keyed by URL, shared by every user and run on the
+    machine. Each entry holds the raw HTML of the plain GET, the rendered HTML if the page had
+    to be rendered, the extracted text, and the ETag and Last-Modified headers used to
+    revalidate it with a conditional request. The total size of the entries is kept under
+    max_bytes by evicting the least recently used entries, see SQLiteLRUCache.
+    """
+    TABLE = "pages"
+    COLUMNS = ("url TEXT NOT NULL, etag TEXT, last_modified TEXT, tier TEXT NOT NULL, raw BLOB NOT NULL, "
+               "rendered BLOB, text BLOB NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL")
+    KEY = ("url",)
+    SIZE = "{row}.size"
+
+    def __init__(self, path, max_bytes=HTTP_CACHE_SIZE, timeout=30.0):
+        """
+        Open (or create) the cache database at path.
+        """
+        super().__init__(path, max_bytes, timeout)
+
+    def get(self, url):
+        """
+        Return the cached entry of a URL as a dict, or None if it is not cached.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT etag, last_modified, tier, raw, rendered, text FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+            if row is not None:
+                # Touch the entry so eviction removes the least recently used pages
+                self.connection.execute("UPDATE pages SET last_used = ? WHERE url = ?", (time.time(), url))
+        if row is None:
+            return None
+        etag, last_modified, tier, raw, rendered, text = row
+        return {
+            "etag": etag,
+            "last_modified": last_modified,
+            "tier": tier,
+            "raw": raw.decode("utf-8"),
+            "rendered": rendered.decode("utf-8") if rendered is not None else None,
+            "text": text.decode("utf-8"),
+        }
+
+    def put(self, url, etag, last_modified, tier, raw, rendered, text):
+        """
+        Cache a fetched page, replacing any previous entry for its URL, then evict the least
+        recently used entries if the cache is over its size.
+        """
+        raw = raw.encode("utf-8")
+        rendered = rendered.encode("utf-8") if rendered is not None else None
+        text = text.encode("utf-8")
+        size = len(raw) + len(rendered or b"") + len(text)
+        with self.transaction() as connection:
+            # Delete and insert rather than INSERT OR REPLACE, which skips the delete trigger
+            connection.execute("DELETE FROM pages WHERE url = ?", (url,))
+            connection.execute(
+                "INSERT INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, etag, last_modified, tier, raw, rendered, text, size, time.time()),
+            )
+
+    def record(self, revalidated):
+        """
+        Count a conditional request: a hit if the server answered 304 Not Modified, a miss otherwise.
+        """
+        if revalidated:
+            self.hits += 1
+        else:
+            self.misses += 1
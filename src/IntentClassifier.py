@@ -0,0 +1,125 @@
+import numpy as np
+from config import EMBEDDING_MODEL, INTENT_MARGIN_THRESHOLD
+from ModelRegistry import registry
+
+# Example queries per intent; a query is scored by its similarity to the closest example
+INTENT_EXAMPLES = {
+    'save': [
+        "Remember that my favourite colour is blue",
+        "Save this: I moved to Berlin last year",
+        "Please note that I am allergic to peanuts",
+        "Add to my profile that I play the guitar",
+        "Keep in mind that my birthday is in May",
+        "I just started a new job as a data analyst, store that",
+    ],
+    'question': [
+        "What is my job title?",
+        "Where do I live?",
+        "What did I study at university?",
+        "Which programming languages do I know?",
+        "When is my birthday?",
+        "Tell me what hobbies I have",
+    ],
+    'update': [
+        "Update my address to 12 Park Lane",
+        "Change my job title to senior engineer",
+        "I no longer live in Boston, I live in Denver now",
+        "Correct my phone number, it is wrong",
+        "Edit my profile: I now work at Google",
+        "Replace my favourite food with sushi",
+    ],
+    'delete': [
+        "Delete my phone number",
+        "Remove the entry about my old job",
+        "Forget that I live in Boston",
+        "Erase my address from the profile",
+        "Please remove everything about my ex-employer",
+        "Get rid of the note about my allergy",
+    ],
+    'suggestion': [
+        "Can you suggest a good book for me?",
+        "Recommend some jobs that fit my skills",
+        "What should I do this weekend?",
+        "Give me ideas for a birthday gift",
+        "Which courses would help my career?",
+        "Suggest a hobby I might enjoy",
+    ],
+    'emotion': [
+        "I feel really sad today",
+        "I am so stressed about work",
+        "I'm anxious about my exam tomorrow",
+        "I feel lonely lately",
+        "I am really happy about my promotion!",
+        "I'm frustrated and angry with everything",
+    ],
+}
+
+class IntentClassifier:
+    """
+    A fast intent classifier that compares the sentence embedding of a query against
+    cached embeddings of example queries for each intent. It is a drop-in replacement
+    for the zero-shot pipeline: it is called as classifier(text, labels) and returns
+    {'labels': ..., 'scores': ...} sorted by score. When the top two intents are closer
+    than margin_threshold, or the labels are not intents it has examples for, the query
+    is passed to the fallback classifier (the zero-shot pipeline) instead.
+    """
+    def __init__(self, fallback=None, model_name=EMBEDDING_MODEL, margin_threshold=INTENT_MARGIN_THRESHOLD, examples=None, model=None):
+        """
+        Initialize the classifier. The embedding model is taken from the model registry
+        on first use unless one is given.
+        """
+        self.fallback = fallback
+        self.model_name = model_name
+        self.margin_threshold = margin_threshold
+        self.examples = examples or INTENT_EXAMPLES
+        self.model = model
+        self.example_embeddings = None
+        self.example_labels = None
+        self.counts = {"embedding": 0, "fallback": 0}
+
+    def encode(self, texts):
+        """
+        Encode texts as L2-normalized embeddings.
+        """
+        if self.model is None:
+            self.model = registry.sentence_transformer(self.model_name)
+        embeddings = np.asarray(self.model.encode(texts), dtype=np.float32)
+        return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+    def prototypes(self):
+        """
+        Return the cached example embeddings and the intent of each, encoding them on first use.
+        """
+        if self.example_embeddings is None:
+            self.example_labels = np.array([label for label, texts in self.examples.items() for _ in texts])
+            self.example_embeddings = self.encode([text for texts in self.examples.values() for text in texts])
+        return self.example_embeddings, self.example_labels
+
+    def scores(self, text):
+        """
+        Return every intent with its cosine similarity to the closest example, best first.
+        """
+        example_embeddings, example_labels = self.prototypes()
+        similarities = example_embeddings @ self.encode([text])[0]
+        intents = list(self.examples)
+        scores = np.array([similarities[example_labels == intent].max() for intent in intents])
+        order = np.argsort(-scores, kind="stable")
+        return [intents[i] for i in order], [float(scores[i]) for i in order]
+
+    def __call__(self, text, labels):
+        if set(labels) <= set(self.examples):
+            intents, scores = self.scores(text)
+            ranked = [(intent, score) for intent, score in zip(intents, scores) if intent in labels]
+            margin = ranked[0][1] - ranked[1][1] if len(ranked) > 1 else np.inf
+            if margin >= self.margin_threshold or self.fallback is None:
+                self.counts["embedding"] += 1
+                return {'sequence': text, 'labels': [intent for intent, _ in ranked], 'scores': [score for _, score in ranked]}
+        self.counts["fallback"] += 1
+        return self.fallback(text, labels)
+
+    def stats(self):
+        """
+        Return how many queries were answered by the embeddings and how many by the fallback.
+        """
+        total = sum(self.counts.values())
+        return {**self.counts, "fallback_rate": self.counts["fallback"] / total if total else 0.0}
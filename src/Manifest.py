@@ -0,0 +1,115 @@
+import os
+import json
+import hashlib
+
+class Manifest:
+    """
+    A record of the files ingested into an embedding store: for each file its size,
+    modification time and content hash, and the IDs and source offsets of the chunks it produced.
+    It lets re-ingestion embed only new or changed files and drop the chunks of
+    deleted ones. Paths are kept relative to the manifest's directory.
+    """
+    def __init__(self, path):
+        """
+        Initialize an empty manifest stored at the given path.
+        """
+        self.path = path
+        self.root = os.path.dirname(os.path.abspath(path))
+        self.settings = {}
+        self.files = {}
+        self.next_id = 0
+
+    def load(self):
+        """
+        Load the manifest from disk. Returns False if there is none.
+        """
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, "r", encoding="utf-8") as file:
+            data = json.load(file)
+        self.settings = data["settings"]
+        self.files = data["files"]
+        self.next_id = data["next_id"]
+        return True
+
+    def save(self):
+        """
+        Write the manifest to disk, replacing the previous one atomically.
+        """
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump({"settings": self.settings, "next_id": self.next_id, "files": self.files}, file)
+        os.replace(tmp_path, self.path)
+
+    def reset(self, settings):
+        """
+        Forget every file, e.g. before a full rebuild with new settings.
+        """
+        self.settings = settings
+        self.files = {}
+        self.next_id = 0
+
+    def key(self, file_path):
+        return os.path.relpath(os.path.abspath(file_path), self.root)
+
+    @staticmethod
+    def file_hash(file_path, block_size=1 << 20):
+        """
+        Return the SHA-256 of a file's content, read in blocks.
+        """
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as file:
+            for block in iter(lambda: file.read(block_size), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def diff(self, file_paths):
+        """
+        Compare files on disk with the manifest. Returns the paths of new or changed files
+        and the manifest keys of files that no longer exist. Files are only hashed when
+        their size or mtime changed, and a touched but unchanged file just has its stat updated.
+        """
+        changed = []
+        seen = set()
+        for file_path in file_paths:
+            key = self.key(file_path)
+            seen.add(key)
+            stat = os.stat(file_path)
+            entry = self.files.get(key)
+            if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime_ns:
+                continue
+            sha256 = self.file_hash(file_path)
+            if entry and entry["sha256"] == sha256:
+                entry.update(size=stat.st_size, mtime=stat.st_mtime_ns)
+                continue
+            changed.append(file_path)
+        removed = [key for key in self.files if key not in seen]
+        return changed, removed
+
+    def record(self, file_path, ids, offsets=None):
+        """
+        Record a file as ingested with the IDs of the chunks it produced and, optionally,
+        the [start, end) character offsets of each chunk in the file.
+        """
+        stat = os.stat(file_path)
+        entry = {"size": stat.st_size, "mtime": stat.st_mtime_ns, "sha256": self.file_hash(file_path), "ids": list(ids)}
+        if offsets is not None:
+            entry["offsets"] = [list(offset) for offset in offsets]
+        self.files[self.key(file_path)] = entry
+
+    def source(self, entry_id):
+        """
+        Return the (file key, start, end) a chunk was read from, or None if no file produced it.
+        """
+        for key, entry in self.files.items():
+            if entry_id in entry["ids"]:
+                start, end = entry["offsets"][entry["ids"].index(entry_id)] if "offsets" in entry else (None, None)
+                return key, start, end
+        return None
+
+    def remove(self, key):
+        """
+        Forget a file and return the IDs of its chunks.
+        """
+        entry = self.files.pop(key, None)
+        return entry["ids"] if entry else []
@@ -0,0 +1,188 @@
+import os
+import time
+import threading
+from config import CLASSIFIER_MODEL, CLASSIFIER_BACKEND, DEVICE, EMBEDDING_CACHE_PATH
+
+def load_sentence_transformer(model_name):
+    """
+    Load a SentenceTransformer embedding model.
+    """
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name)
+
+def load_zero_shot_classifier(model_name):
+    """
+    Load a zero-shot classifier with the configured backend: the transformers pipeline on the
+    configured device, or a batched ZeroShotClassifier.
+    """
+    if CLASSIFIER_BACKEND != "pipeline":
+        from ZeroShotClassifier import ZeroShotClassifier
+        return ZeroShotClassifier(model_name, CLASSIFIER_BACKEND)
+    from transformers import pipeline
+    return pipeline("zero-shot-classification", model=model_name, device=0 if DEVICE == "mps" else -1)
+
+class ModelRegistry:
+    """
+    A process-wide registry that loads each model once, on first use, and hands out the
+    shared instance afterwards. Heavy libraries are only imported when a model is loaded,
+    so importing a module that needs a model costs nothing until the model is used.
+    The load time and resident size of every model are recorded for report().
+    Each model loads under its own lock, so a background warm-up of one model does not hold
+    up the first use of another. The registry also holds the process's connection to the
+    on-disk embedding cache.
+    """
+    def __init__(self, embedding_cache_path=EMBEDDING_CACHE_PATH):
+        """
+        Initialize an empty registry with the default loader for each model kind.
+        A falsy embedding_cache_path disables the embedding cache.
+        """
+        self.loaders = {
+            "sentence-transformer": load_sentence_transformer,
+            "zero-shot-classification": load_zero_shot_classifier,
+        }
+        self.models = {}
+        self.stats = {}
+        self.lock = threading.Lock()
+        self.key_locks = {}
+        self.embedding_cache_path = embedding_cache_path
+        self.cache = None
+
+    def get(self, kind, model_name):
+        """
+        Return the shared model of the given kind and name, loading it on first use.
+        """
+        key = (kind, model_name)
+        with self.key_lock(key):
+            if key not in self.models:
+                print(f"Loading {kind} model {model_name}...")
+                rss_before = resident_bytes()
+                start = time.perf_counter()
+                model = self.loaders[kind](model_name)
+                load_time = time.perf_counter() - start
+                rss_after = resident_bytes()
+                self.stats[key] = {
+                    "load_time": load_time,
+                    "parameter_bytes": parameter_bytes(model),
+                    "rss_bytes": rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+                }
+                self.models[key] = model
+                print(f"Loaded {model_name} in {load_time:.1f}s.")
+            return self.models[key]
+
+    def key_lock(self, key):
+        """
+        Return the lock that serializes loads of one model.
+        """
+        with self.lock:
+            return self.key_locks.setdefault(key, threading.Lock())
+
+    def sentence_transformer(self, model_name):
+        """
+        Return the shared SentenceTransformer for a model name.
+        """
+        return self.get("sentence-transformer", model_name)
+
+    def zero_shot_classifier(self, model_name=CLASSIFIER_MODEL):
+        """
+        Return the shared zero-shot classification pipeline for a model name.
+        """
+        return self.get("zero-shot-classification", model_name)
+
+    def embedding_cache(self):
+        """
+        Return the shared EmbeddingCache, opening it on first use, or None if it is disabled.
+        """
+        if not self.embedding_cache_path:
+            return None
+        with self.lock:
+            if self.cache is None:
+                from EmbeddingCache import EmbeddingCache
+                self.cache = EmbeddingCache(self.embedding_cache_path)
+            return self.cache
+
+    def lazy(self, kind, model_name):
+        """
+        Return a stand-in that loads the model on its first call, for module-level names.
+        """
+        return LazyModel(self, kind, model_name)
+
+    def warm_up(self, models, background=False):
+        """
+        Load the given (kind, model_name) pairs ahead of their first use. With background=True
+        they load in a daemon thread, which is returned, while the caller carries on.
+        """
+        def load_all():
+            for kind, model_name in models:
+                self.get(kind, model_name)
+        if not background:
+            load_all()
+            return None
+        thread = threading.Thread(target=load_all, daemon=True)
+        thread.start()
+        return thread
+
+    def is_loaded(self, kind, model_name):
+        """
+        Check whether a model has already been loaded.
+        """
+        return (kind, model_name) in self.models
+
+    def clear(self):
+        """
+        Drop every loaded model so it can be garbage collected.
+        """
+        with self.lock:
+            self.models.clear()
+            self.stats.clear()
+
+    def report(self):
+        """
+        Print the load time and resident size of every loaded model.
+        """
+        for (kind, model_name), stats in self.stats.items():
+            parameters = f"{stats['parameter_bytes'] / 2**20:.0f} MiB parameters" if stats['parameter_bytes'] is not None else "unknown size"
+            rss = f", +{stats['rss_bytes'] / 2**20:.0f} MiB RSS" if stats['rss_bytes'] is not None else ""
+            print(f"{kind} {model_name}: loaded in {stats['load_time']:.1f}s, {parameters}{rss}")
+
+class LazyModel:
+    """
+    A callable stand-in for a registry model that loads it on first use.
+    """
+    def __init__(self, registry, kind, model_name):
+        self.registry = registry
+        self.kind = kind
+        self.model_name = model_name
+
+    def load(self):
+        return self.registry.get(self.kind, self.model_name)
+
+    def __call__(self, *args, **kwargs):
+        return self.load()(*args, **kwargs)
+
+    def __getattr__(self, name):
+        # Introspection of private names (e.g. by mock.patch) must not trigger a load
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+def resident_bytes():
+    """
+    Return the resident set size of this process, or None where /proc is not available.
+    """
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+def parameter_bytes(model):
+    """
+    Return the size of a torch model's parameters, or None if the model is not a torch module.
+    """
+    module = getattr(model, "model", model)
+    if not hasattr(module, "parameters"):
+        return None
+    return sum(parameter.numel() * parameter.element_size() for parameter in module.parameters())
+
+# The registry shared by the whole process
+registry = ModelRegistry()
@@ -1,67 +1,292 @@
+import os
+import threading
 import pandas as pd
 import numpy as np
-import faiss
-from sentence_transformers import SentenceTransformer
-from ast import literal_eval
+from ModelRegistry import registry
+from EmbeddingStore import EmbeddingStore
+from VectorIndex import VectorIndex
+from LRUCache import LRUCache
+from config import INDEX_TYPE, EMBEDDING_DTYPE, RESCORE_FACTOR, EMBEDDING_MODEL
+from WriteAheadLog import WriteAheadLog, encode_embedding, decode_embedding
 
 class DataManager:
-    def __init__(self, csv_file, model_name='sentence-transformers/all-MiniLM-L6-v2', metric="cosine"):
+    def __init__(self, csv_file, model_name=EMBEDDING_MODEL, metric="cosine", mmr_fetch_k=None,
+                 compact_threshold=100, background_compaction=True, query_cache_size=256, query_cache_ttl=None,
+                 index_type=INDEX_TYPE, index_params=None, tombstone_threshold=0.2, embedding_dtype=EMBEDDING_DTYPE,
+                 rescore_factor=RESCORE_FACTOR):
         self.csv_file = csv_file
         self.model_name = model_name
-        self.model = SentenceTransformer(model_name)
-        self.df = self.load_csv()
+        self.mmr_fetch_k = mmr_fetch_k
+        self.compact_threshold = compact_threshold
+        self.tombstone_threshold = tombstone_threshold
+        self.rescore_factor = rescore_factor
+        self.background_compaction = background_compaction
+        self.compaction_thread = None
+        self.query_cache = LRUCache(query_cache_size, query_cache_ttl)
+        self.model = registry.sentence_transformer(model_name)
+        self.store = EmbeddingStore(csv_file, embedding_dtype)
+        self.df, self.embeddings = self.load_store()
+        # Added and updated embeddings by entry ID, merged into the matrix by reclaim_space() and compact()
+        self.pending = {}
+        # (rows, normalized float32 embeddings) of the live entries for full MMR scans, built on first use
+        self.normalized_live = None
+        self.next_entry_id = self.store.next_id
+        self.num_deleted = int(self.df['Deleted'].sum())
         self.metric = metric
+        VectorIndex.validate(index_type, index_params)
+        self.index_type = index_type
+        self.index_params = index_params
+        self.index_file = f"{self.store.base_path}.{'ip' if metric in ('cosine', 'mmr') else 'l2'}.faiss"
+        self.index = self.load_index()
+        self.wal = WriteAheadLog(f"{self.store.base_path}.wal")
+        self.replay_log()
 
-    def load_csv(self):
+    def load_store(self):
         print("Loading Database...")
-        df = pd.read_csv(self.csv_file)
-        df['Embeddings'] = df['Embeddings'].apply(literal_eval).apply(np.array)
+        df, embeddings = self.store.load()
         print("Database Loaded.")
-        return df
+        return df, embeddings
 
-    def save_csv(self):
-        print("Saving CSV...")
-        self.df['Embeddings'] = self.df['Embeddings'].apply(lambda x: x.tolist() if isinstance(x, np.ndarray) else x)
-        self.df.to_csv(self.csv_file, index=False)
-        print("CSV Saved.")
+    def save_store(self, df=None, embeddings=None, index=None, segments=(), next_id=None):
+        print("Saving Database...")
+        self.store.save(self.df if df is None else df, self.merge_pending() if embeddings is None else embeddings, next_id or self.next_entry_id)
+        (self.index if index is None else index).save(self.index_file)
+        self.wal.discard(segments)
+        print("Database Saved.")
+
+    def replay_log(self):
+        # Re-apply changes logged after the last compaction, e.g. before a crash
+        if len(self.wal) or self.wal.sealed_segments():
+            print("Replaying logged changes...")
+            for record in self.wal.replay():
+                self.apply_change(record)
+
+    def apply_change(self, record):
+        # Changes are keyed by entry ID so replaying a record twice is harmless
+        entry_id = record['id']
+        exists = entry_id in self.df.index
+        if exists and self.df.at[entry_id, 'Deleted']:
+            return
+        self.normalized_live = None
+        if record['op'] == 'delete':
+            if exists:
+                # Deletes only mark a tombstone; space is reclaimed by reclaim_space()
+                self.df.at[entry_id, 'Deleted'] = True
+                self.num_deleted += 1
+                self.index.remove([entry_id])
+            return
+        embedding = decode_embedding(record['embedding'])
+        # The loaded embeddings are a read-only memory map, so new vectors go to the side buffer
+        # instead of copying the whole matrix on every change
+        self.pending[entry_id] = embedding.astype(self.embeddings.dtype)
+        if exists:
+            self.df.at[entry_id, 'Text'] = record['text']
+            self.index.update([entry_id], embedding)
+        else:
+            new_entry = pd.DataFrame([{'Text': record['text'], 'Deleted': False}], index=pd.Index([entry_id], name='Index'))
+            self.df = pd.concat([self.df, new_entry])
+            self.next_entry_id = max(self.next_entry_id, entry_id + 1)
+            self.index.add([entry_id], embedding)
+
+    def log_change(self, op, entry_id, text=None, embedding=None):
+        record = {'op': op, 'id': int(entry_id)}
+        if op != 'delete':
+            record.update(text=text, embedding=encode_embedding(embedding))
+        self.wal.append(record)
+        self.apply_change(record)
+        if self.num_deleted > self.tombstone_threshold * len(self.df):
+            self.reclaim_space()
+        if self.index.layout_key() != self.expected_layout(self.index.index_type):
+            # The profile crossed the size threshold for an approximate index or for PQ training
+            self.index = self.build_index(self.index.index_type)
+        if len(self.wal) >= self.compact_threshold:
+            self.compact(background=self.background_compaction)
+
+    def compact(self, background=False):
+        # Fold the log into the store; appends made while a snapshot is written go to a fresh log
+        self.wait_for_compaction()
+        segments = self.wal.rotate()
+        if not segments:
+            return
+        print("Compacting change log into database...")
+        if not self.index.is_clean() and not self.index.purge():
+            # Indexes that cannot remove vectors are rebuilt without the tombstoned entries
+            self.index = self.build_index(self.index.index_type)
+        snapshot = (self.df.copy(), self.merge_pending(), self.index.copy(), segments, self.next_entry_id)
+        if background:
+            self.compaction_thread = threading.Thread(target=self.save_store, args=snapshot)
+            self.compaction_thread.start()
+        else:
+            self.save_store(*snapshot)
+
+    def wait_for_compaction(self):
+        if self.compaction_thread is not None:
+            self.compaction_thread.join()
+            self.compaction_thread = None
+
+    def close(self):
+        self.compact()
+        self.wal.close()
+        stats = self.query_cache.stats()
+        print(f"Query embedding cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%} hit rate)")
+        embedding_cache = registry.embedding_cache()
+        if embedding_cache:
+            stats = embedding_cache.stats()
+            print(f"On-disk embedding cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%} hit rate)")
+
+    def reclaim_space(self):
+        # Physically drop tombstoned entries once they pass tombstone_threshold of the profile
+        print(f"Reclaiming space of {self.num_deleted} deleted entries...")
+        live = ~self.df['Deleted'].to_numpy()
+        self.embeddings = self.vectors(np.flatnonzero(live))
+        self.pending = {}
+        self.df = self.df[live]
+        self.num_deleted = 0
+        self.normalized_live = None
+        if not self.index.purge():
+            self.index = self.build_index(self.index.index_type)
+
+    def vectors(self, rows):
+        # Embeddings of the given row positions, reading added and updated entries from the side buffer
+        rows = np.asarray(rows, dtype=np.int64)
+        dim = self.model.get_sentence_embedding_dimension()
+        vectors = np.empty((len(rows), dim), dtype=self.embeddings.dtype)
+        stored = rows < len(self.embeddings)
+        if stored.any():
+            vectors[stored] = self.embeddings[rows[stored]]
+        if self.pending:
+            ids = self.df.index.values[rows]
+            buffered = np.isin(ids, np.fromiter(self.pending, dtype=np.int64, count=len(self.pending)))
+            if buffered.any():
+                vectors[buffered] = np.stack([self.pending[entry_id] for entry_id in ids[buffered]])
+        return vectors
+
+    def merge_pending(self):
+        # Fold the side buffer into a matrix row-aligned with self.df; the previous matrix is left untouched
+        if self.pending:
+            self.embeddings = self.vectors(np.arange(len(self.df)))
+            self.pending = {}
+        return self.embeddings
+
+    def num_live(self):
+        return len(self.df) - self.num_deleted
+
+    def live_rows(self):
+        return np.flatnonzero(~self.df['Deleted'].to_numpy()) if self.num_deleted else np.arange(len(self.df))
+
+    def expected_layout(self, current_type=None):
+        # With 'auto', an existing ANN index is kept until the profile shrinks well below the threshold
+        return VectorIndex.layout(self.index_type, self.num_live(), self.index_params, current_type)
+
+    def build_index(self, current_type=None):
+        print("Building vector index...")
+        dim = self.model.get_sentence_embedding_dimension()
+        rows = self.live_rows()
+        index_type = VectorIndex.resolve_index_type(self.index_type, len(rows), current_type)
+        return VectorIndex.build(self.df.index.values[rows], self.vectors(rows), dim, self.metric, index_type, self.index_params)
+
+    def load_index(self):
+        # Reuse the persisted index unless it is missing or older than the store
+        current_type = None
+        if os.path.exists(self.index_file) and os.path.getmtime(self.index_file) >= self.store.mtime():
+            index = VectorIndex.load(self.index_file, self.metric, self.index_params)
+            live_ids = self.df.index.values[self.live_rows()]
+            current_type = index.index_type
+            if (index.layout_key() == self.expected_layout(current_type)
+                    and len(index) == len(live_ids) and set(index.ids()) == set(live_ids)):
+                print("Vector index loaded.")
+                return index
+        index = self.build_index(current_type)
+        index.save(self.index_file)
+        print(f"Vector index saved to {self.index_file}")
+        return index
+
+    def search_index(self, query_embeddings, k):
+        # Quantized indexes only approximate the scores, so re-rank a wider candidate pool
+        # against the stored embeddings, reading just the candidate rows
+        if self.index.quantization is None or not self.rescore_factor:
+            return self.index.search(query_embeddings, k)
+        _, candidate_ids = self.index.search(query_embeddings, k * self.rescore_factor)
+        rows = self.df.index.get_indexer(candidate_ids.ravel())
+        candidates = np.asarray(self.vectors(np.maximum(rows, 0)), dtype=np.float32)
+        candidates = candidates.reshape(*candidate_ids.shape, -1)
+        return self.index.rescore(query_embeddings, candidate_ids, candidates, k)
+
+    def next_id(self):
+        # IDs are never reused, even after the highest entry is deleted and reclaimed
+        return self.next_entry_id
+
+    def row_of(self, entry_id):
+        return self.df.index.get_loc(entry_id)
 
     def encode_text(self, text):
-        print(f"Encoding text: {text[:30]}...")
-        embedding = self.model.encode([text], convert_to_tensor=True).cpu().numpy()[0]
-        embedding = np.ascontiguousarray(embedding, dtype=np.float32)
-        print(f"Text encoded. Embedding shape: {embedding.shape}")
-        return embedding
+        return self.encode_texts([text])[0]
+
+    def encode_texts(self, texts):
+        # Serve cached embeddings and encode all misses in a single model call
+        cache_keys = [(self.model_name, " ".join(text.split())) for text in texts]
+        embeddings = [self.query_cache.get(cache_key) for cache_key in cache_keys]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            encoded = self.encode_uncached([texts[i] for i in missing], [cache_keys[i][1] for i in missing])
+            for i, embedding in zip(missing, encoded):
+                embeddings[i] = embedding
+                self.query_cache.put(cache_keys[i], embedding)
+        # Return a new matrix so callers cannot modify the cached vectors
+        return np.vstack(embeddings) if embeddings else np.empty((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+
+    def encode_uncached(self, texts, normalized_texts):
+        # Texts missing from the in-memory cache are looked up in the shared on-disk cache before the model
+        embedding_cache = registry.embedding_cache()
+        cached = embedding_cache.get_many(self.model_name, normalized_texts) if embedding_cache else [None] * len(texts)
+        missing = [i for i, embedding in enumerate(cached) if embedding is None]
+        if missing:
+            print(f"Encoding text: {texts[missing[0]][:30]}..." if len(missing) == 1 else f"Encoding {len(missing)} texts...")
+            encoded = self.model.encode([texts[i] for i in missing], convert_to_tensor=True).cpu().numpy()
+            encoded = np.ascontiguousarray(encoded, dtype=np.float32)
+            print(f"Text encoded. Embedding shape: {encoded.shape[1:]}")
+            if embedding_cache:
+                embedding_cache.put_many(self.model_name, [normalized_texts[i] for i in missing], encoded)
+            for i, embedding in zip(missing, encoded):
+                cached[i] = embedding
+        return cached
 
     def save_entry(self, text):
         print(f"Saving new input: {text}")
         new_embedding = self.encode_text(text)
-        new_entry = pd.DataFrame([{'Text': text, 'Embeddings': new_embedding.tolist()}])
-        self.df = pd.concat([self.df, new_entry], ignore_index=True)
-        self.save_csv()
+        self.log_change('add', self.next_id(), text, new_embedding)
         print("Entry saved to profile.")
 
     def retrieve_entries(self, query, k=5, return_indices=False):
         print(f"Retrieving entries using {self.metric} metric for query: {query[:50]}...")
         query_embedding = self.encode_text(query)
-        embeddings = np.vstack(self.df['Embeddings'].values)
-        
-        if self.metric == 'cosine':
-            embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
-            query_embedding = np.ascontiguousarray(query_embedding, dtype=np.float32)
-            faiss.normalize_L2(embeddings)
-            faiss.normalize_L2(query_embedding.reshape(1, -1))
-            index = faiss.IndexFlatIP(embeddings.shape[1])
-        elif self.metric == 'mmr':
+
+        if self.metric == 'mmr':
             return self.mmr(query_embedding, top_k=k, return_indices=return_indices)
-        else:
-            index = faiss.IndexFlatL2(embeddings.shape[1])
-        
-        index.add(embeddings)
-        D, I = index.search(query_embedding.reshape(1, -1), k)
+
+        D, I = self.search_index(query_embedding, k)
+        ids = I[0][I[0] >= 0]
         if return_indices:
-            return I[0], [self.df.iloc[i]['Text'] for i in I[0]]
+            return ids, [self.df.at[i, 'Text'] for i in ids]
         else:
-            return [self.df.iloc[i]['Text'] for i in I[0]]
+            return [self.df.at[i, 'Text'] for i in ids]
+
+    def retrieve_entries_batch(self, queries, k=5, metric=None, return_indices=False):
+        metric = metric or self.metric
+        if (metric in ('cosine', 'mmr')) != self.index.normalize:
+            raise ValueError(f"Metric '{metric}' is not supported by the '{self.metric}' index of this DataManager.")
+        print(f"Retrieving entries using {metric} metric for {len(queries)} queries...")
+        query_embeddings = self.encode_texts(queries)
+
+        if metric == 'mmr':
+            selections = self.mmr_rows(query_embeddings, top_k=k)
+            indices = [list(self.df.index[selected]) for selected in selections]
+        else:
+            D, I = self.search_index(query_embeddings, k)
+            indices = [list(ids[ids >= 0]) for ids in I]
+
+        texts = [[self.df.at[i, 'Text'] for i in ids] for ids in indices]
+        return list(zip(indices, texts)) if return_indices else texts
 
     def update_entry(self, query, k=1):
         retrieved_indices, top_k_texts = self.retrieve_entries(query, k, return_indices=True)
@@ -80,10 +305,8 @@ class DataManager:
                 index_to_update = retrieved_indices[int(selection) - 1]
                 updated_text = input("Enter the updated text: ")
                 updated_embedding = self.encode_text(updated_text)
-                self.df.at[index_to_update, 'Text'] = updated_text
-                self.df.at[index_to_update, 'Embeddings'] = updated_embedding.tolist()
-                self.save_csv()
-                print("Entry updated in CSV.")
+                self.log_change('update', index_to_update, updated_text, updated_embedding)
+                print("Entry updated in profile.")
                 break
             else:
                 print("Invalid selection. Please try again.")
@@ -97,46 +320,76 @@ class DataManager:
 
     def delete_entry(self, query, k=1):
         print(f"Deleting entry for query: {query[:50]}...")
-        top_k_texts = self.retrieve_entries(query, k)
+        retrieved_indices, top_k_texts = self.retrieve_entries(query, k, return_indices=True)
         print("Top 1 similar entry:")
         print(top_k_texts[0])
         
         confirmation = input("Do you want to delete this entry? (yes/no): ").strip().lower()
         if confirmation == 'yes':
-            index_to_remove = self.df[self.df['Text'] == top_k_texts[0]].index[0]
-            self.df = self.df.drop(index_to_remove).reset_index(drop=True)
-            self.save_csv()
-            print("Entry deleted from CSV.")
+            self.log_change('delete', retrieved_indices[0])
+            print("Entry deleted from profile.")
         else:
             print("Deletion cancelled.")
 
-    def mmr(self, query_embedding, top_k=5, lambda_param=0.5, return_indices=False):
+    def mmr(self, query_embedding, top_k=5, lambda_param=0.5, return_indices=False, fetch_k=None):
         print("Running MMR...")
-        doc_embeddings = np.vstack(self.df['Embeddings'].values)
-        query_embedding = query_embedding / np.linalg.norm(query_embedding)
-        doc_embeddings = doc_embeddings / np.linalg.norm(doc_embeddings, axis=1, keepdims=True)
-        
-        sim_scores = np.dot(doc_embeddings, query_embedding.T).flatten()
-        
-        selected = []
-        selected_scores = []
-        
-        while len(selected) < top_k:
-            if not selected:
-                selected_idx = np.argmax(sim_scores)
-            else:
-                mmr_scores = []
-                for idx in range(len(doc_embeddings)):
-                    if idx not in selected:
-                        diversity = max([np.dot(doc_embeddings[idx], doc_embeddings[sel_idx]) for sel_idx in selected])
-                        mmr_score = lambda_param * sim_scores[idx] - (1 - lambda_param) * diversity
-                        mmr_scores.append((mmr_score, idx))
-                selected_idx = max(mmr_scores)[1]
-            
-            selected.append(selected_idx)
-            selected_scores.append(sim_scores[selected_idx])
-        
+        selected = self.mmr_rows(query_embedding, top_k, lambda_param, fetch_k)[0]
+
         if return_indices:
-            return selected, [self.df.iloc[i]['Text'] for i in selected]
+            return list(self.df.index[selected]), [self.df.iloc[i]['Text'] for i in selected]
         else:
             return [self.df.iloc[i]['Text'] for i in selected]
+
+    def mmr_rows(self, query_embeddings, top_k=5, lambda_param=0.5, fetch_k=None):
+        # Returns the selected row positions for each query
+        fetch_k = fetch_k or self.mmr_fetch_k
+        query_embeddings = np.atleast_2d(query_embeddings)
+        query_embeddings = query_embeddings / np.linalg.norm(query_embeddings, axis=1, keepdims=True)
+        if fetch_k and fetch_k < self.num_live():
+            # Diversify over the index's nearest candidates instead of the whole corpus.
+            # Rows stay in corpus order so ties resolve the same way as a full scan.
+            _, candidate_ids = self.index.search(query_embeddings, fetch_k)
+            selections = []
+            for query_embedding, ids in zip(query_embeddings, candidate_ids):
+                rows = np.sort(self.df.index.get_indexer(ids[ids >= 0]))
+                doc_embeddings = np.asarray(self.vectors(rows), dtype=np.float32)
+                doc_embeddings = doc_embeddings / np.linalg.norm(doc_embeddings, axis=1, keepdims=True)
+                selections.append(rows[maximal_marginal_relevance(query_embedding, doc_embeddings, top_k, lambda_param)])
+            return selections
+
+        # Normalize the live corpus once and share it across all queries until the profile changes
+        if self.normalized_live is None:
+            rows = self.live_rows()
+            doc_embeddings = np.asarray(self.vectors(rows) if self.num_deleted or self.pending else self.embeddings, dtype=np.float32)
+            self.normalized_live = (rows, doc_embeddings / np.linalg.norm(doc_embeddings, axis=1, keepdims=True))
+        rows, doc_embeddings = self.normalized_live
+        return [rows[maximal_marginal_relevance(query_embedding, doc_embeddings, top_k, lambda_param)] for query_embedding in query_embeddings]
+
+def maximal_marginal_relevance(query_embedding, doc_embeddings, top_k=5, lambda_param=0.5):
+    """
+    Select top_k rows of normalized doc_embeddings by Maximal Marginal Relevance.
+    Keeps a running max-similarity vector against the selected rows, so each pick
+    costs one matrix-vector product. Ties go to the highest row, as with max() over
+    (score, index) pairs.
+    """
+    num_docs = len(doc_embeddings)
+    top_k = min(top_k, num_docs)
+    if top_k <= 0:
+        return np.empty(0, dtype=np.int64)
+
+    sim_scores = np.dot(doc_embeddings, query_embedding.T).flatten()
+    relevance = lambda_param * sim_scores
+    selected = [int(np.argmax(sim_scores))]
+    available = np.ones(num_docs, dtype=bool)
+    available[selected[0]] = False
+    max_similarity = np.dot(doc_embeddings, doc_embeddings[selected[0]])
+
+    while len(selected) < top_k:
+        mmr_scores = relevance - (1 - lambda_param) * max_similarity
+        mmr_scores[~available] = -np.inf
+        selected_idx = num_docs - 1 - int(np.argmax(mmr_scores[::-1]))
+        selected.append(selected_idx)
+        available[selected_idx] = False
+        np.maximum(max_similarity, np.dot(doc_embeddings, doc_embeddings[selected_idx]), out=max_similarity)
+
+    return np.array(selected, dtype=np.int64)
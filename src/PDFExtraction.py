@@ -1,7 +1,17 @@
 import fitz  
-import pdfplumber
 import os
+import json
+import shutil
+import time
+import hashlib
+import multiprocessing
 import pandas as pd
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from config import PDF_WORKERS, PDF_PAGES_PER_TASK, TABLE_MIN_LINES
+
+# Lines within this many points of horizontal or vertical count as ruling lines, as in PyMuPDF's table finder
+SNAP_TOLERANCE = 3
 
 class PDFExtraction:
     """
@@ -19,70 +29,242 @@ class PDFExtraction:
         self.image_dir = os.path.join(self.base_dir, "images")
         self.table_dir = os.path.join(self.base_dir, "tables")
         self.text_file = os.path.join(self.text_dir, f"{self.pdf_name}.txt")
+        # Image bytes are stored once under their content hash, shared by all PDFs in the base directory,
+        # and each PDF's manifest lists the stored images on each of its pages
+        self.image_store_dir = os.path.join(base_extraction_dir, "image_store")
+        self.image_manifest = os.path.join(self.image_dir, "manifest.json")
         
         # Create necessary directories
         os.makedirs(self.text_dir, exist_ok=True)
         os.makedirs(self.image_dir, exist_ok=True)
         os.makedirs(self.table_dir, exist_ok=True)
+        os.makedirs(self.image_store_dir, exist_ok=True)
+
+    def extract_pages(self, text=True, images=True, tables=True, pages=None, part=None):
+        """
+        Extract the selected artifacts from the PDF in one pass: the document is opened once and
+        each page is parsed once for its text, images and tables. Results are written out page by
+        page, so memory use does not grow with the length of the document.
+        pages restricts extraction to a range of page numbers. With part, the text and image
+        manifest are written to part files instead, for extract_pdfs to merge.
+        Returns the number of pages, images and tables extracted, and the pages searched for tables,
+        the pages skipped by the table pre-check, and the seconds spent on each.
+        """
+        counts = empty_counts()
+        # Stored image path of every xref seen so far: images repeated across pages are decoded once
+        stored = {}
+        manifest = {}
+        doc = fitz.open(self.pdf_path)
+        try:
+            with open(part_file(self.text_file, part), "w", encoding="utf-8") if text else nullcontext() as text_file:
+                for page_number, page in enumerate(doc) if pages is None else ((n, doc[n]) for n in pages):
+                    if text:
+                        text_file.write(page.get_text())
+                    if images:
+                        page_images = self.save_page_images(doc, page, stored)
+                        if page_images:
+                            manifest[str(page_number + 1)] = [os.path.relpath(path, self.image_dir) for path in page_images]
+                        counts["images"] += len(page_images)
+                    if tables:
+                        started = time.perf_counter()
+                        paths = page.get_drawings()
+                        checked = time.perf_counter()
+                        counts["table_check_seconds"] += checked - started
+                        if self.looks_tabular(paths):
+                            counts["tables"] += self.save_page_tables(page, page_number, paths)
+                            counts["table_pages"] += 1
+                            counts["table_seconds"] += time.perf_counter() - checked
+                        else:
+                            counts["table_pages_skipped"] += 1
+                    counts["pages"] += 1
+        finally:
+            doc.close()
+        if images:
+            with open(part_file(self.image_manifest, part), "w", encoding="utf-8") as file:
+                json.dump(manifest, file)
+        return counts
+
+    def save_page_images(self, doc, page, stored):
+        """
+        Save the images of a page to the image store, skipping xrefs already in stored, a dict of
+        xref to stored path. Returns the stored paths of the page's images, in page order.
+        """
+        page_images = []
+        for img in page.get_images():
+            xref = img[0]
+            if xref not in stored:
+                base_image = doc.extract_image(xref)
+                stored[xref] = self.store_image(base_image["image"], base_image["ext"])
+            page_images.append(stored[xref])
+        return page_images
+
+    def store_image(self, image_bytes, image_ext):
+        """
+        Save image bytes to the image store under their content hash, unless an identical image is
+        already there, e.g. from another page range or PDF. Returns the path of the stored image.
+        """
+        image_path = os.path.join(self.image_store_dir, f"{hashlib.sha256(image_bytes).hexdigest()}.{image_ext}")
+        if not os.path.exists(image_path):
+            # Written under a temporary name first, so parallel extractions never see a partial image
+            temp_path = f"{image_path}.{os.getpid()}.tmp"
+            with open(temp_path, "wb") as image_file:
+                image_file.write(image_bytes)
+            os.replace(temp_path, image_path)
+        return image_path
+
+    def looks_tabular(self, paths, min_lines=None):
+        """
+        Cheap check of whether a page can contain a table, given its vector graphics from
+        page.get_drawings(). The table finder builds tables from horizontal and vertical ruling
+        lines, so a page with fewer than min_lines of either cannot hold one. The lines are
+        counted the way the finder decomposes paths, erring on the side of too many.
+        """
+        min_lines = TABLE_MIN_LINES if min_lines is None else min_lines
+        horizontal = vertical = 0
+        for path in paths:
+            items = path["items"]
+            segments = []
+            for item in items:
+                if item[0] == "l":
+                    segments.append(item[1:])
+                elif item[0] == "re":
+                    rect = item[1]
+                    segments += [(rect.tl, rect.tr), (rect.bl, rect.br), (rect.tl, rect.bl), (rect.tr, rect.br)]
+                elif item[0] == "qu":
+                    quad = item[1]
+                    segments += [(quad.ul, quad.ur), (quad.ll, quad.lr), (quad.ul, quad.ll), (quad.ur, quad.lr)]
+            if path["closePath"] and items and items[0][0] == "l" and items[-1][0] == "l":
+                segments.append((items[-1][2], items[0][1]))
+            for p1, p2 in segments:
+                horizontal += abs(p1.y - p2.y) <= SNAP_TOLERANCE
+                vertical += abs(p1.x - p2.x) <= SNAP_TOLERANCE
+            if horizontal >= min_lines and vertical >= min_lines:
+                return True
+        return horizontal >= min_lines and vertical >= min_lines
+
+    def save_page_tables(self, page, page_number, paths=None):
+        """
+        Save the tables of a page as CSV files in the tables directory. paths passes the page's
+        vector graphics on to the table finder if they were already read. Returns the number of tables saved.
+        """
+        saved = 0
+        for j, table in enumerate(page.find_tables(paths=paths).tables):
+            rows = table.extract()
+            if rows:
+                df = pd.DataFrame(rows[1:], columns=rows[0])
+                table_path = os.path.join(self.table_dir, f"table_page{page_number+1}_{j+1}.csv")
+                df.to_csv(table_path, index=False)
+                saved += 1
+        return saved
 
     def extract_text(self):
         """
         Extract text from the PDF and save it to a text file.
         """
-        doc = fitz.open(self.pdf_path)
-        text = ""
-        for page in doc:
-            text += page.get_text()
-        
-        with open(self.text_file, "w", encoding="utf-8") as file:
-            file.write(text)
-        
-        # print(f"Text extracted to file: {self.text_file}")
-        return text
+        self.extract_pages(images=False, tables=False)
+        with open(self.text_file, "r", encoding="utf-8") as file:
+            return file.read()
 
     def extract_images(self):
         """
-        Extract images from the PDF and save them to the images directory.
+        Extract images from the PDF into the image store and write the per-page manifest to the images directory.
         """
-        doc = fitz.open(self.pdf_path)
-        for page_number in range(len(doc)):
-            for img_index, img in enumerate(doc.get_page_images(page_number)):
-                xref = img[0]
-                base_image = doc.extract_image(xref)
-                image_bytes = base_image["image"]
-                image_ext = base_image["ext"]
-                image_path = os.path.join(self.image_dir, f"page{page_number+1}_img{img_index+1}.{image_ext}")
-                with open(image_path, "wb") as image_file:
-                    image_file.write(image_bytes)
-        
-        # print(f"Images extracted to directory: {self.image_dir}")
+        self.extract_pages(text=False, tables=False)
 
     def extract_tables(self):
         """
         Extract tables from the PDF and save them as CSV files in the tables directory.
         """
-        with pdfplumber.open(self.pdf_path) as pdf:
-            for i, page in enumerate(pdf.pages):
-                tables = page.extract_tables()
-                for j, table in enumerate(tables):
-                    if table:
-                        df = pd.DataFrame(table[1:], columns=table[0])
-                        table_path = os.path.join(self.table_dir, f"table_page{i+1}_{j+1}.csv")
-                        df.to_csv(table_path, index=False)
-        
-        # print(f"Tables extracted to directory: {self.table_dir}")
+        self.extract_pages(text=False, images=False)
 
     def extract_all(self):
         """
-        Extract text, images, and tables from the PDF and save them to their respective directories.
+        Extract text, images, and tables from the PDF in a single pass and save them to their
+        respective directories. Returns the path of the text file.
         """
-        text = self.extract_text()
-        self.extract_images()
-        self.extract_tables()
-        return text
+        self.extract_pages()
+        return self.text_file
+
+def empty_counts():
+    """
+    Return zeroed counts of the artifacts extracted from a PDF and of the table pre-check.
+    """
+    return {"pages": 0, "images": 0, "tables": 0, "table_pages": 0, "table_pages_skipped": 0, "table_seconds": 0.0, "table_check_seconds": 0.0}
+
+def extract_page_range(pdf_path, base_extraction_dir, start, stop):
+    """
+    Extract pages start to stop of a PDF in a worker process. Images and tables are saved as
+    usual, and the text and image manifest are written to part files for extract_pdfs to merge.
+    Returns the page, image and table counts.
+    """
+    pdf_extractor = PDFExtraction(pdf_path, base_extraction_dir)
+    return pdf_extractor.extract_pages(pages=range(start, stop), part=start)
+
+def part_file(path, start):
+    """
+    Return the path of the part file holding the output for the page range starting at start,
+    or path itself if start is None.
+    """
+    return path if start is None else f"{path}.{start:06d}.part"
+
+def extract_pdfs(pdf_paths, base_extraction_dir, max_workers=PDF_WORKERS, pages_per_task=PDF_PAGES_PER_TASK):
+    """
+    Extract text, images and tables from a batch of PDFs across a pool of worker processes.
+    Documents longer than pages_per_task pages are split into page ranges, and all ranges of all
+    documents are spread over a pool of at most one worker per range; a single range is extracted
+    in this process. The text of each document is merged back from its ranges in page order,
+    so it is identical to the output of extract_all.
+    Returns the PDFExtraction of each document, in the order of pdf_paths.
+    """
+    pdf_extractors = [PDFExtraction(pdf_path, base_extraction_dir) for pdf_path in pdf_paths]
+    page_ranges = []
+    for pdf_extractor in pdf_extractors:
+        with fitz.open(pdf_extractor.pdf_path) as doc:
+            page_count = len(doc)
+        page_ranges.append([(start, min(start + pages_per_task, page_count)) for start in range(0, page_count, pages_per_task)])
+    # The pool forks a worker per submitted task until it is full, so never start more workers than ranges
+    max_workers = min(max_workers, sum(len(ranges) for ranges in page_ranges))
+    if max_workers <= 1:
+        for pdf_extractor in pdf_extractors:
+            report(pdf_extractor, pdf_extractor.extract_pages())
+        return pdf_extractors
+
+    # Spawn fresh workers rather than fork: forking while another thread (e.g. the background model
+    # warm-up) holds torch or tokenizer locks can deadlock the children
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        # Ranges are submitted document by document, so the first documents finish and are merged first
+        futures = [[(start, executor.submit(extract_page_range, pdf_extractor.pdf_path, base_extraction_dir, start, stop)) for start, stop in ranges]
+                   for pdf_extractor, ranges in zip(pdf_extractors, page_ranges)]
+        for pdf_extractor, ranges in zip(pdf_extractors, futures):
+            counts = empty_counts()
+            manifest = {}
+            with open(pdf_extractor.text_file, "wb") as text_file:
+                for start, future in ranges:
+                    for key, value in future.result().items():
+                        counts[key] += value
+                    with open(part_file(pdf_extractor.text_file, start), "rb") as part:
+                        shutil.copyfileobj(part, text_file)
+                    with open(part_file(pdf_extractor.image_manifest, start), encoding="utf-8") as part:
+                        manifest.update(json.load(part))
+                    os.remove(part_file(pdf_extractor.text_file, start))
+                    os.remove(part_file(pdf_extractor.image_manifest, start))
+            with open(pdf_extractor.image_manifest, "w", encoding="utf-8") as file:
+                json.dump(manifest, file)
+            report(pdf_extractor, counts)
+    return pdf_extractors
+
+def report(pdf_extractor, counts):
+    """
+    Print the page, image and table counts extracted from a PDF, and the pages the table pre-check
+    skipped. The time saved is estimated from the mean table search time of the pages searched.
+    """
+    print(f"Extracted {counts['pages']} pages, {counts['images']} images and {counts['tables']} tables from {pdf_extractor.pdf_path}")
+    if counts["table_pages_skipped"]:
+        saved = counts["table_pages_skipped"] * counts["table_seconds"] / max(counts["table_pages"], 1) - counts["table_check_seconds"]
+        print(f"Table search skipped on {counts['table_pages_skipped']} of {counts['pages']} pages without ruling lines, saving about {max(saved, 0):.1f}s")
 
 # Usage example
 # pdf_path = "pranay.pdf"  # Path to the uploaded PDF
 # pdf_extractor = PDFExtraction(pdf_path, base_extraction_dir='pdf_extractions')
-# extracted_text = pdf_extractor.extract_all()
-# print(extracted_text)
+# text_file = pdf_extractor.extract_all()
+# print(text_file)
@@ -14,22 +14,24 @@ class ProfileProcessor:
         self.llm_manager = llm_manager
         self.directory = directory
 
-    def collect_texts(self):
+    def iter_texts(self):
         """
-        Collect text from all .txt files in the specified directory and its subdirectories.
+        Yield the text of each .txt file in the specified directory and its subdirectories.
         """
-        master_text = ""
         for root, _, files in os.walk(self.directory):
-            # print(files)
             for file in files:
                 if file.endswith(".txt"):
                     file_path = os.path.join(root, file)
                     with open(file_path, 'r') as f:
                         text = f.read()
                     print(f"Processing {file_path}...")
-                    master_text += f'\n {text} \n'
-        # print("Master text", master_text)
-        return master_text.strip()
+                    yield text
+
+    def collect_texts(self):
+        """
+        Collect text from all .txt files in the specified directory and its subdirectories.
+        """
+        return "".join(f'\n {text} \n' for text in self.iter_texts()).strip()
 
     def process_profile(self):
         """
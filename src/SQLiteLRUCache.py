@@ -0,0 +1,102 @@
+import os
+import math
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+class SQLiteLRUCache:
+    """
+    Base class of the persistent caches shared by every user and run on the machine. Entries
+    live in one table of an SQLite database in WAL mode, so several processes can read and
+    write it at once; writes take the database lock for one short transaction. Triggers keep
+    the entry count and total size in a one-row usage table, and the total size is kept under
+    max_bytes by evicting the least recently used entries.
+
+    Subclasses set TABLE, the COLUMNS of its schema (which must include last_used), the KEY
+    columns, and SIZE, the SQL size of a row given as a template over {row} (NEW or OLD).
+    """
+    TABLE = None
+    COLUMNS = None
+    KEY = None
+    SIZE = None
+
+    def __init__(self, path, max_bytes, timeout=30.0):
+        """
+        Open (or create) the cache database at path.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.connection = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        table = self.TABLE
+        with self.lock:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.executescript(f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    {self.COLUMNS},
+                    PRIMARY KEY ({", ".join(self.KEY)})
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS {table}_last_used ON {table} (last_used);
+                CREATE TABLE IF NOT EXISTS usage (id INTEGER PRIMARY KEY CHECK (id = 0), entries INTEGER NOT NULL, bytes INTEGER NOT NULL);
+                INSERT OR IGNORE INTO usage VALUES (0, 0, 0);
+                CREATE TRIGGER IF NOT EXISTS {table}_insert AFTER INSERT ON {table}
+                    BEGIN UPDATE usage SET entries = entries + 1, bytes = bytes + {self.SIZE.format(row="NEW")} WHERE id = 0; END;
+                CREATE TRIGGER IF NOT EXISTS {table}_delete AFTER DELETE ON {table}
+                    BEGIN UPDATE usage SET entries = entries - 1, bytes = bytes - {self.SIZE.format(row="OLD")} WHERE id = 0; END;
+            """)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Run the writes of the block in one transaction, evicting the least recently used
+        entries before it commits if the cache is over its size.
+        """
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.connection
+                self.evict()
+                self.connection.execute("COMMIT")
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+
+    def usage(self):
+        return self.connection.execute("SELECT entries, bytes FROM usage").fetchone()
+
+    def evict(self):
+        # Evict down to 90% of the cap so that eviction does not run on every insert
+        count, size = self.usage()
+        if size <= self.max_bytes:
+            return
+        target = int(self.max_bytes * 0.9)
+        key = ", ".join(self.KEY)
+        while size > target and count:
+            evicted = max(1, math.ceil((size - target) / (size / count)))
+            self.connection.execute(
+                f"DELETE FROM {self.TABLE} WHERE ({key}) IN (SELECT {key} FROM {self.TABLE} ORDER BY last_used LIMIT ?)", (evicted,)
+            )
+            count, size = self.usage()
+
+    def stats(self):
+        """
+        Return the hit/miss counters of this process, the hit rate, and the size of the shared cache.
+        """
+        with self.lock:
+            count, size = self.usage()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": count,
+            "bytes": size,
+        }
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
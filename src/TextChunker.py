@@ -0,0 +1,135 @@
+import bisect
+import operator
+import itertools
+from functools import lru_cache
+from config import CHUNK_SIZE, CHUNK_OVERLAP
+
+class TextChunker:
+    """
+    Splits text into overlapping chunks with the same output as langchain's CharacterTextSplitter:
+    the text is split on a literal separator, empty pieces are dropped, and the pieces are merged
+    back into chunks of at most chunk_size, each starting with up to chunk_overlap of the previous
+    chunk. Lengths are measured with length_function, characters by default.
+
+    Text can be fed as a stream of blocks, e.g. a file read piece by piece, and every chunk comes
+    with the start and end offsets of the source text it was built from.
+    """
+    def __init__(self, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, separator="\n\n", length_function=len, strip_whitespace=True):
+        """
+        Initialize the chunker with the chunk size and overlap, in units of length_function.
+        """
+        if chunk_overlap > chunk_size:
+            raise ValueError(f"Chunk overlap ({chunk_overlap}) must not be larger than the chunk size ({chunk_size}).")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separator = separator
+        self.length_function = length_function
+        self.strip_whitespace = strip_whitespace
+
+    @classmethod
+    def for_model(cls, model, separator="\n\n", chunk_overlap=None):
+        """
+        Return a token-aware chunker for a SentenceTransformer: lengths are counted in the model's
+        tokens and chunks fill its max sequence length, so no chunk is truncated when encoded.
+        The overlap defaults to a third of the chunk size, as in the character settings.
+        """
+        tokenizer = model.tokenizer
+        chunk_size = model.max_seq_length - tokenizer.num_special_tokens_to_add()
+        # Pieces are mostly words, which repeat, so their token counts are cached
+        token_length = lru_cache(maxsize=1 << 16)(lambda text: len(tokenizer.encode(text, add_special_tokens=False)))
+        return cls(chunk_size, chunk_size // 3 if chunk_overlap is None else chunk_overlap, separator, token_length)
+
+    def settings(self):
+        """
+        Return the settings that determine the chunks, e.g. to detect that stored chunks are stale.
+        """
+        settings = {"separator": self.separator, "chunk_size": self.chunk_size, "chunk_overlap": self.chunk_overlap}
+        # Character chunks keep the settings recorded before token-aware chunking was added
+        if self.length_function is not len:
+            settings["length"] = "tokens"
+        return settings
+
+    def split_text(self, text):
+        """
+        Split a text into a list of chunks, as CharacterTextSplitter.split_text does.
+        """
+        return [chunk for chunk, _, _ in self.iter_chunks([text])]
+
+    def iter_pieces(self, blocks):
+        """
+        Yield (pieces, starts) for each block of a stream of text blocks: the complete non-empty
+        pieces between separators in it and their offsets. A piece cut off at the end of a
+        block is completed from the next one.
+        """
+        separator = self.separator
+        offset = 0
+        buffer = ''
+        for block in blocks:
+            buffer += block
+            parts = buffer.split(separator) if separator else list(buffer) + ['']
+            buffer = parts.pop()
+            starts = list(itertools.accumulate(map(operator.add, map(len, parts), itertools.repeat(len(separator))), initial=offset))
+            offset = starts.pop()
+            if parts:
+                yield list(itertools.compress(parts, parts)), list(itertools.compress(starts, parts))
+        if buffer:
+            yield [buffer], [offset]
+
+    def iter_chunks(self, blocks):
+        """
+        Yield (chunk, start, end) for the chunks of a stream of text blocks. Chunks are emitted
+        as soon as they are complete, so only the pieces of the current block and chunk are held in memory.
+
+        The pieces are merged as in CharacterTextSplitter, but instead of adding pieces one at a
+        time, the end of each chunk and the start of the next one are found by bisecting the
+        running length of the pieces.
+        """
+        chunk_size = self.chunk_size
+        chunk_overlap = self.chunk_overlap
+        separator_length = self.length_function(self.separator)
+        pieces, starts = [], []
+        for block_pieces, block_starts in self.iter_pieces(blocks):
+            pieces += block_pieces
+            starts += block_starts
+            # ends[i] is the length of pieces[:i] with a separator after each, so pieces[a:b] is ends[b] - ends[a] - separator_length long
+            ends = list(itertools.accumulate(map(operator.add, map(self.length_function, pieces), itertools.repeat(separator_length)), initial=0))
+            first = 0
+            while True:
+                # The chunk ends before the first piece that would take it over chunk_size; it has at least one piece
+                last = bisect.bisect_right(ends, ends[first] + chunk_size + separator_length, lo=first + 2) - 1
+                if last >= len(pieces):
+                    break
+                chunk = self.join(pieces, starts, first, last)
+                if chunk:
+                    yield chunk
+                # The next chunk starts with the longest tail that fits in the overlap and leaves room for the next piece
+                keep_from = max(ends[last] - separator_length - chunk_overlap, ends[last + 1] - separator_length - chunk_size)
+                first = bisect.bisect_left(ends, keep_from, lo=first, hi=last)
+            # Only the pieces of the current chunk are carried into the next block
+            pieces = pieces[first:]
+            starts = starts[first:]
+        chunk = self.join(pieces, starts, 0, len(pieces))
+        if chunk:
+            yield chunk
+
+    def join(self, pieces, starts, first, last):
+        """
+        Join pieces[first:last] into a chunk and return (chunk, start, end), or None if the chunk
+        is empty. Offsets span the source text of the pieces, less the whitespace stripped from the chunk.
+        """
+        if first >= last:
+            return None
+        text = self.separator.join(pieces[first:last])
+        if not self.strip_whitespace:
+            return (text, starts[first], starts[last - 1] + len(pieces[last - 1])) if text else None
+        text = text.strip()
+        if not text:
+            return None
+        head, tail = first, last - 1
+        while head < tail and pieces[head].isspace():
+            head += 1
+        while tail > head and pieces[tail].isspace():
+            tail -= 1
+        start = starts[head] + len(pieces[head]) - len(pieces[head].lstrip())
+        end = starts[tail] + len(pieces[tail].rstrip())
+        return text, start, end
@@ -1,18 +1,40 @@
 import os
+import itertools
+import numpy as np
 import pandas as pd
-from sentence_transformers import SentenceTransformer
-from langchain.text_splitter import CharacterTextSplitter
+from ModelRegistry import registry
+from EmbeddingStore import EmbeddingStore
+from Manifest import Manifest
+from TextChunker import TextChunker
+from WriteAheadLog import WriteAheadLog, decode_embedding
+from config import EMBEDDING_DTYPE, EMBEDDING_MODEL, ENCODE_WORKERS, ENCODE_BATCH_SIZE, CHUNK_SIZE, CHUNK_OVERLAP, CHUNK_LENGTH
 
 class TextProcessor:
     """
     A class to process text files, encode the texts using SentenceTransformers,
-    and save the results to CSV files.
+    and save the results to embedding stores. Files are streamed through chunking
+    and encoding as generators, and written to the store batch by batch.
+    With num_workers > 1, chunks are encoded by a pool of worker processes.
     """
-    def __init__(self, model_name='all-MiniLM-L6-v2'):
+    def __init__(self, model_name=EMBEDDING_MODEL, embedding_dtype=EMBEDDING_DTYPE, batch_size=256, block_size=1 << 20,
+                 num_workers=ENCODE_WORKERS, encode_batch_size=ENCODE_BATCH_SIZE, chunk_length=CHUNK_LENGTH):
         """
-        Initialize the TextProcessor with a specified model for encoding texts.
+        Initialize the TextProcessor with a specified model for encoding texts,
+        and the precision ('float32' or 'float16') embeddings are stored with.
+        Files are read in blocks of block_size characters and encoded batch_size chunks at a time,
+        so memory use does not grow with the size of the corpus. The model sees encode_batch_size
+        chunks per forward pass, in num_workers processes. Chunks are measured in
+        chunk_length units: 'characters', or the model's 'tokens'.
         """
-        self.model = SentenceTransformer(model_name)
+        self.model_name = model_name
+        self.model = registry.sentence_transformer(model_name)
+        self.embedding_dtype = embedding_dtype
+        self.batch_size = batch_size
+        self.block_size = block_size
+        self.num_workers = num_workers
+        self.encode_batch_size = encode_batch_size
+        self.chunk_length = chunk_length
+        self.pool = None
     
     def extract_text(self, file_path):
         """
@@ -24,78 +46,238 @@ class TextProcessor:
     
     def encode_texts(self, texts):
         """
-        Encode a list of texts using the SentenceTransformer model.
+        Encode a list of texts using the SentenceTransformer model, as a float32 matrix.
+        Embeddings in the shared on-disk cache are reused, so only cache misses reach the model.
         """
-        embeddings = self.model.encode(texts, convert_to_tensor=True)
-        return embeddings
-    
-    def save_to_csv(self, file_path, texts, embeddings):
+        embedding_cache = registry.embedding_cache()
+        if embedding_cache is None:
+            return self.encode_uncached(texts)
+        return embedding_cache.encode(self.model_name, texts, self.encode_uncached)
+
+    def encode_uncached(self, texts):
+        """
+        Encode texts with the model as a float32 numpy matrix, in the worker pool when there is one.
+        """
+        if self.num_workers > 1:
+            # Each worker gets encode_batch_size texts at a time, so the pool stays busy on large batches
+            embeddings = self.model.encode(texts, pool=self.start_pool(), batch_size=self.encode_batch_size, chunk_size=self.encode_batch_size)
+        else:
+            embeddings = self.model.encode(texts, batch_size=self.encode_batch_size, convert_to_numpy=True)
+        return np.asarray(embeddings, dtype=np.float32)
+
+    def start_pool(self):
         """
-        Save the texts and their embeddings to a CSV file.
+        Start the encoding worker processes on first use. Each worker gets an equal share of the
+        CPU threads, so the workers do not oversubscribe the cores.
         """
-        data = {
-            "Index": list(range(len(texts))),
-            "Text": texts,
-            "Embeddings": [emb.tolist() for emb in embeddings]
-        }
-        df = pd.DataFrame(data)
-        df.to_csv(file_path, index=False)
+        if self.pool is None:
+            print(f"Starting {self.num_workers} encoding workers...")
+            threads = os.environ.get("OMP_NUM_THREADS")
+            os.environ["OMP_NUM_THREADS"] = str(max(1, (os.cpu_count() or 1) // self.num_workers))
+            try:
+                self.pool = self.model.start_multi_process_pool(["cpu"] * self.num_workers)
+            finally:
+                if threads is None:
+                    del os.environ["OMP_NUM_THREADS"]
+                else:
+                    os.environ["OMP_NUM_THREADS"] = threads
+        return self.pool
+
+    def close(self):
+        """
+        Stop the encoding worker processes, if they were started.
+        """
+        if self.pool is not None:
+            self.model.stop_multi_process_pool(self.pool)
+            self.pool = None
     
-    def process_and_save_text(self, master_text, output_csv):
+    def save_to_store(self, store_path, texts, embeddings):
         """
-        Process and save the text chunks and their embeddings to a CSV file.
+        Save the texts and their embeddings to an embedding store.
         """
-        chunks = self.text_splitter.split_text(master_text)
-        embeddings = self.encode_texts(chunks)
-        self.save_to_csv(output_csv, chunks, embeddings)
-        # print(f"Chunks and embeddings saved to {output_csv}")
+        EmbeddingStore(store_path, self.embedding_dtype).save_texts(texts, embeddings)
     
-    def process_directory(self, directory):
+    def iter_files(self, directory, predicate):
+        """
+        Yield the paths of files under a directory whose names match a predicate, in a stable order.
+        """
+        for root, dirs, files in os.walk(directory):
+            dirs.sort()
+            for file in sorted(files):
+                if predicate(file):
+                    yield os.path.join(root, file)
+
+    def chunker(self, separator):
+        """
+        Return the TextChunker for a separator, measuring chunks in characters or in the model's tokens.
+        """
+        if self.chunk_length == "tokens":
+            return TextChunker.for_model(self.model, separator)
+        return TextChunker(CHUNK_SIZE, CHUNK_OVERLAP, separator)
+
+    def iter_blocks(self, file_path):
+        """
+        Yield the text of a file in blocks of block_size characters.
+        """
+        with open(file_path, 'r', encoding='utf-8') as file:
+            yield from iter(lambda: file.read(self.block_size), '')
+
+    def iter_chunks(self, file_path, chunker):
+        """
+        Yield (chunk, start, end) for the chunks of a file, with their character offsets in it.
         """
-        Process all text files in a directory, combine the texts, and save the results to a CSV file.
+        print(f"Processing {file_path}...")
+        yield from chunker.iter_chunks(self.iter_blocks(file_path))
+
+    def iter_new_entries(self, file_paths, chunker, manifest):
+        """
+        Yield (id, chunk) for the chunks of each file, taking new IDs from the manifest
+        and recording the IDs and source offsets of the chunks each file produced.
+        """
+        for file_path in file_paths:
+            ids = []
+            offsets = []
+            for chunk, start, end in self.iter_chunks(file_path, chunker):
+                ids.append(manifest.next_id)
+                offsets.append([start, end])
+                manifest.next_id += 1
+                yield ids[-1], chunk
+            manifest.record(file_path, ids, offsets)
+
+    def iter_kept_entries(self, store, stale_ids, manifest):
+        """
+        Yield (ids, texts, embeddings) batches of the existing store without the stale entries.
+        Entries saved to the store by other means are kept, and new IDs continue after theirs.
+        """
+        stale_ids = np.fromiter(stale_ids, dtype=np.int64)
+        for ids, texts, embeddings in store.iter_batches(self.batch_size):
+            keep = ~np.isin(ids, stale_ids)
+            if keep.any():
+                yield ids[keep], [text for text, kept in zip(texts, keep) if kept], embeddings[keep]
+        manifest.next_id = max(manifest.next_id, store.next_id)
+
+    def fold_log(self, store):
+        """
+        Fold changes that a DataManager logged but never compacted, e.g. after a crash, into the
+        store and discard its log. Otherwise new chunk IDs could collide with logged entries,
+        and replaying the log would overwrite those chunks.
+        """
+        wal = WriteAheadLog(f"{store.base_path}.wal")
+        segments = wal.rotate()
+        if not segments:
+            return
+        print("Folding logged profile changes into the store...")
+        df, embeddings = store.load()
+        # Apply the records with DataManager.apply_change's rules: keyed by ID, deletes are final
+        texts, vectors, deleted = {}, {}, set()
+        for record in wal.replay():
+            entry_id = record['id']
+            if entry_id in deleted or (entry_id in df.index and df.at[entry_id, 'Deleted']):
+                continue
+            if record['op'] == 'delete':
+                if entry_id in df.index or entry_id in texts:
+                    deleted.add(entry_id)
+            else:
+                texts[entry_id] = record['text']
+                vectors[entry_id] = decode_embedding(record['embedding'])
+        df = df.copy()
+        embeddings = np.array(embeddings, dtype=np.float32)
+        if vectors and embeddings.size == 0:
+            embeddings = embeddings.reshape(0, len(next(iter(vectors.values()))))
+        updated = [entry_id for entry_id in texts if entry_id in df.index]
+        added = [entry_id for entry_id in texts if entry_id not in df.index]
+        for entry_id in updated:
+            df.at[entry_id, 'Text'] = texts[entry_id]
+            embeddings[df.index.get_loc(entry_id)] = vectors[entry_id]
+        if added:
+            new_entries = pd.DataFrame({'Text': [texts[entry_id] for entry_id in added], 'Deleted': False}, index=pd.Index(added, name='Index'))
+            df = pd.concat([df, new_entries])
+            embeddings = np.vstack([embeddings, np.stack([vectors[entry_id] for entry_id in added])])
+        df.loc[list(deleted), 'Deleted'] = True
+        store.save(df, embeddings, max([store.next_id, *(entry_id + 1 for entry_id in texts)]))
+        wal.discard(segments)
+
+    def iter_batches(self, items, batch_size):
         """
-        master_text = ''
-        output_csv = os.path.join(directory, "total_profile_data.csv")
-        self.text_splitter = CharacterTextSplitter(chunk_size=300, 
-                                                   chunk_overlap=100,
-                                                   separator=" ")
-                                                #    separator="\n")
+        Group an iterable into lists of at most batch_size items.
+        """
+        batch = []
+        for item in items:
+            batch.append(item)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
 
-        for root, _, files in os.walk(directory):
-            for file in files:
-                if file.endswith(".txt") and not file.endswith("summary.txt"):
-                    file_path = os.path.join(root, file)
-                    text = self.extract_text(file_path)
-                    print(f"Processing {file_path}...")
+    def iter_embedding_batches(self, entries):
+        """
+        Yield (ids, chunks, embeddings) batches from (id, chunk) pairs, encoding one batch at a time.
+        """
+        # Batches are large enough to give every worker encode_batch_size chunks at once
+        batch_size = max(self.batch_size, self.num_workers * self.encode_batch_size)
+        for batch in self.iter_batches(entries, batch_size):
+            ids, chunks = zip(*batch)
+            yield list(ids), list(chunks), self.encode_texts(list(chunks))
+
+    def process_files(self, file_paths, output_store, separator):
+        """
+        Stream files through chunking and encoding into an embedding store, one batch at a time.
+        A manifest next to the store records each file's size, mtime, hash and chunk IDs, so
+        only new or changed files are embedded and the chunks of deleted files are dropped.
+        Returns the number of chunks embedded.
+        """
+        store = EmbeddingStore(output_store, self.embedding_dtype)
+        manifest = Manifest(f"{store.base_path}.manifest.json")
+        chunker = self.chunker(separator)
+        settings = {"model": self.model_name, **chunker.settings()}
+        if store.exists():
+            self.fold_log(store)
+        if store.exists() and manifest.load() and manifest.settings == settings:
+            changed, removed = manifest.diff(file_paths)
+            if not changed and not removed:
+                manifest.save()
+                print(f"{output_store} is up to date.")
+                return 0
+            print(f"Re-indexing {len(changed)} new or changed and {len(removed)} deleted files...")
+            stale_ids = [chunk_id for key in removed + [manifest.key(path) for path in changed] for chunk_id in manifest.remove(key)]
+            kept = self.iter_kept_entries(store, stale_ids, manifest)
+        else:
+            manifest.reset(settings)
+            changed, kept = list(file_paths), iter(())
 
-                    master_text +=f'\n {text} \n'
+        embedding_cache = registry.embedding_cache()
+        cache_before = embedding_cache.stats() if embedding_cache else None
+        new_entries = self.iter_embedding_batches(self.iter_new_entries(changed, chunker, manifest))
+        store.save_batches(itertools.chain(kept, new_entries), manifest.next_id)
+        manifest.next_id = store.next_id
+        manifest.save()
+        if embedding_cache:
+            stats = embedding_cache.stats()
+            hits, misses = stats["hits"] - cache_before["hits"], stats["misses"] - cache_before["misses"]
+            print(f"Embedding cache: {hits} hits, {misses} misses ({hits / max(hits + misses, 1):.0%} hit rate), {stats['bytes'] / 2**20:.0f} MiB cached")
+        return sum(len(manifest.files[manifest.key(path)]["ids"]) for path in changed)
 
-        self.process_and_save_text(master_text, output_csv)
-        print(f"Full user Database is created at {output_csv}")
-        return master_text
+    def process_directory(self, directory):
+        """
+        Process all text files in a directory and save their chunks to the total_profile_data store,
+        embedding only files that are new or changed since the last run.
+        Returns the number of chunks embedded.
+        """
+        output_store = os.path.join(directory, "total_profile_data")
+        file_paths = self.iter_files(directory, lambda file: file.endswith(".txt") and not file.endswith("summary.txt"))
+        count = self.process_files(file_paths, output_store, separator=" ")
+        print(f"Full user Database is created at {output_store}")
+        return count
 
     def process_profile(self, directory):
         """
-        Process summary text files in a directory and save the results to a CSV file.
-        """
-        master_text = ''
-        output_csv = os.path.join(directory, "summary_profile.csv")
-        # print(output_csv)
-        self.text_splitter = CharacterTextSplitter(chunk_size=300, 
-                                                   chunk_overlap=100,
-                                                #    separator=" ")
-                                                   separator="\n")
-        for root, _, files in os.walk(directory):
-            for file in files:
-                if file.endswith("summary.txt"):
-                    print("File", file)
-                    file_path = os.path.join(root, file)
-                    text = self.extract_text(file_path)
-                    print(f"Processing {file_path}...")
-
-                    master_text +=f'\n {text} \n'
-
-        self.process_and_save_text(master_text, output_csv)
-        print(f"Summary profile database  is created at {output_csv}")
-        os.environ['SUMMARY_DB'] = output_csv
-        return master_text
+        Process summary text files in a directory and save their chunks to the summary_profile store.
+        Returns the number of chunks embedded.
+        """
+        output_store = os.path.join(directory, "summary_profile")
+        file_paths = self.iter_files(directory, lambda file: file.endswith("summary.txt"))
+        count = self.process_files(file_paths, output_store, separator="\n")
+        print(f"Summary profile database  is created at {output_store}")
+        os.environ['SUMMARY_DB'] = output_store
+        return count
@@ -0,0 +1,383 @@
+import os
+import math
+import numpy as np
+import faiss
+from config import INDEX_PARAMS, ANN_INDEX_TYPE, ANN_THRESHOLD, ANN_HYSTERESIS
+
+class VectorIndex:
+    """
+    A long-lived FAISS index that maps stable entry IDs to their embeddings.
+    The index is updated in place as entries are added, updated or removed,
+    and can be written to and read back from disk. Besides exact flat search it
+    supports approximate HNSW and IVF (flat or PQ) indexes. Flat, HNSW and IVF-flat
+    indexes can keep their vectors compressed as float16, int8 or PQ codes instead
+    of float32; rescore() re-ranks their candidates with the original embeddings.
+
+    Removing an entry only records a tombstone that searches filter out, so it costs
+    O(1); updated vectors are kept in a small flat side index. purge() (or a rebuild
+    for HNSW, which cannot remove vectors) folds both back into the main index.
+    """
+    INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq")
+    QUANTIZATIONS = (None, "fp16", "int8", "pq")
+    # Smaller indexes are kept as float32 under 'pq': PQ needs 2-bit codebooks (4 centroids) trained on at least as many vectors
+    MIN_PQ_TRAINING = 4
+
+    def __init__(self, dim, metric="cosine", index=None, index_type="flat", params=None, num_vectors=0):
+        """
+        Initialize the VectorIndex for embeddings of the given dimension.
+        'cosine' and 'mmr' use inner product over normalized vectors, anything else uses L2.
+        """
+        self.dim = dim
+        self.metric = metric
+        self.params = {**INDEX_PARAMS, **(params or {})}
+        self.index = index if index is not None else self._create_index(index_type, num_vectors)
+        self.index_type = self._detect_type(self.index)
+        self.quantization = self._detect_quantization(self.index)
+        self.tombstones = set()
+        self.delta = None
+        self._search_params = None
+        self.set_search_params()
+
+    @property
+    def normalize(self):
+        """
+        Whether vectors are L2-normalized before they are added or searched.
+        """
+        return self.metric in ("cosine", "mmr")
+
+    def layout_key(self):
+        """
+        Return the (index_type, quantization) of this index, comparable with layout().
+        """
+        return self.index_type, self.quantization
+
+    @property
+    def filters_in_faiss(self):
+        """
+        Whether searches can exclude tombstones with a FAISS ID selector. A flat IndexPQ accepts
+        no search parameters, so its tombstones are filtered from an over-fetched result instead.
+        """
+        return not (self.index_type == "flat" and self.quantization == "pq")
+
+    @property
+    def removable(self):
+        """
+        Whether the underlying FAISS index supports removing vectors, so purge() can work in place.
+        """
+        return self.index_type != "hnsw"
+
+    @staticmethod
+    def resolve_index_type(index_type, num_vectors, current_type=None):
+        """
+        Resolve 'auto' to an exact flat index for small profiles and to ANN_INDEX_TYPE for large ones.
+        When current_type is the ANN index, it is kept down to ANN_HYSTERESIS * ANN_THRESHOLD vectors.
+        """
+        if index_type == "auto":
+            threshold = ANN_THRESHOLD * ANN_HYSTERESIS if current_type == ANN_INDEX_TYPE else ANN_THRESHOLD
+            return "flat" if num_vectors < threshold else ANN_INDEX_TYPE
+        if index_type not in VectorIndex.INDEX_TYPES:
+            raise ValueError(f"Unknown index type '{index_type}'. Expected one of {VectorIndex.INDEX_TYPES} or 'auto'.")
+        return index_type
+
+    @classmethod
+    def validate(cls, index_type, params=None):
+        """
+        Reject index settings that cannot be built, also for the ANN index that 'auto' switches to later.
+        """
+        quantization = {**INDEX_PARAMS, **(params or {})}["quantization"]
+        if quantization not in cls.QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization '{quantization}'. Expected one of {cls.QUANTIZATIONS}.")
+        if quantization == "pq" and (ANN_INDEX_TYPE if index_type == "auto" else index_type) == "ivf_flat":
+            raise ValueError("PQ codes in an IVF index are the 'ivf_pq' index type; use it instead of 'ivf_flat' with quantization 'pq'.")
+
+    @classmethod
+    def layout(cls, index_type, num_vectors, params=None, current_type=None):
+        """
+        Return the (index_type, quantization) that build() gives an index of num_vectors entries,
+        as the built index reports them, e.g. to tell whether an existing index is still current.
+        current_type is the type of the existing index, see resolve_index_type().
+        """
+        cls.validate(index_type, params)
+        index_type = cls.resolve_index_type(index_type, num_vectors, current_type)
+        quantization = {**INDEX_PARAMS, **(params or {})}["quantization"]
+        # IVF-PQ is compressed by construction and reports None
+        if index_type == "ivf_pq" or (quantization == "pq" and num_vectors < cls.MIN_PQ_TRAINING):
+            quantization = None
+        return index_type, quantization
+
+    def _create_index(self, index_type, num_vectors):
+        """
+        Create an empty ID-mapped index of the given type for the configured metric.
+        """
+        self.validate(index_type, self.params)
+        metric_type = faiss.METRIC_INNER_PRODUCT if self.normalize else faiss.METRIC_L2
+        codec = self._codec_description(num_vectors)
+        if index_type == "flat":
+            description = codec or "Flat"
+        elif index_type == "hnsw":
+            description = f"HNSW{self.params['hnsw_m']}" + (f",{codec}" if codec else "")
+        else:
+            # Around 4 * sqrt(n) lists, keeping at least 39 training points per list
+            nlist = self.params["nlist"] or max(1, min(int(4 * math.sqrt(num_vectors)), num_vectors // 39))
+            if index_type == "ivf_flat":
+                description = f"IVF{nlist},{codec or 'Flat'}"
+            elif index_type == "ivf_pq":
+                description = f"IVF{nlist},{self._pq_description(self.params['pq_nbits'])}"
+            else:
+                raise ValueError(f"Unknown index type '{index_type}'. Expected one of {self.INDEX_TYPES}.")
+        if index_type.startswith("ivf"):
+            # IVF indexes store entry IDs natively; an ID map would break their removals
+            return faiss.index_factory(self.dim, description, metric_type)
+        index = faiss.index_factory(self.dim, f"IDMap2,{description}", metric_type)
+        if index_type == "hnsw":
+            faiss.downcast_index(index.index).hnsw.efConstruction = self.params["ef_construction"]
+        return index
+
+    def _pq_description(self, nbits):
+        pq_m = max(m for m in range(1, self.params["pq_m"] + 1) if self.dim % m == 0)
+        return f"PQ{pq_m}x{nbits}"
+
+    def _codec_description(self, num_vectors):
+        """
+        Return the FAISS storage description for the configured quantization, or None for float32.
+        """
+        quantization = self.params["quantization"]
+        if quantization == "pq":
+            if num_vectors < self.MIN_PQ_TRAINING:
+                return None
+            # Each PQ codebook needs at least as many training vectors as centroids
+            return self._pq_description(max(1, min(self.params["pq_nbits"], int(math.log2(max(num_vectors, 2))))))
+        return {None: None, "fp16": "SQfp16", "int8": "SQ8"}[quantization]
+
+    @staticmethod
+    def _detect_quantization(index):
+        """
+        Return how the vectors of a FAISS index created by _create_index are compressed.
+        IVF-PQ is compressed by construction and reports None, like float32 indexes.
+        """
+        base_index = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+        if isinstance(base_index, faiss.IndexHNSW):
+            base_index = faiss.downcast_index(base_index.storage)
+        if isinstance(base_index, faiss.IndexPQ):
+            return "pq"
+        if isinstance(base_index, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+            return "fp16" if base_index.sq.qtype == faiss.ScalarQuantizer.QT_fp16 else "int8"
+        return None
+
+    @staticmethod
+    def _detect_type(index):
+        """
+        Return the index type name of a FAISS index created by _create_index.
+        """
+        base_index = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+        if isinstance(base_index, faiss.IndexHNSW):
+            return "hnsw"
+        if isinstance(base_index, faiss.IndexIVFPQ):
+            return "ivf_pq"
+        if isinstance(base_index, faiss.IndexIVF):
+            return "ivf_flat"
+        return "flat"
+
+    def set_search_params(self, **params):
+        """
+        Update search-time parameters (nprobe for IVF, ef_search for HNSW) to trade latency against recall.
+        """
+        self.params.update(params)
+        self._search_params = None
+        if self.index_type in ("ivf_flat", "ivf_pq"):
+            faiss.extract_index_ivf(self.index).nprobe = self.params["nprobe"]
+        elif self.index_type == "hnsw":
+            faiss.downcast_index(self.index.index).hnsw.efSearch = self.params["ef_search"]
+
+    def _prepare(self, embeddings):
+        """
+        Convert embeddings to a contiguous float32 matrix, normalizing a copy if required.
+        """
+        embeddings = np.array(np.atleast_2d(embeddings), dtype=np.float32, order="C")
+        if self.normalize:
+            faiss.normalize_L2(embeddings)
+        return embeddings
+
+    def __len__(self):
+        return self.index.ntotal - len(self.tombstones) + (self.delta.ntotal if self.delta is not None else 0)
+
+    def is_clean(self):
+        """
+        Whether every vector in the main index is current, i.e. nothing is masked.
+        """
+        return not self.tombstones and self.delta is None
+
+    def ids(self):
+        """
+        Return the entry IDs currently held by the index.
+        """
+        if isinstance(self.index, faiss.IndexIDMap):
+            ids = faiss.vector_to_array(self.index.id_map)
+        else:
+            invlists = faiss.extract_index_ivf(self.index).invlists
+            ids = np.concatenate([np.empty(0, dtype=np.int64)] + [
+                faiss.rev_swig_ptr(invlists.get_ids(list_no), invlists.list_size(list_no)).copy()
+                for list_no in range(invlists.nlist) if invlists.list_size(list_no)
+            ])
+        if self.tombstones:
+            ids = ids[~np.isin(ids, list(self.tombstones))]
+        if self.delta is not None:
+            ids = np.concatenate([ids, faiss.vector_to_array(self.delta.id_map)])
+        return ids
+
+    def add(self, ids, embeddings):
+        """
+        Add embeddings under the given entry IDs, training the index first if it needs it.
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        if not len(ids):
+            return
+        embeddings = self._prepare(embeddings)
+        if self.tombstones and np.isin(ids, list(self.tombstones)).any():
+            self._delta_index().add_with_ids(embeddings, ids)
+            return
+        if not self.index.is_trained:
+            print(f"Training {self.index_type} index on {len(embeddings)} vectors...")
+            self.index.train(embeddings)
+        self.index.add_with_ids(embeddings, ids)
+
+    def _delta_index(self):
+        if self.delta is None:
+            self.delta = faiss.IndexIDMap2(faiss.IndexFlatIP(self.dim) if self.normalize else faiss.IndexFlatL2(self.dim))
+        return self.delta
+
+    def remove(self, ids):
+        """
+        Remove the given entry IDs from the index by marking them as tombstones.
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        if not len(ids):
+            return
+        self.tombstones.update(ids.tolist())
+        self._search_params = None
+        if self.delta is not None:
+            self.delta.remove_ids(faiss.IDSelectorBatch(ids))
+
+    def purge(self):
+        """
+        Physically remove tombstoned vectors and move updated vectors into the main index.
+        Returns False if the index type cannot remove vectors and has to be rebuilt instead.
+        """
+        if self.is_clean():
+            return True
+        if not self.removable:
+            return False
+        self.index.remove_ids(faiss.IDSelectorBatch(np.fromiter(self.tombstones, dtype=np.int64)))
+        if self.delta is not None and self.delta.ntotal:
+            # Side index vectors are already normalized
+            self.index.add_with_ids(self.delta.index.reconstruct_n(0, self.delta.ntotal), faiss.vector_to_array(self.delta.id_map))
+        self.tombstones = set()
+        self.delta = None
+        self._search_params = None
+        return True
+
+    def _tombstone_search_params(self):
+        """
+        Return FAISS search parameters that exclude tombstoned IDs, keeping the configured nprobe/ef_search.
+        """
+        if self._search_params is None:
+            tombstones = faiss.IDSelectorBatch(np.fromiter(self.tombstones, dtype=np.int64))
+            selector = faiss.IDSelectorNot(tombstones)
+            if self.index_type == "hnsw":
+                params = faiss.SearchParametersHNSW(sel=selector, efSearch=self.params["ef_search"])
+            elif self.index_type in ("ivf_flat", "ivf_pq"):
+                params = faiss.SearchParametersIVF(sel=selector, nprobe=self.params["nprobe"])
+            else:
+                params = faiss.SearchParameters(sel=selector)
+            # The parameters only hold pointers to the selectors, so keep them alive together
+            self._search_params = (params, selector, tombstones)
+        return self._search_params[0]
+
+    def update(self, ids, embeddings):
+        """
+        Replace the embeddings stored under the given entry IDs.
+        """
+        self.remove(ids)
+        self.add(ids, embeddings)
+
+    def search(self, query_embeddings, k):
+        """
+        Search the index and return (distances, ids) for the top k entries of each query.
+        Rows are padded with id -1 when fewer than k entries are found.
+        """
+        queries = self._prepare(query_embeddings)
+        k = min(k, len(self))
+        if k <= 0:
+            empty = np.empty((len(queries), 0))
+            return empty.astype(np.float32), empty.astype(np.int64)
+        if self.is_clean():
+            return self.index.search(queries, k)
+
+        # Filter tombstones inside FAISS, or drop them from k + len(tombstones) results, then merge with the side index
+        if self.filters_in_faiss:
+            distances, ids = self.index.search(queries, k, params=self._tombstone_search_params())
+        else:
+            distances, ids = self.index.search(queries, min(k + len(self.tombstones), self.index.ntotal))
+            ids = np.where(np.isin(ids, np.fromiter(self.tombstones, dtype=np.int64)), -1, ids)
+        if self.delta is not None and self.delta.ntotal:
+            delta_distances, delta_ids = self.delta.search(queries, min(k, self.delta.ntotal))
+            distances = np.hstack([distances, delta_distances])
+            ids = np.hstack([ids, delta_ids])
+        worst = -np.inf if self.normalize else np.inf
+        distances = np.where(ids < 0, worst, distances)
+        order = np.argsort(-distances if self.normalize else distances, axis=1, kind="stable")[:, :k]
+        return np.take_along_axis(distances, order, axis=1), np.take_along_axis(ids, order, axis=1)
+
+    def rescore(self, query_embeddings, ids, embeddings, k):
+        """
+        Re-rank candidate IDs from search() by their exact scores and return the top k (distances, ids).
+        'embeddings' holds the original vectors of the candidates, shaped (queries, candidates, dim).
+        """
+        queries = self._prepare(query_embeddings)
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if self.normalize:
+            embeddings = embeddings / np.maximum(np.linalg.norm(embeddings, axis=2, keepdims=True), 1e-12)
+            distances = np.einsum("qcd,qd->qc", embeddings, queries)
+        else:
+            distances = np.sum((embeddings - queries[:, None, :]) ** 2, axis=2)
+        worst = -np.inf if self.normalize else np.inf
+        distances = np.where(ids < 0, worst, distances).astype(np.float32)
+        order = np.argsort(-distances if self.normalize else distances, axis=1, kind="stable")[:, :k]
+        return np.take_along_axis(distances, order, axis=1), np.take_along_axis(ids, order, axis=1)
+
+    def copy(self):
+        """
+        Return an independent copy of the index, e.g. to save a snapshot in the background.
+        """
+        vector_index = VectorIndex(self.dim, self.metric, index=faiss.clone_index(self.index), params=self.params)
+        vector_index.tombstones = set(self.tombstones)
+        vector_index.delta = faiss.clone_index(self.delta) if self.delta is not None else None
+        return vector_index
+
+    @classmethod
+    def build(cls, ids, embeddings, dim, metric="cosine", index_type="flat", params=None):
+        """
+        Build a new index holding the given entries. 'auto' picks the index type by size.
+        """
+        index_type = cls.resolve_index_type(index_type, len(ids))
+        vector_index = cls(dim, metric, index_type=index_type, params=params, num_vectors=len(ids))
+        vector_index.add(ids, embeddings)
+        return vector_index
+
+    def save(self, path):
+        """
+        Write the index to disk, replacing any previous file atomically.
+        """
+        if not self.is_clean():
+            raise ValueError("Index has masked entries; rebuild it before saving.")
+        tmp_path = f"{path}.tmp"
+        faiss.write_index(self.index, tmp_path)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, metric="cosine", params=None):
+        """
+        Read an index previously written with save().
+        """
+        index = faiss.read_index(path)
+        return cls(index.d, metric, index=index, params=params)
@@ -0,0 +1,96 @@
+import os
+import glob
+import json
+import time
+import base64
+import numpy as np
+
+class WriteAheadLog:
+    """
+    An append-only log of profile mutations. Each record is written as one JSON line
+    and fsynced before it is applied, so changes survive a crash without rewriting
+    the whole embedding store. The log is rotated into sealed segments when it is
+    compacted, so new records can keep arriving while a snapshot is being written.
+    """
+    def __init__(self, path):
+        """
+        Initialize the log at the given path. Existing records are kept for replay.
+        """
+        self.path = path
+        self.file = None
+        self.count = sum(1 for _ in self.replay())
+
+    def __len__(self):
+        return self.count
+
+    def sealed_segments(self):
+        """
+        Return the sealed segments left by rotations, oldest first.
+        """
+        segments = glob.glob(f"{glob.escape(self.path)}.*")
+        return sorted((path for path in segments if path.rsplit(".", 1)[-1].isdigit()), key=lambda path: int(path.rsplit(".", 1)[-1]))
+
+    def append(self, record):
+        """
+        Append a record and fsync it to disk.
+        """
+        if self.file is None:
+            self.file = open(self.path, "a", encoding="utf-8")
+        self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.count += 1
+
+    def replay(self):
+        """
+        Yield every logged record, from the oldest sealed segment to the active log.
+        A partially written last line from a crash is skipped.
+        """
+        for path in self.sealed_segments() + [self.path]:
+            if not os.path.exists(path):
+                continue
+            with open(path, "r", encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        print(f"Skipping incomplete log record in {path}")
+
+    def rotate(self):
+        """
+        Seal the active log so a snapshot can be written without blocking new appends.
+        Returns every sealed segment that the snapshot will make obsolete.
+        """
+        self.close()
+        if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            os.replace(self.path, f"{self.path}.{time.time_ns()}")
+        self.count = 0
+        return self.sealed_segments()
+
+    def discard(self, segments):
+        """
+        Delete sealed segments once their records are persisted in the store.
+        """
+        for path in segments:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def close(self):
+        """
+        Close the active log file.
+        """
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+def encode_embedding(embedding):
+    """
+    Encode a float32 embedding as base64 for a log record.
+    """
+    return base64.b64encode(np.ascontiguousarray(embedding, dtype=np.float32).tobytes()).decode("ascii")
+
+def decode_embedding(data):
+    """
+    Decode an embedding written by encode_embedding.
+    """
+    return np.frombuffer(base64.b64decode(data), dtype=np.float32)
@@ -0,0 +1,108 @@
+import os
+import numpy as np
+import torch
+from config import DEVICE, ONNX_CACHE_DIR
+
+class LogitsOnly(torch.nn.Module):
+    """
+    Wraps a sequence classification model so it returns only its logits, as ONNX export requires.
+    """
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask):
+        return self.model(input_ids=input_ids, attention_mask=attention_mask, use_cache=False).logits
+
+class ZeroShotClassifier:
+    """
+    An NLI zero-shot classifier with a faster CPU backend than the transformers pipeline.
+    All candidate-label hypotheses for a text are scored in one batched forward pass.
+    Results have the same format as the pipeline: {'sequence', 'labels', 'scores'}.
+
+    Backends:
+    - 'torch': the PyTorch model in float32.
+    - 'torch-int8': the PyTorch model with its linear layers dynamically quantized to int8.
+    - 'onnx' / 'onnx-int8': the model exported to ONNX, optionally with int8 weights, and
+      run with onnxruntime. Exported graphs are cached under cache_dir.
+    """
+    BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+
+    def __init__(self, model_name, backend="torch", hypothesis_template="This example is {}.", cache_dir=ONNX_CACHE_DIR, tokenizer=None, model=None):
+        """
+        Initialize the classifier, loading the tokenizer and model from model_name unless they are given.
+        """
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown classifier backend '{backend}'. Expected one of {self.BACKENDS}.")
+        from transformers import AutoTokenizer, AutoModelForSequenceClassification
+        self.model_name = model_name
+        self.backend = backend
+        self.hypothesis_template = hypothesis_template
+        self.tokenizer = tokenizer or AutoTokenizer.from_pretrained(model_name)
+        model = model or AutoModelForSequenceClassification.from_pretrained(model_name)
+        model.eval()
+        label2id = {label.lower(): index for label, index in model.config.label2id.items()}
+        self.entailment_id = next(index for label, index in label2id.items() if label.startswith("entail"))
+        self.contradiction_id = next(index for label, index in label2id.items() if label.startswith("contra"))
+
+        self.session = None
+        if backend == "torch":
+            self.model = model.to("mps" if DEVICE == "mps" else "cpu")
+        elif backend == "torch-int8":
+            self.model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        else:
+            self.session = self.load_onnx(model, cache_dir)
+
+    def load_onnx(self, model, cache_dir):
+        """
+        Return an onnxruntime session for the model, exporting (and quantizing) it on first use.
+        """
+        import onnxruntime
+        model_dir = os.path.join(cache_dir, self.model_name.replace("/", "--"))
+        path = os.path.join(model_dir, "model.onnx")
+        if not os.path.exists(path):
+            print(f"Exporting {self.model_name} to ONNX...")
+            os.makedirs(model_dir, exist_ok=True)
+            inputs = self.tokenizer(["An example text."], ["This example is a test."], return_tensors="pt")
+            torch.onnx.export(
+                LogitsOnly(model), (inputs["input_ids"], inputs["attention_mask"]), f"{path}.tmp",
+                input_names=["input_ids", "attention_mask"], output_names=["logits"],
+                dynamic_axes={"input_ids": {0: "batch", 1: "sequence"}, "attention_mask": {0: "batch", 1: "sequence"}, "logits": {0: "batch"}},
+                opset_version=17, dynamo=False,
+            )
+            os.replace(f"{path}.tmp", path)
+        if self.backend == "onnx-int8":
+            quantized_path = os.path.join(model_dir, "model.int8.onnx")
+            if not os.path.exists(quantized_path):
+                from onnxruntime.quantization import quantize_dynamic, QuantType
+                quantize_dynamic(path, f"{quantized_path}.tmp", weight_type=QuantType.QInt8)
+                os.replace(f"{quantized_path}.tmp", quantized_path)
+            path = quantized_path
+        return onnxruntime.InferenceSession(path, providers=["CPUExecutionProvider"])
+
+    def logits(self, sequence, hypotheses):
+        """
+        Return the NLI logits of the sequence paired with every hypothesis, from one forward pass.
+        """
+        inputs = self.tokenizer([sequence] * len(hypotheses), hypotheses, return_tensors="pt", padding=True, truncation="only_first")
+        if self.session is not None:
+            return self.session.run(["logits"], {"input_ids": inputs["input_ids"].numpy(), "attention_mask": inputs["attention_mask"].numpy()})[0]
+        device = next(self.model.parameters(), torch.empty(0)).device
+        with torch.inference_mode():
+            return self.model(input_ids=inputs["input_ids"].to(device), attention_mask=inputs["attention_mask"].to(device)).logits.float().cpu().numpy()
+
+    def __call__(self, sequence, candidate_labels, multi_label=False):
+        hypotheses = [self.hypothesis_template.format(label) for label in candidate_labels]
+        logits = self.logits(sequence, hypotheses)
+        if multi_label:
+            # Entailment against contradiction, independently for each label
+            pair = logits[:, [self.contradiction_id, self.entailment_id]]
+            scores = np.exp(pair - pair.max(axis=1, keepdims=True))
+            scores = scores[:, 1] / scores.sum(axis=1)
+        else:
+            # Entailment compared across the labels, as the transformers pipeline does
+            entailment = logits[:, self.entailment_id]
+            scores = np.exp(entailment - entailment.max())
+            scores = scores / scores.sum()
+        order = np.argsort(-scores, kind="stable")
+        return {'sequence': sequence, 'labels': [candidate_labels[i] for i in order], 'scores': [float(scores[i]) for i in order]}
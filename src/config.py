@@ -3,4 +3,67 @@ import torch
 
 DEVICE = "mps" if torch.backends.mps.is_available() else "cpu"
 CLASSIFIER_MODEL = "facebook/bart-large-mnli"
+# Zero-shot classifier backend: 'pipeline' (transformers pipeline), or ZeroShotClassifier's batched
+# 'torch', 'torch-int8', 'onnx' or 'onnx-int8'; exported ONNX graphs are cached in ONNX_CACHE_DIR
+CLASSIFIER_BACKEND = "pipeline"
+ONNX_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "personal-assistant", "onnx")
 LLM_MODEL = "gpt-3.5-turbo-0125"  # Example model name, update as needed
+SUMMARY_DB = os.getenv("SUMMARY_DB")  # Set by TextProcessor.process_profile
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+# On-disk embedding cache shared by all users and runs, keyed by model name and text hash;
+# set EMBEDDING_CACHE_PATH to an empty string to disable it. Its size is capped at EMBEDDING_CACHE_SIZE bytes
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join(os.path.expanduser("~"), ".cache", "personal-assistant", "embeddings.sqlite"))
+EMBEDDING_CACHE_SIZE = 1 << 30
+# Ingestion splits files into chunks of CHUNK_SIZE characters overlapping by CHUNK_OVERLAP. With CHUNK_LENGTH
+# 'tokens', chunks are instead measured in the embedding model's tokens and fill its max sequence length
+CHUNK_SIZE = 300
+CHUNK_OVERLAP = 100
+CHUNK_LENGTH = "characters"
+# Ingestion encodes with ENCODE_WORKERS processes (1 encodes in this process), ENCODE_BATCH_SIZE texts per model batch
+ENCODE_WORKERS = 1
+ENCODE_BATCH_SIZE = 64
+# PDFs are extracted by PDF_WORKERS processes (1 extracts them one after another in this process);
+# documents are split into ranges of PDF_PAGES_PER_TASK pages that are extracted in parallel
+PDF_WORKERS = os.cpu_count() or 1
+PDF_PAGES_PER_TASK = 50
+# Pages with fewer than TABLE_MIN_LINES horizontal or vertical ruling lines skip the table finder. 2, the fewest
+# any table has, never changes the tables found; higher values also skip pages with stray boxes and rules
+TABLE_MIN_LINES = 2
+# URLs are rendered in a pool of at most BROWSER_POOL_SIZE headless browser pages, one browser for the whole batch
+BROWSER_POOL_SIZE = 4
+# URLs are first fetched with a plain HTTP GET and only rendered in the browser when the page's text is shorter
+# than STATIC_MIN_TEXT characters or less than STATIC_MIN_TEXT_RATIO of its HTML, i.e. it needs JavaScript
+STATIC_MIN_TEXT = 200
+STATIC_MIN_TEXT_RATIO = 0.01
+# Fetched pages are cached on disk with their ETag/Last-Modified headers and revalidated with conditional requests
+# on later runs; set HTTP_CACHE_PATH to an empty string to disable it. Its size is capped at HTTP_CACHE_SIZE bytes
+HTTP_CACHE_PATH = os.getenv("HTTP_CACHE_PATH", os.path.join(os.path.expanduser("~"), ".cache", "personal-assistant", "http.sqlite"))
+HTTP_CACHE_SIZE = 256 << 20
+
+# Intent classification: 'embedding' compares query embeddings with example queries and falls back
+# to zero-shot CLASSIFIER_MODEL when the top two intents are closer than INTENT_MARGIN_THRESHOLD
+INTENT_CLASSIFIER = "embedding"
+INTENT_MARGIN_THRESHOLD = 0.05
+
+# Vector index used by DataManager: 'flat' (exact), 'hnsw', 'ivf_flat', 'ivf_pq', or 'auto'
+# to stay exact until a profile reaches ANN_THRESHOLD entries and then switch to ANN_INDEX_TYPE.
+# An ANN index only switches back to flat below ANN_HYSTERESIS * ANN_THRESHOLD entries, so a
+# profile hovering around the threshold is not rebuilt on every change.
+INDEX_TYPE = "auto"
+ANN_INDEX_TYPE = "hnsw"
+ANN_THRESHOLD = 50000
+ANN_HYSTERESIS = 0.8
+INDEX_PARAMS = {
+    "hnsw_m": 32,            # graph neighbours per HNSW node
+    "ef_construction": 80,
+    "ef_search": 64,         # HNSW search breadth: higher means better recall, slower search
+    "nlist": None,           # IVF inverted lists, None picks 4 * sqrt(n)
+    "nprobe": 16,            # IVF lists scanned per query: higher means better recall, slower search
+    "pq_m": 16,              # PQ sub-quantizers, reduced to a divisor of the embedding dimension
+    "pq_nbits": 8,
+    "quantization": None,    # store index vectors as None (float32), 'fp16', 'int8' or 'pq' codes to save memory
+}
+# Precision of embeddings in the on-disk store: 'float32', or 'float16' to halve its size
+EMBEDDING_DTYPE = "float32"
+# Quantized indexes re-rank RESCORE_FACTOR * k candidates with the stored float32 embeddings; 0 disables it
+RESCORE_FACTOR = 4
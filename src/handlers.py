@@ -1,8 +1,7 @@
 import re
-from transformers import pipeline
-import torch
-from utils import classify_intent, match_exit_phrases, is_follow_up
+from utils import classify_intent, match_exit_phrases
 from utils import get_valid_input
+from FollowUpDetector import FollowUpDetector
 
 # def classify_intent(query, classifier):
 #     labels = ['save', 'question', 'update', 'delete', 'suggestion', 'emotion']
@@ -30,7 +29,9 @@ from utils import get_valid_input
 def handle_follow_ups(llm_manager, intent, context, initial_query, classifier):
     """
     Handles follow-up interactions with a language model manager based on user input's intent and context.
+    Pass a FollowUpDetector as the classifier to share its cache and metrics across calls.
     """
+    detector = classifier if isinstance(classifier, FollowUpDetector) else FollowUpDetector(classifier)
 
     conversation_history = [f"Context: {context}, '\n', User: {initial_query}"]
 
@@ -42,7 +43,7 @@ def handle_follow_ups(llm_manager, intent, context, initial_query, classifier):
     conversation_history.append(f"Assistant: {response}")
     print("\n\nAssistant Response: \n\n", response)
 
-    while is_follow_up(response, classifier):
+    while detector(response):
         follow_up_query = input("Assistant asked a follow-up question. If you do not have any follow up questions press 'Enter'.\n Add Your response: ").strip()
         
         if not follow_up_query:
@@ -57,7 +58,7 @@ def handle_follow_ups(llm_manager, intent, context, initial_query, classifier):
 
         context = "\n\n".join(conversation_history)
 
-        intent = classify_intent(follow_up_query, classifier)
+        intent = classify_intent(follow_up_query, detector.classify)
 
         if intent == "question":
             response = llm_manager.ask_question(context, initial_query)
@@ -66,5 +67,7 @@ def handle_follow_ups(llm_manager, intent, context, initial_query, classifier):
         
         conversation_history.append(f"Assistant: {response}")
         print("\n\nAssistant Response: \n\n", response)
+        detector.end_turn()
 
+    detector.end_turn()
     return conversation_history
@@ -1,16 +1,18 @@
 from handlers import handle_follow_ups, classify_intent
-from utils import get_valid_input, get_user_inputs
-from HTMLExtraction import HTMLExtraction
-from PDFExtraction import PDFExtraction
+from utils import get_valid_input, get_user_inputs, classifier
+from HTMLExtraction import extract_urls
+from PDFExtraction import extract_pdfs
 from TextProcessor import TextProcessor
-from transformers import pipeline
 from Operations import DataManager
+from EmbeddingStore import EmbeddingStore
 from LLMManager import LLMManager
 from ProfileProcessor import ProfileProcessor
+from ModelRegistry import registry
+from IntentClassifier import IntentClassifier
+from FollowUpDetector import FollowUpDetector
 import config
 import validators
 
-import torch
 import os
 import asyncio
 import shutil
@@ -20,12 +22,11 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
-DEVICE = "mps" if torch.backends.mps.is_available() else "cpu"
-CLASSIFIER_MODEL = "facebook/bart-large-mnli"
 LLM_MODEL = "gpt-3.5-turbo-0125"
 METRIC = 'mmr'
 
-classifier = pipeline("zero-shot-classification", model=CLASSIFIER_MODEL, device=0 if DEVICE == "mps" else -1)
+# The embedding classifier answers clear-cut intents and hands the rest to the zero-shot pipeline
+intent_classifier = IntentClassifier(fallback=classifier) if config.INTENT_CLASSIFIER == "embedding" else classifier
 
 
 def process_urls(urls, user_dir, save_intermediate):
@@ -33,31 +34,24 @@ def process_urls(urls, user_dir, save_intermediate):
     Process a list of URLs to extract HTML content.
     """
     loop = asyncio.get_event_loop()
-    tasks = []
-    for url in urls:
-
-        html_extractor = HTMLExtraction(url, save_intermediate=save_intermediate, base_extraction_dir=user_dir)
-        tasks.append(loop.create_task(html_extractor.extract_all()))
-
-    if tasks:
-        try:
-            loop.run_until_complete(asyncio.gather(*tasks))
-        except Exception as e:
-            print(e)
-            print("Error processing one or more URLs.")
+    results = loop.run_until_complete(extract_urls(urls, save_intermediate=save_intermediate, base_extraction_dir=user_dir))
+    if None in results:
+        print("Error processing one or more URLs.")
 
 def main():
     """Main function to run the personal assistant application."""
 
     print("Welcome to the Building Personal Assistant!")
+    # Load the classifier in the background while the user answers the first prompts
+    registry.warm_up([("zero-shot-classification", config.CLASSIFIER_MODEL)], background=True)
     
     while True:
         username = input("Enter your username: ").strip()
         user_dir = os.path.join(username, "extracted_contents")
-        summary_db = os.path.join(user_dir, "summary_profile.csv")
-        total_db = os.path.join(user_dir, "total_profile_data.csv")
+        summary_db = os.path.join(user_dir, "summary_profile")
+        total_db = os.path.join(user_dir, "total_profile_data")
         
-        if os.path.exists(user_dir) and (os.path.exists(summary_db) and os.path.exists(total_db)):
+        if os.path.exists(user_dir) and (EmbeddingStore(summary_db).exists() and EmbeddingStore(total_db).exists()):
             add_info = get_valid_input("Username exists. Would you like to add information to the DB? (yes/no): ", ['yes', 'no'])
             if add_info == 'yes':
                 break
@@ -71,7 +65,7 @@ def main():
                     except:
                         print("Please run the script again to create the summary database.")
                         return
-                    run_query_loop(manager, classifier)
+                    run_query_loop(manager, intent_classifier)
                     return
                 else:
                     delete_db = get_valid_input("Would you like to delete the existing DB? (yes/no): ", ['yes', 'no'])
@@ -99,9 +93,7 @@ def main():
     
     # Extract text, image, tables from PDFs
     if pdf_paths:
-        for pdf_path in pdf_paths:
-            pdf_extractor = PDFExtraction(pdf_path, base_extraction_dir=user_dir)
-            extracted_text = pdf_extractor.extract_all()
+        for pdf_extractor in extract_pdfs(pdf_paths, base_extraction_dir=user_dir):
             print(f"Extracted files are saved in: {pdf_extractor.base_dir}")
 
     # Extract text from URLs   
@@ -125,6 +117,7 @@ def main():
     # Process profile to create database
     print("Processing summary profile file to create database")
     text_processor.process_profile(user_dir)
+    text_processor.close()
 
     print("Your personal assistant is now ready!")
 
@@ -135,18 +128,23 @@ def main():
         print("Please run the script again to create the summary database.")
         return
     
-    run_query_loop(manager, classifier)
+    run_query_loop(manager, intent_classifier)
 
 def run_query_loop(manager, classifier):
     """Run the loop to handle user queries."""
 
     llm_manager = LLMManager(LLM_MODEL)
+    # One detector for the whole session so its classifier cache and metrics carry across queries
+    follow_up_detector = FollowUpDetector(classifier)
     while True:
         query = input("Enter your query (or type 'exit' to quit): ").strip()
         if not query:
             print("Please enter a valid query, If you want to exit, please type 'exit' ")
             continue
         if query.lower() == 'exit':
+            manager.close()
+            registry.report()
+            print(f"Follow-up detection: {follow_up_detector.stats()}")
             print("Goodbye!")
             break
         
@@ -167,7 +165,7 @@ def run_query_loop(manager, classifier):
             for result in results:
                 print(result)
             context = "\n\n".join(results)
-            conversation_history = handle_follow_ups(llm_manager, intent, context, query, classifier)
+            conversation_history = handle_follow_ups(llm_manager, intent, context, query, follow_up_detector)
         elif intent == 'update':
             manager.update_entry(query)
         elif intent == 'delete':
@@ -175,8 +173,11 @@ def run_query_loop(manager, classifier):
         elif intent in ['suggestion', 'emotion']:
             results = manager.retrieve_entries(query, k=5)
             context = "\n\n".join(results)
-            conversation_history = handle_follow_ups(llm_manager, intent, context, query, classifier)
+            conversation_history = handle_follow_ups(llm_manager, intent, context, query, follow_up_detector)
         elif intent in ['exit', 'quit']:
+            manager.close()
+            registry.report()
+            print(f"Follow-up detection: {follow_up_detector.stats()}")
             print("Goodbye!")
             break
         else:
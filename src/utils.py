@@ -1,11 +1,11 @@
-from transformers import pipeline
 import re
-from config import CLASSIFIER_MODEL, DEVICE
+from config import CLASSIFIER_MODEL
+from ModelRegistry import registry
 import validators
 import os
 
-# Initialize the classifier pipeline with the specified model and device
-classifier = pipeline("zero-shot-classification", model=CLASSIFIER_MODEL, device=0 if DEVICE == "mps" else -1)
+# Shared classifier pipeline, loaded by the model registry on its first call
+classifier = registry.lazy("zero-shot-classification", CLASSIFIER_MODEL)
 
 def get_valid_input(prompt, valid_options, max_retries=3):
     """
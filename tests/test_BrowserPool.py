@@ -0,0 +1,70 @@
+import pytest
+import sys
+import os
+import asyncio
+# Add the src directory to the system path for importing modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from unittest.mock import patch, AsyncMock, MagicMock
+from src.BrowserPool import BrowserPool
+
+class FakePage:
+    def __init__(self):
+        self.url = None
+        self.closed = False
+        self.keyboard = MagicMock(down=AsyncMock(), up=AsyncMock())
+
+    async def goto(self, url, options=None):
+        self.url = url
+        await asyncio.sleep(0)
+
+    async def content(self):
+        return f"<html><body><p>{self.url}</p></body></html>"
+
+    def isClosed(self):
+        return self.closed
+
+class FakeContext:
+    def __init__(self):
+        self.pages = []
+        self.closed = False
+
+    async def newPage(self):
+        self.pages.append(FakePage())
+        return self.pages[-1]
+
+    async def close(self):
+        self.closed = True
+
+class FakeBrowser:
+    def __init__(self):
+        self.contexts = []
+
+    async def createIncognitoBrowserContext(self):
+        self.contexts.append(FakeContext())
+        return self.contexts[-1]
+
+@pytest.mark.asyncio
+async def test_pages_are_reused_and_torn_down():
+    """
+    Test that the pool opens at most size pages in one browser, reuses them across renders,
+    replaces crashed pages, and closes every context and the session on close.
+    """
+    browser = FakeBrowser()
+    pool = BrowserPool(size=2)
+    with patch.object(pool, 'launch', new=AsyncMock(return_value=browser)) as mock_launch, \
+         patch.object(pool.session, 'close', new=AsyncMock()) as mock_session_close:
+        urls = [f"https://example.com/{n}" for n in range(6)]
+        contents = await asyncio.gather(*(pool.render(url, sleep=0) for url in urls))
+        assert contents == [f"<html><body><p>{url}</p></body></html>" for url in urls]
+        assert len(browser.contexts) == 2
+        assert mock_launch.await_count == 2
+
+        browser.contexts[0].pages[0].closed = True
+        await asyncio.gather(*(pool.render(f"https://example.com/again{n}", sleep=0) for n in range(2)))
+        assert len(browser.contexts) == 3
+
+        await pool.close()
+    assert all(context.closed for context in browser.contexts)
+    mock_session_close.assert_awaited_once()
+    assert pool.renders == 8
@@ -0,0 +1,60 @@
+import pytest
+import sys
+import os
+import numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from concurrent.futures import ProcessPoolExecutor
+from src.EmbeddingCache import EmbeddingCache
+
+def fake_encode(texts):
+    return np.stack([np.full(4, len(text), dtype=np.float32) for text in texts])
+
+def write_entries(path, worker):
+    cache = EmbeddingCache(path)
+    for start in range(0, 200, 20):
+        texts = [f"text {i}" for i in range(start, start + 20)] + [f"worker {worker} text {start}"]
+        cache.encode("model", texts, fake_encode)
+    return cache.stats()["misses"]
+
+def test_only_misses_are_encoded(tmp_path):
+    """
+    Test that cached embeddings are reused per model and only misses are sent to the encoder, across instances.
+    """
+    calls = []
+    def encode(texts):
+        calls.append(list(texts))
+        return fake_encode(texts)
+    path = str(tmp_path / "embeddings.sqlite")
+    cache = EmbeddingCache(path)
+    first = cache.encode("model", ["a", "bb"], encode)
+    second = EmbeddingCache(path).encode("model", ["bb", "ccc", "a"], encode)
+    assert calls == [["a", "bb"], ["ccc"]]
+    np.testing.assert_array_equal(second, fake_encode(["bb", "ccc", "a"]))
+    np.testing.assert_array_equal(first, fake_encode(["a", "bb"]))
+    assert cache.get_many("other-model", ["a"]) == [None]
+    assert cache.stats()["hits"] == 0 and cache.stats()["size"] == 3
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    """
+    Test that the cache stays under its size cap by evicting the least recently used entries.
+    """
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite"), max_bytes=10 * 16)
+    cache.encode("model", [f"text {i}" for i in range(8)], fake_encode)
+    cache.get_many("model", ["text 0"])
+    cache.encode("model", [f"new {i}" for i in range(4)], fake_encode)
+    stats = cache.stats()
+    assert stats["bytes"] <= 10 * 16 and stats["bytes"] == stats["size"] * 16
+    cached = cache.get_many("model", ["text 0"] + [f"new {i}" for i in range(4)])
+    assert all(embedding is not None for embedding in cached)
+    assert stats["size"] == 9
+
+def test_concurrent_processes_share_the_cache(tmp_path):
+    """
+    Test that several processes can fill the same cache at once without errors or duplicate entries.
+    """
+    path = str(tmp_path / "embeddings.sqlite")
+    with ProcessPoolExecutor(4) as executor:
+        misses = list(executor.map(write_entries, [path] * 4, range(4)))
+    assert all(count >= 10 for count in misses)
+    assert EmbeddingCache(path).stats()["size"] == 200 + 4 * 10
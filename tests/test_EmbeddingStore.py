@@ -0,0 +1,85 @@
+import pytest
+import sys
+import os
+import numpy as np
+import pandas as pd
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from unittest.mock import patch
+from src.EmbeddingStore import EmbeddingStore, migrate_directory
+
+def test_save_and_load_round_trip(tmp_path):
+    """
+    Test that texts and embeddings saved to the store are loaded back with a memory-mapped embedding matrix.
+    """
+    store = EmbeddingStore(str(tmp_path / "total_profile_data"))
+    embeddings = np.arange(12, dtype=np.float32).reshape(3, 4)
+    store.save_texts(["a", "b", "c"], embeddings)
+
+    df, loaded = store.load()
+    assert list(df['Text']) == ["a", "b", "c"]
+    assert list(df.index) == [0, 1, 2]
+    assert isinstance(loaded, np.memmap)
+    assert loaded.dtype == np.float32
+    np.testing.assert_array_equal(loaded, embeddings)
+
+def test_migrate_legacy_csv(tmp_path):
+    """
+    Test that a legacy CSV database with stringified embeddings is migrated to the binary store.
+    """
+    csv_file = tmp_path / "summary_profile.csv"
+    pd.DataFrame({
+        "Index": [0, 1],
+        "Text": ["first", "second"],
+        "Embeddings": [[0.5, 1.0, -2.0], [3.0, 0.25, 1.5]]
+    }).to_csv(csv_file, index=False)
+
+    migrate_directory(str(tmp_path))
+    store = EmbeddingStore(str(csv_file))
+    assert os.path.exists(store.table_file) and os.path.exists(store.embeddings_file)
+
+    df, embeddings = store.load()
+    assert list(df['Text']) == ["first", "second"]
+    np.testing.assert_array_equal(embeddings, np.array([[0.5, 1.0, -2.0], [3.0, 0.25, 1.5]], dtype=np.float32))
+
+def test_load_missing_store_raises(tmp_path):
+    """
+    Test that loading a store with neither binary files nor a legacy CSV raises an error.
+    """
+    with pytest.raises(FileNotFoundError):
+        EmbeddingStore(str(tmp_path / "missing")).load()
+
+def test_save_batches_streams_into_store(tmp_path):
+    """
+    Test that batches written one at a time load back as a single store with consecutive IDs.
+    """
+    store = EmbeddingStore(str(tmp_path / "total_profile_data"), dtype="float16")
+    batches = (([0, 1], ["a", "b"], np.ones((2, 4))), ([5], ["c"], np.full((1, 4), 2.0)))
+    assert store.save_batches(iter(batches)) == 3
+
+    store = EmbeddingStore(str(tmp_path / "total_profile_data"))
+    df, loaded = store.load()
+    assert list(df['Text']) == ["a", "b", "c"]
+    assert list(df.index) == [0, 1, 5]
+    assert store.next_id == 6
+    assert loaded.dtype == np.float16
+    np.testing.assert_array_equal(loaded[2], [2, 2, 2, 2])
+    ids, texts, embeddings = next(store.iter_batches(batch_size=2))
+    assert list(ids) == [0, 1] and texts == ["a", "b"] and embeddings.shape == (2, 4)
+
+def test_interrupted_save_keeps_previous_generation(tmp_path):
+    """
+    Test that a save interrupted before the switch leaves the previous store loadable, and that a completed save removes it.
+    """
+    store = EmbeddingStore(str(tmp_path / "total_profile_data"))
+    store.save_texts(["a", "b"], np.ones((2, 4)))
+    previous = (store.table_file, store.embeddings_file)
+    with patch.object(EmbeddingStore, 'switch_to', side_effect=OSError("crash")), pytest.raises(OSError):
+        store.save_texts(["a", "b", "c"], np.zeros((3, 4)))
+    df, embeddings = EmbeddingStore(str(tmp_path / "total_profile_data")).load()
+    assert list(df['Text']) == ["a", "b"] and len(embeddings) == 2
+
+    store.save_texts(["a", "b", "c"], np.zeros((3, 4)))
+    assert not any(os.path.exists(path) for path in previous)
+    df, embeddings = EmbeddingStore(str(tmp_path / "total_profile_data")).load()
+    assert list(df['Text']) == ["a", "b", "c"] and len(embeddings) == 3
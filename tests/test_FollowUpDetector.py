@@ -0,0 +1,46 @@
+import pytest
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from unittest.mock import MagicMock
+# handlers imports FollowUpDetector from src/ directly, so use that class for isinstance checks to match
+from src.handlers import handle_follow_ups, FollowUpDetector
+
+@pytest.fixture
+def classifier():
+    return MagicMock(return_value={'labels': ['Further Action Required', 'Response', 'Question']})
+
+def test_structural_signals_skip_classifier(classifier):
+    """
+    Test that a trailing question or a plain statement is decided without calling the classifier.
+    """
+    detector = FollowUpDetector(classifier)
+    assert detector("You studied physics. Would you like more details?")
+    assert not detector("You studied physics at MIT. You graduated in 2015.")
+    assert not classifier.called
+    assert detector.stats()["structural"] == 2
+
+def test_unsure_responses_classify_only_the_tail_once(classifier):
+    """
+    Test that unclear responses send only their last sentences to the classifier, and identical texts hit the cache.
+    """
+    detector = FollowUpDetector(classifier, tail_sentences=1)
+    response = "Here is a long summary of your profile. It covers your work. Please share your preferred dates."
+    assert detector(response)
+    assert detector(response)
+    classifier.assert_called_once_with("Please share your preferred dates.", ["Question", "Response", "Further Action Required"])
+    assert detector.stats()["classifier_calls"] == 1
+
+def test_handle_follow_ups_records_turn_metrics(classifier, monkeypatch):
+    """
+    Test that each follow-up turn records its classifier calls and that replies are classified through the cache.
+    """
+    llm_manager = MagicMock()
+    llm_manager.ask_question.side_effect = ["Which city do you mean?", "Boston has many parks."]
+    classifier.return_value = {'labels': ['question']}
+    detector = FollowUpDetector(classifier)
+    monkeypatch.setattr('builtins.input', lambda _: "The one I live in")
+    history = handle_follow_ups(llm_manager, "question", "context", "Tell me about my city", detector)
+    assert history[-1] == "Assistant: Boston has many parks."
+    assert [turn["classifier_calls"] for turn in detector.metrics["turns"]] == [1, 0]
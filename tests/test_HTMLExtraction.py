@@ -5,23 +5,95 @@ import asyncio
 # Add the src directory to the system path for importing modules
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
 
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 from unittest.mock import patch, AsyncMock
-from src.HTMLExtraction import HTMLExtraction
+from src.HTMLExtraction import HTMLExtraction, extract_urls
+
+ARTICLE = "<html><head><style>p { margin: 0; }</style></head><body><h1>Notes</h1>" + "<p>I moved to Lisbon in 2019 and work as a data engineer.</p>" * 10 + "</body></html>"
+# A single-page app: the text only exists once its script runs
+APP_SHELL = "<html><head><script src='/bundle.js'></script></head><body><noscript>You need to enable JavaScript to run this app.</noscript><div id='root'></div></body></html>"
+
+# The page under /versioned, with the validators it is served with, and the status of each response
+VERSIONED = {"body": ARTICLE, "etag": '"v1"', "last_modified": "Mon, 05 Oct 2026 10:00:00 GMT"}
+STATUSES = []
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """
+    Serves a static article under /article, a JavaScript-only app shell under /app, and under
+    /versioned an article with ETag and Last-Modified headers that answers conditional requests.
+    """
+    def do_GET(self):
+        if self.path.startswith("/versioned"):
+            if_none_match = self.headers.get("If-None-Match")
+            if if_none_match == VERSIONED["etag"] or (if_none_match is None and self.headers.get("If-Modified-Since") == VERSIONED["last_modified"]):
+                STATUSES.append(304)
+                self.send_response(304)
+                self.end_headers()
+                return
+            STATUSES.append(200)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("ETag", VERSIONED["etag"])
+            self.send_header("Last-Modified", VERSIONED["last_modified"])
+            self.end_headers()
+            self.wfile.write(VERSIONED["body"].encode("utf-8"))
+            return
+        if self.path.startswith("/article"):
+            body = ARTICLE
+        elif self.path.startswith("/app"):
+            body = APP_SHELL
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.end_headers()
+        self.wfile.write(body.encode("utf-8"))
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture(scope="module")
+def local_site():
+    """
+    Local HTTP stand-in for real websites, returning its base URL.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
 
 @pytest.mark.asyncio
-async def test_fetch_and_save_html():
+async def test_fetch_and_save_html(local_site, tmp_path):
     """
     Test the fetch_and_save_html method of HTMLExtraction class to ensure it fetches and saves HTML content correctly.
+    A page whose text is built by JavaScript is rendered in the browser.
     """
-    html_extractor = HTMLExtraction('https://example.com', save_intermediate=True)
-    
-    mock_response = AsyncMock()
-    mock_response.html.arender = AsyncMock()
-    mock_response.html.html = "<html><body><p>Hello</p></body></html>"
+    html_extractor = HTMLExtraction(f'{local_site}/app', save_intermediate=True, base_extraction_dir=str(tmp_path))
     
-    with patch('requests_html.AsyncHTMLSession.get', new=AsyncMock(return_value=mock_response)) as mock_get:
+    with patch.object(html_extractor.pool, 'render', new=AsyncMock(return_value="<html><body><p>Hello</p></body></html>")) as mock_render:
         html_content = await html_extractor.fetch_and_save_html()
         assert html_content is not None
+        mock_render.assert_awaited_once()
+    assert html_extractor.tier == 'rendered'
+    await html_extractor.close()
+
+@pytest.mark.asyncio
+async def test_static_page_is_not_rendered(local_site, tmp_path):
+    """
+    Test that a page whose static HTML holds its text is served by the plain HTTP GET, without the browser.
+    """
+    html_extractor = HTMLExtraction(f'{local_site}/article', base_extraction_dir=str(tmp_path))
+    with patch.object(html_extractor.pool, 'render', new=AsyncMock()) as mock_render:
+        text = await html_extractor.extract_all()
+        mock_render.assert_not_awaited()
+    assert html_extractor.tier == 'static'
+    assert text.startswith("Notes") and "I moved to Lisbon in 2019" in text
+    assert not html_extractor._has_meaningful_text(APP_SHELL)
+    await html_extractor.close()
 
 @pytest.mark.asyncio
 async def test_clean_html():
@@ -42,3 +114,65 @@ async def test_extract_text_from_html():
     html_content = "<html><body><p>Hello</p></body></html>"
     text = await html_extractor.extract_text_from_html(html_content)
     assert text.strip() == "Hello"
+
+@pytest.mark.asyncio
+async def test_extract_urls_shares_one_bounded_pool(local_site, tmp_path):
+    """
+    Test that extract_urls renders the URLs that need it in a single pool of at most pool_size
+    pages, and returns the extractions in the order of the URLs with the tier that served each.
+    """
+    from src.HTMLExtraction import BrowserPool
+    urls = [f"{local_site}/app/page{n}" for n in range(7)] + [f"{local_site}/article"]
+    pools = []
+    rendering = []
+    max_rendering = 0
+
+    async def render(self, url, **kwargs):
+        nonlocal max_rendering
+        pools.append(self)
+        rendering.append(url)
+        max_rendering = max(max_rendering, len(rendering))
+        await asyncio.sleep(0.01)
+        rendering.remove(url)
+        if url.endswith("page3"):
+            raise RuntimeError("render failed")
+        return f"<html><body><p>{url}</p></body></html>"
+
+    with patch.object(BrowserPool, 'render', new=render), patch.object(BrowserPool, 'close', new=AsyncMock()) as mock_close:
+        results = await extract_urls(urls, base_extraction_dir=str(tmp_path), pool_size=3, cache_path=None)
+    assert len(set(map(id, pools))) == 1
+    assert pools[0].size == 3 and max_rendering == 3
+    assert [html_extractor and html_extractor.url for html_extractor in results] == [None if n == 3 else url for n, url in enumerate(urls)]
+    assert [html_extractor.tier for html_extractor in results if html_extractor] == ['rendered'] * 6 + ['static']
+    mock_close.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_unchanged_pages_are_revalidated_from_cache(local_site, tmp_path):
+    """
+    Test that a cached page is fetched with a conditional GET on the next run, and that a 304
+    skips cleaning and extraction but still writes the text, while a changed page is extracted again.
+    """
+    from src.HTMLExtraction import HTTPCache
+    url = f"{local_site}/versioned"
+    cache_path = str(tmp_path / "http.sqlite")
+    STATUSES.clear()
+    first = await extract_urls([url], base_extraction_dir=str(tmp_path / "first"), cache_path=cache_path)
+    assert STATUSES == [200] and first[0].tier == 'static'
+
+    with patch.object(HTMLExtraction, 'clean_html', new=AsyncMock()) as mock_clean:
+        second = await extract_urls([url], base_extraction_dir=str(tmp_path / "second"), cache_path=cache_path)
+        mock_clean.assert_not_awaited()
+    assert STATUSES == [200, 304] and second[0].tier == 'static'
+    text_file = second[0].base_dir / 'extracted_text.txt'
+    assert text_file.read_text(encoding='utf-8') == (first[0].base_dir / 'extracted_text.txt').read_text(encoding='utf-8')
+
+    VERSIONED.update(body=ARTICLE.replace("Lisbon", "Porto"), etag='"v2"')
+    try:
+        third = await extract_urls([url], base_extraction_dir=str(tmp_path / "third"), cache_path=cache_path)
+    finally:
+        VERSIONED.update(body=ARTICLE, etag='"v1"')
+    assert STATUSES == [200, 304, 200]
+    assert "Porto" in (third[0].base_dir / 'extracted_text.txt').read_text(encoding='utf-8')
+    cache = HTTPCache(cache_path)
+    assert cache.get(url)["etag"] == '"v2"' and "Porto" in cache.get(url)["text"]
+    cache.close()
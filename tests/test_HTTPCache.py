@@ -0,0 +1,45 @@
+import pytest
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from src.HTTPCache import HTTPCache
+
+def test_entries_round_trip_and_replace(tmp_path):
+    """
+    Test that a cached page is returned with its validators, that storing a URL again replaces
+    its entry, and that the stats count revalidations.
+    """
+    path = str(tmp_path / "http.sqlite")
+    cache = HTTPCache(path)
+    assert cache.get("https://example.com/") is None
+    cache.put("https://example.com/", '"v1"', None, "rendered", "<div id='root'></div>", "<p>Hello</p>", "Hello")
+    cache.put("https://example.com/", '"v2"', "Mon, 05 Oct 2026 10:00:00 GMT", "static", "<p>Hello again</p>", None, "Hello again")
+    cache.close()
+
+    cache = HTTPCache(path)
+    assert cache.get("https://example.com/") == {
+        "etag": '"v2"',
+        "last_modified": "Mon, 05 Oct 2026 10:00:00 GMT",
+        "tier": "static",
+        "raw": "<p>Hello again</p>",
+        "rendered": None,
+        "text": "Hello again",
+    }
+    cache.record(True)
+    cache.record(False)
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5, "size": 1, "bytes": len("<p>Hello again</p>") + len("Hello again")}
+    cache.close()
+
+def test_least_recently_used_pages_are_evicted(tmp_path):
+    """
+    Test that the cache stays under its size by evicting the least recently used pages.
+    """
+    cache = HTTPCache(str(tmp_path / "http.sqlite"), max_bytes=1000)
+    for n in range(5):
+        cache.put(f"https://example.com/{n}", f'"{n}"', None, "static", "x" * 150, None, "y" * 50)
+    assert cache.get("https://example.com/0") is not None
+    cache.put("https://example.com/5", '"5"', None, "static", "x" * 150, None, "y" * 50)
+    assert [n for n in range(6) if cache.get(f"https://example.com/{n}") is not None] == [0, 3, 4, 5]
+    assert cache.stats()["bytes"] == 800
+    cache.close()
@@ -0,0 +1,53 @@
+import pytest
+import sys
+import os
+import zlib
+import numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from unittest.mock import MagicMock
+from src.utils import classify_intent
+from src.IntentClassifier import IntentClassifier
+
+class BagOfWordsModel:
+    """
+    Stand-in embedding model: texts that share words get similar embeddings.
+    """
+    def encode(self, texts, **kwargs):
+        embeddings = np.zeros((len(texts), 64), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                embeddings[row, zlib.crc32(word.encode()) % 64] += 1
+        return embeddings + 1e-3
+
+EXAMPLES = {
+    'save': ["remember that my colour is blue"],
+    'delete': ["delete my phone number"],
+    'question': ["where do i live"],
+    'update': ["change my job title"],
+    'suggestion': ["suggest a good book"],
+    'emotion': ["i feel sad today"],
+}
+
+@pytest.fixture
+def fallback():
+    return MagicMock(return_value={'labels': ['question', 'save', 'delete']})
+
+def test_clear_intent_uses_embeddings(fallback):
+    """
+    Test that a query close to one intent's examples is classified without the fallback.
+    """
+    classifier = IntentClassifier(fallback=fallback, examples=EXAMPLES, model=BagOfWordsModel(), margin_threshold=0.1)
+    assert classify_intent("please delete my phone number", classifier) == 'delete'
+    assert not fallback.called
+    assert classifier.stats() == {"embedding": 1, "fallback": 0, "fallback_rate": 0.0}
+
+def test_ambiguous_or_unknown_labels_use_fallback(fallback):
+    """
+    Test that low-margin queries and labels without examples are passed to the zero-shot fallback.
+    """
+    classifier = IntentClassifier(fallback=fallback, examples=EXAMPLES, model=BagOfWordsModel(), margin_threshold=0.1)
+    assert classify_intent("xyzzy", classifier) == 'question'
+    classifier("Do you need more details?", ["Question", "Response", "Further Action Required"])
+    assert fallback.call_count == 2
+    assert classifier.stats()["fallback_rate"] == 1.0
@@ -0,0 +1,33 @@
+import pytest
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from unittest.mock import patch
+from src.LRUCache import LRUCache
+
+def test_evicts_least_recently_used():
+    """
+    Test that the least recently used entry is evicted once the cache is full.
+    """
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats() == {"hits": 3, "misses": 1, "hit_rate": 0.75, "size": 2}
+
+def test_expired_entries_are_misses():
+    """
+    Test that entries older than the TTL are treated as misses and dropped.
+    """
+    cache = LRUCache(maxsize=2, ttl=10)
+    with patch('time.monotonic', return_value=100.0):
+        cache.put("a", 1)
+    with patch('time.monotonic', return_value=105.0):
+        assert cache.get("a") == 1
+    with patch('time.monotonic', return_value=111.0):
+        assert cache.get("a") is None
+    assert len(cache) == 0
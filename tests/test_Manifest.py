@@ -0,0 +1,43 @@
+import pytest
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from src.Manifest import Manifest
+
+def test_diff_finds_new_changed_and_removed_files(tmp_path):
+    """
+    Test that only new or changed files are reported, and files missing from disk are reported as removed.
+    """
+    for name in ("a.txt", "b.txt", "c.txt"):
+        (tmp_path / name).write_text(f"content of {name}")
+    manifest = Manifest(str(tmp_path / "store.manifest.json"))
+    paths = [str(tmp_path / name) for name in ("a.txt", "b.txt", "c.txt")]
+    assert manifest.diff(paths) == (paths, [])
+    for i, path in enumerate(paths):
+        manifest.record(path, [i])
+    manifest.save()
+
+    manifest = Manifest(str(tmp_path / "store.manifest.json"))
+    assert manifest.load()
+    (tmp_path / "b.txt").write_text("new content of b.txt")
+    (tmp_path / "c.txt").unlink()
+    (tmp_path / "d.txt").write_text("content of d.txt")
+    changed, removed = manifest.diff([paths[0], paths[1], str(tmp_path / "d.txt")])
+    assert changed == [paths[1], str(tmp_path / "d.txt")]
+    assert removed == ["c.txt"]
+    assert manifest.remove("c.txt") == [2]
+    assert manifest.remove("c.txt") == []
+
+def test_diff_ignores_touched_but_unchanged_files(tmp_path):
+    """
+    Test that a file whose mtime changed but whose content did not is not re-processed.
+    """
+    path = tmp_path / "a.txt"
+    path.write_text("same content")
+    manifest = Manifest(str(tmp_path / "store.manifest.json"))
+    manifest.record(str(path), [0, 1])
+    mtime = os.stat(path).st_mtime_ns + 10**9
+    os.utime(path, ns=(mtime, mtime))
+    assert manifest.diff([str(path)]) == ([], [])
+    assert manifest.files["a.txt"]["mtime"] == mtime
@@ -0,0 +1,57 @@
+import pytest
+import sys
+import os
+import threading
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from unittest.mock import MagicMock
+from src.ModelRegistry import ModelRegistry
+
+@pytest.fixture
+def registry():
+    registry = ModelRegistry()
+    registry.loaders["zero-shot-classification"] = MagicMock(side_effect=lambda name: MagicMock(return_value={'labels': ['save']}))
+    return registry
+
+def test_models_are_loaded_once_and_shared(registry):
+    """
+    Test that every caller gets the same instance and that load statistics are recorded.
+    """
+    first = registry.zero_shot_classifier("bart")
+    assert registry.zero_shot_classifier("bart") is first
+    assert registry.loaders["zero-shot-classification"].call_count == 1
+    assert registry.stats[("zero-shot-classification", "bart")]["load_time"] >= 0
+    registry.report()
+
+def test_lazy_model_loads_on_first_call(registry):
+    """
+    Test that a lazy stand-in loads nothing until it is called, and that warm-up loads ahead of use.
+    """
+    classifier = registry.lazy("zero-shot-classification", "bart")
+    assert not registry.is_loaded("zero-shot-classification", "bart")
+    assert classifier("Please save this", ['save', 'question']) == {'labels': ['save']}
+    assert registry.is_loaded("zero-shot-classification", "bart")
+
+    registry.warm_up([("zero-shot-classification", "other")], background=True).join()
+    assert registry.is_loaded("zero-shot-classification", "other")
+    assert registry.loaders["zero-shot-classification"].call_count == 2
+
+def test_background_load_does_not_block_other_models(registry):
+    """
+    Test that a model still loading in a background warm-up does not hold up loading a different model.
+    """
+    loading = threading.Event()
+    release = threading.Event()
+    def slow_load(name):
+        loading.set()
+        release.wait(5)
+        return MagicMock()
+    registry.loaders["zero-shot-classification"] = slow_load
+    registry.loaders["sentence-transformer"] = MagicMock(return_value=MagicMock())
+    thread = registry.warm_up([("zero-shot-classification", "bart")], background=True)
+    assert loading.wait(5)
+    registry.sentence_transformer("minilm")
+    assert not registry.is_loaded("zero-shot-classification", "bart")
+    release.set()
+    thread.join()
+    assert registry.is_loaded("zero-shot-classification", "bart")
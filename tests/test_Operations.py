@@ -0,0 +1,384 @@
+import pytest
+import sys
+import os
+import zlib
+import numpy as np
+import pandas as pd
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from unittest.mock import patch
+from src.Operations import DataManager, maximal_marginal_relevance
+from src.EmbeddingStore import EmbeddingStore
+from src.ModelRegistry import ModelRegistry
+
+DIM = 8
+
+class FakeSentenceTransformer:
+    """
+    Deterministic stand-in for SentenceTransformer that embeds texts by hashing them.
+    """
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def get_sentence_embedding_dimension(self):
+        return DIM
+
+    def encode(self, texts, convert_to_tensor=False, **kwargs):
+        import torch
+        embeddings = np.stack([np.random.default_rng(zlib.crc32(t.encode())).standard_normal(DIM) for t in texts]).astype(np.float32)
+        return torch.from_numpy(embeddings) if convert_to_tensor else embeddings
+
+def write_profile_csv(path, texts):
+    model = FakeSentenceTransformer()
+    df = pd.DataFrame({
+        "Index": list(range(len(texts))),
+        "Text": texts,
+        "Embeddings": [emb.tolist() for emb in model.encode(texts)]
+    })
+    df.to_csv(path, index=False)
+
+@pytest.fixture
+def csv_file(tmp_path):
+    path = tmp_path / "summary_profile.csv"
+    write_profile_csv(path, ["I like hiking", "My name is Sam", "I work as an engineer", "I live in Boston"])
+    return str(path)
+
+@pytest.fixture(autouse=True)
+def fake_model():
+    registry = ModelRegistry(embedding_cache_path=None)
+    registry.loaders["sentence-transformer"] = FakeSentenceTransformer
+    with patch('src.Operations.registry', registry):
+        yield
+
+def test_retrieve_entries_uses_persisted_index(csv_file):
+    """
+    Test that the vector index is saved next to the CSV and reused instead of being rebuilt.
+    """
+    manager = DataManager(csv_file, metric="cosine")
+    assert os.path.exists(manager.index_file)
+    assert manager.retrieve_entries("I live in Boston", k=1) == ["I live in Boston"]
+
+    with patch.object(DataManager, 'build_index') as mock_build:
+        reloaded = DataManager(csv_file, metric="cosine")
+        assert not mock_build.called
+    assert reloaded.retrieve_entries("My name is Sam", k=1) == ["My name is Sam"]
+
+def test_save_and_delete_entry_update_index(csv_file, monkeypatch):
+    """
+    Test that saving and deleting entries keeps the index in sync across reloads.
+    """
+    manager = DataManager(csv_file, metric="l2")
+    manager.save_entry("I have a dog named Rex")
+    assert manager.retrieve_entries("I have a dog named Rex", k=1) == ["I have a dog named Rex"]
+
+    monkeypatch.setattr('builtins.input', lambda _: "yes")
+    manager.delete_entry("My name is Sam")
+    assert "My name is Sam" not in manager.df.loc[~manager.df['Deleted'], 'Text'].values
+    assert len(manager.index) == 4
+
+    reloaded = DataManager(csv_file, metric="l2")
+    assert set(reloaded.index.ids()) == set(reloaded.df.index[~reloaded.df['Deleted']])
+    assert reloaded.retrieve_entries("I have a dog named Rex", k=1) == ["I have a dog named Rex"]
+
+def test_changes_are_logged_and_replayed(csv_file):
+    """
+    Test that saved entries are appended to the write-ahead log and replayed after a crash.
+    """
+    manager = DataManager(csv_file, metric="cosine")
+    store_mtime = manager.store.mtime()
+    manager.save_entry("I have a dog named Rex")
+    assert len(manager.wal) == 1
+    assert manager.store.mtime() == store_mtime
+
+    # Simulate a crash: the store was never rewritten, only the log survives
+    manager.wal.close()
+    reloaded = DataManager(csv_file, metric="cosine")
+    assert reloaded.retrieve_entries("I have a dog named Rex", k=1) == ["I have a dog named Rex"]
+    assert len(reloaded.df) == 5
+
+def test_compaction_folds_log_into_store(csv_file, monkeypatch):
+    """
+    Test that reaching the compaction threshold writes the store and clears the log.
+    """
+    manager = DataManager(csv_file, metric="cosine", compact_threshold=2, tombstone_threshold=0.5)
+    manager.save_entry("I have a dog named Rex")
+    monkeypatch.setattr('builtins.input', lambda _: "yes")
+    manager.delete_entry("My name is Sam")
+    manager.wait_for_compaction()
+    assert len(manager.wal) == 0
+    assert manager.wal.sealed_segments() == []
+
+    # The deleted entry is persisted as a tombstone until its space is reclaimed
+    df, embeddings = EmbeddingStore(csv_file).load()
+    live = df[~df['Deleted']]
+    assert "I have a dog named Rex" in live['Text'].values
+    assert "My name is Sam" not in live['Text'].values
+    assert len(embeddings) == len(df) == 5
+
+def test_changes_are_buffered_until_compaction(csv_file):
+    """
+    Test that adds and updates leave the memory-mapped matrix untouched until compaction merges them.
+    """
+    manager = DataManager(csv_file, metric="cosine", compact_threshold=100)
+    stored = manager.embeddings
+    manager.save_entry("I have a dog named Rex")
+    manager.log_change('update', 1, "My name is Alex", manager.encode_text("My name is Alex"))
+    assert manager.embeddings is stored and set(manager.pending) == {1, 4}
+    assert manager.retrieve_entries("My name is Alex", k=1) == ["My name is Alex"]
+    assert manager.retrieve_entries("I have a dog named Rex", k=1) == ["I have a dog named Rex"]
+
+    manager.compact()
+    assert manager.pending == {} and len(manager.embeddings) == 5
+    np.testing.assert_allclose(manager.embeddings[1], manager.encode_text("My name is Alex"))
+    df, embeddings = EmbeddingStore(csv_file).load()
+    np.testing.assert_array_equal(embeddings, manager.embeddings)
+
+def test_encode_text_uses_query_cache(csv_file):
+    """
+    Test that repeated queries are served from the LRU cache and counted as hits.
+    """
+    manager = DataManager(csv_file, metric="cosine", query_cache_size=2)
+    with patch.object(manager.model, 'encode', wraps=manager.model.encode) as mock_encode:
+        first = manager.encode_text("Where do I live?")
+        first[:] = 0
+        second = manager.encode_text("  Where do   I live? ")
+        assert mock_encode.call_count == 1
+        assert np.any(second != 0)
+        manager.encode_text("a")
+        manager.encode_text("b")
+        manager.encode_text("Where do I live?")
+        assert mock_encode.call_count == 4
+    assert manager.query_cache.stats()["hits"] == 1
+
+@pytest.mark.parametrize("metric, fetch_k", [("cosine", None), ("l2", None), ("mmr", None), ("mmr", 3)])
+def test_retrieve_entries_batch_matches_single_queries(csv_file, metric, fetch_k):
+    """
+    Test that batch retrieval returns the same entries as looping over retrieve_entries, with one encoder call.
+    """
+    manager = DataManager(csv_file, metric=metric, mmr_fetch_k=fetch_k)
+    queries = ["I live in Boston", "hiking on weekends", "what is my job?"]
+    with patch.object(manager.model, 'encode', wraps=manager.model.encode) as mock_encode:
+        batch = manager.retrieve_entries_batch(queries, k=2, return_indices=True)
+        assert mock_encode.call_count == 1
+    for query, (ids, texts) in zip(queries, batch):
+        single_ids, single_texts = manager.retrieve_entries(query, k=2, return_indices=True)
+        assert list(ids) == list(single_ids)
+        assert texts == single_texts
+
+def test_retrieve_entries_batch_rejects_incompatible_metric(csv_file):
+    """
+    Test that a metric the index was not built for is rejected.
+    """
+    manager = DataManager(csv_file, metric="cosine")
+    assert len(manager.retrieve_entries_batch(["I live in Boston"], k=1, metric="mmr")) == 1
+    with pytest.raises(ValueError):
+        manager.retrieve_entries_batch(["I live in Boston"], metric="l2")
+
+def test_hnsw_index_is_rebuilt_on_compaction(csv_file, monkeypatch):
+    """
+    Test that an HNSW profile masks deleted entries and is rebuilt cleanly when the log is compacted.
+    """
+    manager = DataManager(csv_file, metric="cosine", index_type="hnsw", tombstone_threshold=0.5)
+    monkeypatch.setattr('builtins.input', lambda _: "yes")
+    manager.delete_entry("My name is Sam")
+    assert not manager.index.is_clean()
+    assert "My name is Sam" not in manager.retrieve_entries("My name is Sam", k=4)
+
+    manager.close()
+    assert manager.index.is_clean()
+    reloaded = DataManager(csv_file, metric="cosine", index_type="hnsw")
+    assert reloaded.index.index_type == "hnsw"
+    assert set(reloaded.index.ids()) == set(reloaded.df.index[~reloaded.df['Deleted']])
+
+def test_index_rebuilt_when_store_is_newer(csv_file):
+    """
+    Test that a stale index is rebuilt after the embedding store is rewritten.
+    """
+    manager = DataManager(csv_file, metric="cosine")
+    store = EmbeddingStore(csv_file)
+    store.save_texts(["A brand new profile"], FakeSentenceTransformer().encode(["A brand new profile"]))
+    for path in (store.table_file, store.embeddings_file):
+        os.utime(path, (os.path.getatime(path), os.path.getmtime(manager.index_file) + 10))
+    manager = DataManager(csv_file, metric="cosine")
+    assert len(manager.index) == 1
+    assert manager.retrieve_entries("anything", k=3) == ["A brand new profile"]
+
+def test_delete_marks_tombstone_until_reclaimed(csv_file):
+    """
+    Test that deletes only mask entries until the tombstone threshold reclaims their space.
+    """
+    manager = DataManager(csv_file, metric="mmr", tombstone_threshold=0.5)
+    manager.log_change('delete', 1)
+    assert len(manager.df) == 4 and manager.num_deleted == 1
+    assert "My name is Sam" not in manager.retrieve_entries("My name is Sam", k=4)
+    assert len(manager.retrieve_entries("My name is Sam", k=4)) == 3
+
+    manager.log_change('delete', 3)
+    manager.log_change('delete', 2)
+    assert manager.num_deleted == 0
+    assert list(manager.df.index) == [0]
+    assert len(manager.embeddings) == 1 and manager.index.is_clean()
+
+def test_ids_are_not_reused_after_delete(csv_file):
+    """
+    Test that deleting the newest entry does not hand its ID out again, also after a reload.
+    """
+    manager = DataManager(csv_file, metric="cosine", tombstone_threshold=0.0)
+    manager.log_change('delete', 3)
+    assert 3 not in manager.df.index
+    manager.save_entry("I have a dog named Rex")
+    assert manager.df.index[-1] == 4
+    manager.close()
+
+    reloaded = DataManager(csv_file, metric="cosine")
+    assert reloaded.next_id() == 5
+
+def test_delete_with_duplicate_texts_removes_one_entry(tmp_path):
+    """
+    Test that deleting one of several identical texts removes exactly the selected entry.
+    """
+    path = tmp_path / "summary_profile.csv"
+    write_profile_csv(path, ["I like hiking", "I like hiking", "I live in Boston"])
+    manager = DataManager(str(path), metric="cosine", tombstone_threshold=1.0)
+    ids, _ = manager.retrieve_entries("I like hiking", k=1, return_indices=True)
+    manager.log_change('delete', ids[0])
+    assert manager.retrieve_entries("I like hiking", k=3) == ["I like hiking", "I live in Boston"]
+
+def test_quantized_index_rescores_from_float16_store(csv_file):
+    """
+    Test that a PQ-compressed index over a float16 store returns the same entries as the exact index.
+    """
+    exact = DataManager(csv_file, metric="cosine")
+    queries = ["I live in Boston", "hiking on weekends", "what is my job?"]
+    expected = exact.retrieve_entries_batch(queries, k=3)
+    manager = DataManager(csv_file, metric="cosine", embedding_dtype="float16", index_params={"quantization": "pq", "pq_m": 2})
+    assert manager.index.quantization == "pq"
+    assert manager.retrieve_entries_batch(queries, k=3) == expected
+    manager.save_entry("I have a dog named Rex")
+    manager.compact()
+    assert EmbeddingStore(csv_file).load()[1].dtype == np.float16
+    assert manager.retrieve_entries("I have a dog named Rex", k=1) == ["I have a dog named Rex"]
+
+def test_pq_profile_grows_from_a_single_entry(tmp_path):
+    """
+    Test that a one-entry profile under PQ starts uncompressed, survives deletes, and is rebuilt with PQ only once it is large enough.
+    """
+    path = tmp_path / "summary_profile.csv"
+    write_profile_csv(path, ["I like hiking"])
+    manager = DataManager(str(path), metric="cosine", tombstone_threshold=1.0, index_params={"quantization": "pq", "pq_m": 2})
+    assert manager.index.quantization is None
+    texts = ["My name is Sam", "I work as an engineer", "I live in Boston", "I have a dog named Rex", "I play chess"]
+    with patch.object(DataManager, 'build_index', autospec=True, side_effect=DataManager.build_index) as mock_build:
+        for text in texts:
+            manager.save_entry(text)
+        assert mock_build.call_count == 1
+    assert manager.index.quantization == "pq"
+    manager.log_change('delete', 5)
+    assert manager.retrieve_entries("I live in Boston", k=2)[0] == "I live in Boston"
+    assert "I play chess" not in manager.retrieve_entries("I play chess", k=5)
+
+def test_auto_index_switches_back_to_flat_only_well_below_threshold(csv_file):
+    """
+    Test that a profile around the ANN threshold keeps its ANN index instead of being rebuilt on every change.
+    """
+    with patch('VectorIndex.ANN_THRESHOLD', 5), patch('VectorIndex.ANN_INDEX_TYPE', "hnsw"):
+        manager = DataManager(csv_file, metric="cosine", index_type="auto", tombstone_threshold=1.0)
+        assert manager.index.index_type == "flat"
+        with patch.object(DataManager, 'build_index', autospec=True, side_effect=DataManager.build_index) as mock_build:
+            manager.save_entry("I have a dog named Rex")
+            assert manager.index.index_type == "hnsw"
+            manager.log_change('delete', 4)
+            manager.save_entry("I play chess")
+            manager.log_change('delete', 5)
+            assert manager.index.index_type == "hnsw" and mock_build.call_count == 1
+            manager.log_change('delete', 3)
+            assert manager.index.index_type == "flat" and mock_build.call_count == 2
+
+def test_ivf_flat_with_pq_is_rejected(csv_file):
+    """
+    Test that a profile cannot be opened with PQ quantization of an IVF-Flat index, which builds as 'ivf_pq'.
+    """
+    with pytest.raises(ValueError):
+        DataManager(csv_file, metric="cosine", index_type="ivf_flat", index_params={"quantization": "pq"})
+
+def reference_mmr(query_embedding, doc_embeddings, top_k=5, lambda_param=0.5):
+    """
+    The original loop-based MMR, kept to check the vectorized selection against it.
+    """
+    sim_scores = np.dot(doc_embeddings, query_embedding.T).flatten()
+    selected = []
+    while len(selected) < top_k:
+        if not selected:
+            selected_idx = np.argmax(sim_scores)
+        else:
+            mmr_scores = []
+            for idx in range(len(doc_embeddings)):
+                if idx not in selected:
+                    diversity = max([np.dot(doc_embeddings[idx], doc_embeddings[sel_idx]) for sel_idx in selected])
+                    mmr_scores.append((lambda_param * sim_scores[idx] - (1 - lambda_param) * diversity, idx))
+            selected_idx = max(mmr_scores)[1]
+        selected.append(selected_idx)
+    return selected
+
+def test_vectorized_mmr_matches_reference():
+    """
+    Test that the vectorized MMR picks the same rows as the loop implementation, including on ties.
+    """
+    rng = np.random.default_rng(0)
+    docs = rng.standard_normal((200, DIM)).astype(np.float32)
+    # Duplicated rows produce exact ties in both relevance and diversity
+    docs[150:] = docs[:50]
+    docs /= np.linalg.norm(docs, axis=1, keepdims=True)
+    for _ in range(5):
+        query = rng.standard_normal(DIM).astype(np.float32)
+        query /= np.linalg.norm(query)
+        for lambda_param in (0.0, 0.5, 1.0):
+            expected = reference_mmr(query, docs, top_k=10, lambda_param=lambda_param)
+            assert list(maximal_marginal_relevance(query, docs, top_k=10, lambda_param=lambda_param)) == expected
+
+def test_mmr_with_candidate_pool(csv_file):
+    """
+    Test that MMR over an index candidate pool returns valid entry IDs and never more than the corpus holds.
+    """
+    manager = DataManager(csv_file, metric="mmr")
+    full_ids, full_texts = manager.retrieve_entries("I live in Boston", k=2, return_indices=True)
+    pool_ids, pool_texts = manager.mmr(manager.encode_text("I live in Boston"), top_k=2, return_indices=True, fetch_k=3)
+    assert pool_texts[0] == full_texts[0] == "I live in Boston"
+    assert set(pool_ids) <= set(manager.df.index)
+    assert len(manager.retrieve_entries("I live in Boston", k=10)) == 4
+
+def test_mmr_reuses_normalized_corpus_until_it_changes(csv_file):
+    """
+    Test that full MMR scans normalize the live corpus once and rebuild it after adds, deletes and reclaims.
+    """
+    manager = DataManager(csv_file, metric="mmr", tombstone_threshold=0.5)
+    manager.retrieve_entries("I live in Boston", k=2)
+    normalized = manager.normalized_live
+    manager.retrieve_entries("hiking on weekends", k=2)
+    assert manager.normalized_live is normalized
+
+    manager.save_entry("I have a dog named Rex")
+    assert manager.retrieve_entries("I have a dog named Rex", k=1) == ["I have a dog named Rex"]
+    manager.log_change('delete', 4)
+    assert "I have a dog named Rex" not in manager.retrieve_entries("I have a dog named Rex", k=5)
+    manager.log_change('delete', 3)
+    manager.log_change('delete', 2)
+    assert manager.num_deleted == 0 and manager.normalized_live is None
+    assert sorted(manager.retrieve_entries("anything", k=5)) == ["I like hiking", "My name is Sam"]
+    rows, doc_embeddings = manager.normalized_live
+    assert list(rows) == [0, 1] and np.allclose(np.linalg.norm(doc_embeddings, axis=1), 1)
+
+def test_encode_text_uses_shared_embedding_cache(csv_file, tmp_path):
+    """
+    Test that texts missing from the in-memory cache are served from the on-disk embedding cache.
+    """
+    registry = ModelRegistry(embedding_cache_path=str(tmp_path / "embeddings.sqlite"))
+    registry.loaders["sentence-transformer"] = FakeSentenceTransformer
+    with patch('src.Operations.registry', registry):
+        first = DataManager(csv_file, metric="cosine").encode_text("Where do I live?")
+        manager = DataManager(csv_file, metric="cosine")
+        with patch.object(manager.model, 'encode', wraps=manager.model.encode) as mock_encode:
+            second = manager.encode_text("Where  do I live?")
+            assert mock_encode.call_count == 0
+    np.testing.assert_array_equal(first, second)
+    assert registry.embedding_cache().stats()["hits"] == 1
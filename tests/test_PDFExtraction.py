@@ -1,10 +1,12 @@
 import pytest
 import sys
 import os
+import json
+import pandas as pd
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
 
 from unittest.mock import patch, MagicMock
-from src.PDFExtraction import PDFExtraction
+from src.PDFExtraction import PDFExtraction, extract_pdfs
 
 def test_extract_text():
     """
@@ -37,6 +39,130 @@ def test_extract_tables():
     Test the extract_tables method of PDFExtraction class to ensure it extracts tables from a PDF file correctly.
     """
     pdf_extractor = PDFExtraction('dummy.pdf', 'output_dir')
-    with patch('pdfplumber.open', return_value=MagicMock()) as mock_pdfplumber:
+    import fitz
+    mock_page = MagicMock()
+    mock_page.get_drawings.return_value = [{"items": [("re", fitz.Rect(72, 72, 272, 112), 1)], "closePath": False}]
+    mock_page.find_tables.return_value.tables = [MagicMock(**{"extract.return_value": [["Name", "Role"], ["Sam", "Engineer"]]})]
+    mock_fitz_doc = MagicMock()
+    mock_fitz_doc.__iter__.return_value = iter([mock_page])
+    with patch('fitz.open', return_value=mock_fitz_doc) as mock_fitz:
         pdf_extractor.extract_tables()
-        assert mock_pdfplumber.called
+        assert mock_fitz.called
+    assert open(os.path.join(pdf_extractor.table_dir, "table_page1_1.csv")).read().splitlines() == ["Name,Role", "Sam,Engineer"]
+
+def make_pdf(path, pages):
+    import fitz
+    doc = fitz.open()
+    pixmap = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 8, 8), 0)
+    pixmap.clear_with(128)
+    for number in range(pages):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Page {number + 1} text")
+        page.insert_image(fitz.Rect(72, 300, 144, 372), pixmap=pixmap)
+        for i in range(3):
+            page.draw_line((72, 100 + i * 20), (272, 100 + i * 20))
+        for j in range(3):
+            page.draw_line((72 + j * 100, 100), (72 + j * 100, 140))
+        for i in range(2):
+            for j in range(2):
+                page.insert_text((80 + j * 100, 115 + i * 20), f"r{i}c{j}")
+    doc.save(path)
+
+def test_extract_all_parses_each_page_once(tmp_path):
+    """
+    Test that extract_all opens the PDF once and extracts text, images and tables from every page.
+    """
+    import fitz
+    pdf_path = str(tmp_path / "doc.pdf")
+    make_pdf(pdf_path, pages=3)
+    pdf_extractor = PDFExtraction(pdf_path, str(tmp_path / "out"))
+    with patch('fitz.open', wraps=fitz.open) as mock_fitz:
+        text_file = pdf_extractor.extract_all()
+        assert mock_fitz.call_count == 1
+    text = open(text_file, encoding="utf-8").read()
+    assert [f"Page {n} text" in text for n in (1, 2, 3)] == [True] * 3
+    assert len(json.load(open(pdf_extractor.image_manifest))) == 3
+    assert sorted(os.listdir(pdf_extractor.table_dir)) == [f"table_page{n}_1.csv" for n in (1, 2, 3)]
+    counts = pdf_extractor.extract_pages(images=False, tables=False)
+    assert (counts["pages"], counts["images"], counts["tables"]) == (3, 0, 0)
+
+def test_extract_pdfs_merges_page_ranges_in_order(tmp_path):
+    """
+    Test that extract_pdfs splits documents into page ranges across worker processes and merges
+    them into the same output as extracting each document serially.
+    """
+    pdf_paths = [str(tmp_path / "short.pdf"), str(tmp_path / "long.pdf")]
+    make_pdf(pdf_paths[0], pages=1)
+    make_pdf(pdf_paths[1], pages=5)
+    serial = extract_pdfs(pdf_paths, str(tmp_path / "serial"), max_workers=1)
+    parallel = extract_pdfs(pdf_paths, str(tmp_path / "parallel"), max_workers=2, pages_per_task=2)
+    assert [pdf_extractor.pdf_path for pdf_extractor in parallel] == pdf_paths
+    for expected, pdf_extractor in zip(serial, parallel):
+        assert open(pdf_extractor.text_file, encoding="utf-8").read() == open(expected.text_file, encoding="utf-8").read()
+        assert os.listdir(pdf_extractor.text_dir) == [os.path.basename(pdf_extractor.text_file)]
+        assert os.listdir(pdf_extractor.image_dir) == ["manifest.json"]
+        assert json.load(open(pdf_extractor.image_manifest)) == json.load(open(expected.image_manifest))
+        assert sorted(os.listdir(pdf_extractor.table_dir)) == sorted(os.listdir(expected.table_dir))
+    assert len(os.listdir(parallel[1].table_dir)) == 5
+
+def test_extract_pdfs_starts_no_more_workers_than_ranges(tmp_path):
+    """
+    Test that a single page range is extracted in-process and that the spawned pool is capped at the number of ranges.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    pdf_path = str(tmp_path / "short.pdf")
+    make_pdf(pdf_path, pages=3)
+    with patch('src.PDFExtraction.ProcessPoolExecutor') as mock_pool:
+        extract_pdfs([pdf_path], str(tmp_path / "single"), max_workers=8, pages_per_task=50)
+        assert not mock_pool.called
+    with patch('src.PDFExtraction.ProcessPoolExecutor', side_effect=ProcessPoolExecutor) as mock_pool:
+        extract_pdfs([pdf_path], str(tmp_path / "ranges"), max_workers=8, pages_per_task=2)
+        assert mock_pool.call_args.kwargs["max_workers"] == 2
+        assert mock_pool.call_args.kwargs["mp_context"].get_start_method() == "spawn"
+
+def test_repeated_images_are_stored_once(tmp_path):
+    """
+    Test that an image repeated on every page is decoded once per document, stored once across
+    documents, and that each page's manifest entry points at the stored file.
+    """
+    import fitz
+    pdf_paths = [str(tmp_path / "first.pdf"), str(tmp_path / "second.pdf")]
+    for pdf_path in pdf_paths:
+        make_pdf(pdf_path, pages=4)
+    with patch.object(fitz.Document, 'extract_image', autospec=True, side_effect=fitz.Document.extract_image) as mock_extract:
+        pdf_extractors = extract_pdfs(pdf_paths, str(tmp_path / "out"), max_workers=1)
+        assert mock_extract.call_count == 2
+    stored = os.listdir(pdf_extractors[0].image_store_dir)
+    assert len(stored) == 1
+    for pdf_extractor in pdf_extractors:
+        manifest = json.load(open(pdf_extractor.image_manifest))
+        assert sorted(manifest) == ["1", "2", "3", "4"]
+        for page_images in manifest.values():
+            assert [os.path.normpath(os.path.join(pdf_extractor.image_dir, path)) for path in page_images] == [os.path.join(pdf_extractor.image_store_dir, stored[0])]
+
+def test_table_precheck_skips_pages_without_ruling_lines(tmp_path):
+    """
+    Test that the table finder only runs on pages with ruling lines, and that the tables found
+    are the same as without the pre-check.
+    """
+    import fitz
+    pdf_path = str(tmp_path / "mixed.pdf")
+    make_pdf(pdf_path, pages=2)
+    doc = fitz.open(pdf_path)
+    for number in range(3):
+        doc.new_page().insert_text((72, 72), f"Plain page {number}")
+    doc.saveIncr()
+    doc.close()
+    pdf_extractor = PDFExtraction(pdf_path, str(tmp_path / "out"))
+    with patch.object(fitz.Page, 'find_tables', autospec=True, side_effect=fitz.Page.find_tables) as mock_find_tables:
+        counts = pdf_extractor.extract_pages(text=False, images=False)
+        assert mock_find_tables.call_count == 2
+    assert (counts["tables"], counts["table_pages"], counts["table_pages_skipped"]) == (2, 2, 3)
+    expected = {}
+    for page_number, page in enumerate(fitz.open(pdf_path)):
+        for j, table in enumerate(page.find_tables().tables):
+            rows = table.extract()
+            expected[f"table_page{page_number+1}_{j+1}.csv"] = pd.DataFrame(rows[1:], columns=rows[0]).to_csv(index=False)
+    assert {name: open(os.path.join(pdf_extractor.table_dir, name)).read() for name in os.listdir(pdf_extractor.table_dir)} == expected
+    assert not pdf_extractor.looks_tabular([{"items": [("l", fitz.Point(0, 0), fitz.Point(100, 0))], "closePath": False}])
+    assert pdf_extractor.looks_tabular([{"items": [("l", fitz.Point(0, 0), fitz.Point(100, 0)), ("l", fitz.Point(100, 0), fitz.Point(100, 50)), ("l", fitz.Point(100, 50), fitz.Point(0, 50))], "closePath": True}])
@@ -0,0 +1,76 @@
+import pytest
+import sys
+import os
+import random
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from src.TextChunker import TextChunker
+
+def random_text(seed, separator, size=5000):
+    rng = random.Random(seed)
+    words = []
+    while sum(len(word) + 1 for word in words) < size:
+        choice = rng.random()
+        if choice < 0.05:
+            # Repeated separators, stray whitespace and words longer than a chunk
+            words.append(rng.choice(["", " ", "\n", "x" * 350]))
+        else:
+            words.append("".join(rng.choice("abcdefghij") for _ in range(rng.randint(1, 12))))
+    return separator.join(words)
+
+def test_split_text_small_example():
+    """
+    Test the size and overlap semantics on a small example.
+    """
+    chunker = TextChunker(chunk_size=10, chunk_overlap=4, separator=" ")
+    assert chunker.split_text("aa bb cc dd ee ff") == ["aa bb cc", "cc dd ee", "ee ff"]
+    assert chunker.split_text("   ") == []
+
+@pytest.mark.parametrize("separator", [" ", "\n"])
+def test_matches_character_text_splitter(separator):
+    """
+    Test that chunks match langchain's CharacterTextSplitter on the ingestion settings.
+    """
+    splitters = pytest.importorskip("langchain_text_splitters")
+    for seed in range(5):
+        text = random_text(seed, separator)
+        expected = splitters.CharacterTextSplitter(chunk_size=300, chunk_overlap=100, separator=separator).split_text(text)
+        assert TextChunker(300, 100, separator).split_text(text) == expected
+
+@pytest.mark.parametrize("separator", [" ", "\n\n"])
+def test_streamed_blocks_match_whole_text_with_offsets(separator):
+    """
+    Test that splitting a stream of blocks gives the same chunks as the whole text, with offsets into it.
+    """
+    text = random_text(7, separator)
+    while separator * 2 in text:
+        text = text.replace(separator * 2, separator)
+    chunker = TextChunker(300, 100, separator)
+    blocks = [text[i:i + 37] for i in range(0, len(text), 37)]
+    chunks = list(chunker.iter_chunks(blocks))
+    assert [chunk for chunk, _, _ in chunks] == chunker.split_text(text)
+    for chunk, start, end in chunks:
+        assert text[start:end].strip() == chunk
+
+class FakeTokenizer:
+    def num_special_tokens_to_add(self):
+        return 2
+
+    def encode(self, text, add_special_tokens=False):
+        # One token per 3 characters of each word
+        return [0] * sum((len(word) + 2) // 3 for word in text.split())
+
+class FakeModel:
+    tokenizer = FakeTokenizer()
+    max_seq_length = 12
+
+def test_token_aware_chunks_fit_the_model():
+    """
+    Test that token-aware chunks fit the model's max sequence length once special tokens are added.
+    """
+    chunker = TextChunker.for_model(FakeModel(), separator=" ")
+    assert chunker.chunk_size == 10 and chunker.chunk_overlap == 3
+    assert chunker.settings()["length"] == "tokens"
+    chunks = chunker.split_text(random_text(3, " ", size=1000).replace("x" * 350, "x"))
+    assert len(chunks) > 10
+    assert all(len(FakeTokenizer().encode(chunk)) <= 10 for chunk in chunks)
@@ -0,0 +1,145 @@
+import pytest
+import sys
+import os
+import zlib
+import numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from unittest.mock import patch, MagicMock
+from src.TextProcessor import TextProcessor
+from src.TextChunker import TextChunker
+from src.EmbeddingStore import EmbeddingStore
+from src.Manifest import Manifest
+from src.ModelRegistry import ModelRegistry
+from src.Operations import DataManager
+
+class FakeSentenceTransformer:
+    """
+    Deterministic stand-in for SentenceTransformer that embeds texts by hashing them.
+    """
+    def __init__(self, *args, **kwargs):
+        self.calls = []
+
+    def get_sentence_embedding_dimension(self):
+        return 8
+
+    def encode(self, texts, **kwargs):
+        self.calls.append(list(texts))
+        return np.stack([np.random.default_rng(zlib.crc32(t.encode())).standard_normal(8) for t in texts]).astype(np.float32)
+
+@pytest.fixture
+def processor():
+    registry = ModelRegistry(embedding_cache_path=None)
+    registry.loaders["sentence-transformer"] = FakeSentenceTransformer
+    with patch('src.TextProcessor.registry', registry), patch('src.Operations.registry', registry):
+        yield TextProcessor(batch_size=16)
+
+def write_words(path, prefix, count):
+    path.write_text(" ".join(f"{prefix}{i}" for i in range(count)), encoding="utf-8")
+
+def test_process_directory_embeds_only_changed_files(processor, tmp_path):
+    """
+    Test that re-processing embeds only new or changed files, drops the chunks of deleted files and keeps the other IDs.
+    """
+    write_words(tmp_path / "a.txt", "alpha", 200)
+    write_words(tmp_path / "b.txt", "beta", 200)
+    assert processor.process_directory(str(tmp_path)) > 0
+    store = EmbeddingStore(str(tmp_path / "total_profile_data"))
+    before, _ = store.load()
+    assert processor.process_directory(str(tmp_path)) == 0
+
+    (tmp_path / "b.txt").unlink()
+    write_words(tmp_path / "c.txt", "gamma", 50)
+    processor.model.calls.clear()
+    count = processor.process_directory(str(tmp_path))
+    assert count == sum(len(call) for call in processor.model.calls)
+    assert all(text.startswith("gamma") for call in processor.model.calls for text in call)
+
+    after, embeddings = store.load()
+    alpha = before[before['Text'].str.startswith("alpha")]
+    assert after.loc[alpha.index, 'Text'].equals(alpha['Text'])
+    assert not after['Text'].str.startswith("beta").any()
+    assert after.index.is_unique and len(embeddings) == len(after)
+
+def test_chunk_offsets_are_recorded(processor, tmp_path):
+    """
+    Test that the manifest records where in its file each chunk came from, and chunks match the splitter.
+    """
+    write_words(tmp_path / "a.txt", "word", 300)
+    processor.process_directory(str(tmp_path))
+    df, _ = EmbeddingStore(str(tmp_path / "total_profile_data")).load()
+    manifest = Manifest(str(tmp_path / "total_profile_data.manifest.json"))
+    manifest.load()
+    text = (tmp_path / "a.txt").read_text(encoding="utf-8")
+    assert list(df['Text']) == TextChunker(300, 100, " ").split_text(text)
+    for entry_id, chunk in df['Text'].items():
+        key, start, end = manifest.source(entry_id)
+        assert key == "a.txt" and text[start:end] == chunk
+
+class FakePoolSentenceTransformer(FakeSentenceTransformer):
+    """
+    FakeSentenceTransformer with a mocked multi-process pool that returns float64 lists, as the real pool may.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self.pool_threads = None
+        self.start_multi_process_pool = MagicMock(side_effect=self.start_pool)
+        self.stop_multi_process_pool = MagicMock()
+
+    def start_pool(self, devices):
+        self.pool_threads = os.environ.get("OMP_NUM_THREADS")
+        return {"devices": devices}
+
+    def encode(self, texts, pool=None, **kwargs):
+        embeddings = super().encode(texts)
+        return [embedding.astype(np.float64) for embedding in embeddings] if pool else embeddings
+
+def test_multi_process_encoding_matches_single_process(monkeypatch):
+    """
+    Test that num_workers > 1 encodes in the pool with the configured batch and chunk sizes, restores
+    OMP_NUM_THREADS, stops the pool on close, and returns the same float32 matrix as one process.
+    """
+    registry = ModelRegistry(embedding_cache_path=None)
+    registry.loaders["sentence-transformer"] = FakePoolSentenceTransformer
+    monkeypatch.setenv("OMP_NUM_THREADS", "7")
+    texts = [f"chunk {i}" for i in range(10)]
+    with patch('src.TextProcessor.registry', registry):
+        single = TextProcessor(num_workers=1).encode_texts(texts)
+        processor = TextProcessor(num_workers=2, encode_batch_size=4)
+        with patch.object(processor.model, 'encode', wraps=processor.model.encode) as mock_encode:
+            embeddings = processor.encode_texts(texts)
+    pool = processor.pool
+    assert mock_encode.call_args.kwargs == {"pool": pool, "batch_size": 4, "chunk_size": 4}
+    assert processor.model.start_multi_process_pool.call_args.args == (["cpu", "cpu"],)
+    assert processor.model.pool_threads == str(max(1, (os.cpu_count() or 1) // 2))
+    assert os.environ["OMP_NUM_THREADS"] == "7"
+    assert isinstance(embeddings, np.ndarray) and embeddings.dtype == np.float32
+    np.testing.assert_array_equal(embeddings, single)
+
+    processor.close()
+    processor.model.stop_multi_process_pool.assert_called_once_with(pool)
+    assert processor.pool is None
+    processor.close()
+    processor.model.stop_multi_process_pool.assert_called_once()
+
+def test_reprocessing_folds_uncompacted_log_into_store(processor, tmp_path):
+    """
+    Test that re-processing after a session that logged changes without compacting them keeps
+    both the logged entries and the new chunks, instead of reusing the logged IDs for new chunks.
+    """
+    (tmp_path / "first_summary.txt").write_text("I live in Boston", encoding="utf-8")
+    processor.process_profile(str(tmp_path))
+    store_path = str(tmp_path / "summary_profile")
+    manager = DataManager(store_path, metric="cosine")
+    manager.log_change('add', manager.next_id(), "I have a dog named Rex", processor.encode_texts(["I have a dog named Rex"])[0])
+    manager.log_change('delete', 0)
+    manager.wal.close()
+
+    (tmp_path / "second_summary.txt").write_text("new document summary", encoding="utf-8")
+    processor.process_profile(str(tmp_path))
+    df, embeddings = EmbeddingStore(store_path).load()
+    assert df.index.is_unique and len(embeddings) == len(df)
+    reloaded = DataManager(store_path, metric="cosine")
+    live = reloaded.df[~reloaded.df['Deleted']]
+    assert sorted(live['Text']) == ["I have a dog named Rex", "new document summary"]
+    assert not os.path.exists(f"{store_path}.wal")
@@ -0,0 +1,118 @@
+import pytest
+import sys
+import os
+import numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from unittest.mock import patch
+from src.VectorIndex import VectorIndex
+
+DIM = 16
+
+@pytest.fixture
+def embeddings():
+    return np.random.default_rng(0).standard_normal((2000, DIM)).astype(np.float32)
+
+@pytest.mark.parametrize("index_type", ["flat", "hnsw", "ivf_flat", "ivf_pq"])
+def test_add_update_remove_and_search(embeddings, index_type):
+    """
+    Test that every index type finds entries by ID and reflects updates and removals.
+    """
+    ids = np.arange(100, 100 + len(embeddings))
+    index = VectorIndex.build(ids, embeddings, DIM, "cosine", index_type, params={"nprobe": 64, "pq_m": 4, "pq_nbits": 4})
+    assert index.index_type == index_type
+    assert index.search(embeddings[5], 1)[1][0][0] == 105
+
+    index.update([105], embeddings[7])
+    index.remove([110])
+    assert len(index) == len(embeddings) - 1
+    assert 110 not in set(index.ids())
+    found = set(index.search(embeddings[7], 2)[1][0])
+    assert {105, 107} == found or index_type == "ivf_pq"
+    assert 110 not in set(index.search(embeddings[10], 5)[1][0])
+
+def test_hnsw_masks_entries_until_rebuilt(embeddings):
+    """
+    Test that HNSW, which cannot remove vectors, masks removed entries and refuses to save until rebuilt.
+    """
+    index = VectorIndex.build(np.arange(len(embeddings)), embeddings, DIM, "l2", "hnsw")
+    index.remove([3])
+    assert not index.is_clean()
+    assert 3 not in index.search(embeddings[3], 3)[1][0]
+    with pytest.raises(ValueError):
+        index.save("unused.faiss")
+
+def test_auto_index_type_by_size():
+    """
+    Test that 'auto' stays exact below the ANN threshold, switches to the ANN index above it, and only switches back well below it.
+    """
+    with patch('src.VectorIndex.ANN_THRESHOLD', 1000), patch('src.VectorIndex.ANN_INDEX_TYPE', "ivf_flat"):
+        assert VectorIndex.resolve_index_type("auto", 999) == "flat"
+        assert VectorIndex.resolve_index_type("auto", 1000) == "ivf_flat"
+        assert VectorIndex.resolve_index_type("auto", 800, current_type="ivf_flat") == "ivf_flat"
+        assert VectorIndex.resolve_index_type("auto", 799, current_type="ivf_flat") == "flat"
+        assert VectorIndex.resolve_index_type("auto", 999, current_type="flat") == "flat"
+    with pytest.raises(ValueError):
+        VectorIndex.resolve_index_type("lsh", 10)
+
+def test_save_load_keeps_type_and_search_params(embeddings, tmp_path):
+    """
+    Test that a saved ANN index is reloaded with its type and the configured search parameters.
+    """
+    path = str(tmp_path / "profile.ip.faiss")
+    VectorIndex.build(np.arange(len(embeddings)), embeddings, DIM, "cosine", "ivf_flat").save(path)
+    index = VectorIndex.load(path, "cosine", params={"nprobe": 7})
+    assert index.index_type == "ivf_flat"
+    assert index.params["nprobe"] == 7
+    assert len(index) == len(embeddings)
+
+@pytest.mark.parametrize("index_type, quantization", [("flat", "fp16"), ("flat", "int8"), ("flat", "pq"), ("hnsw", "int8"), ("ivf_flat", "int8")])
+def test_quantized_index_with_rescoring(embeddings, index_type, quantization, tmp_path):
+    """
+    Test that quantized indexes keep their compression across save/load and that rescoring restores exact results.
+    """
+    ids = np.arange(len(embeddings))
+    params = {"quantization": quantization, "pq_m": 4, "pq_nbits": 4, "nprobe": 64}
+    index = VectorIndex.build(ids, embeddings, DIM, "l2", index_type, params=params)
+    assert (index.index_type, index.quantization) == (index_type, quantization)
+    path = str(tmp_path / "profile.l2.faiss")
+    index.save(path)
+    index = VectorIndex.load(path, "l2", params=params)
+    assert index.quantization == quantization
+
+    exact = VectorIndex.build(ids, embeddings, DIM, "l2", "flat")
+    queries = embeddings[:20] + 0.1
+    _, candidates = index.search(queries, 100)
+    distances, found = index.rescore(queries, candidates, embeddings[candidates], 5)
+    expected_distances, expected = exact.search(queries, 5)
+    assert np.mean([len(set(a) & set(b)) / 5 for a, b in zip(found, expected)]) >= 0.9
+    np.testing.assert_allclose(distances[found == expected], expected_distances[found == expected], rtol=1e-4)
+
+def test_flat_pq_filters_removed_entries(embeddings):
+    """
+    Test that a flat PQ index, which takes no FAISS search parameters, drops removed entries from searches.
+    """
+    index = VectorIndex.build(np.arange(len(embeddings)), embeddings, DIM, "l2", "flat", params={"quantization": "pq", "pq_m": 4, "pq_nbits": 4})
+    index.remove(np.arange(0, 2000, 2))
+    distances, ids = index.search(embeddings[:10], 5)
+    assert ids.shape == (10, 5)
+    assert not np.any(ids % 2 == 0)
+
+def test_pq_falls_back_to_float32_below_training_size():
+    """
+    Test that 'pq' builds an uncompressed index when there are too few vectors to train the codebooks.
+    """
+    embeddings = np.random.default_rng(1).standard_normal((1, DIM)).astype(np.float32)
+    index = VectorIndex.build([7], embeddings, DIM, "cosine", "flat", params={"quantization": "pq"})
+    assert (index.index_type, index.quantization) == VectorIndex.layout("flat", 1, {"quantization": "pq"}) == ("flat", None)
+    assert index.search(embeddings[0], 1)[1][0][0] == 7
+
+def test_ivf_flat_with_pq_is_rejected():
+    """
+    Test that PQ quantization of an IVF-Flat index is rejected in favour of the 'ivf_pq' index type.
+    """
+    with pytest.raises(ValueError):
+        VectorIndex.validate("ivf_flat", {"quantization": "pq"})
+    with patch('src.VectorIndex.ANN_INDEX_TYPE', "ivf_flat"), pytest.raises(ValueError):
+        VectorIndex.validate("auto", {"quantization": "pq"})
+    VectorIndex.validate("ivf_pq", {"quantization": "pq"})
@@ -0,0 +1,57 @@
+import pytest
+import sys
+import os
+import torch
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from transformers import BartConfig, BartForSequenceClassification
+from src.ZeroShotClassifier import ZeroShotClassifier
+
+class WordTokenizer:
+    """
+    Minimal stand-in for a BART tokenizer: <s> premise </s></s> hypothesis </s>, padded with 1.
+    """
+    def __call__(self, premises, hypotheses, return_tensors="pt", padding=True, truncation=None):
+        rows = [[0] + [3 + len(word) % 60 for word in premise.split()] + [2, 2] + [3 + len(word) % 60 for word in hypothesis.split()] + [2]
+                for premise, hypothesis in zip(premises, hypotheses)]
+        width = max(len(row) for row in rows)
+        input_ids = torch.tensor([row + [1] * (width - len(row)) for row in rows])
+        return {"input_ids": input_ids, "attention_mask": (input_ids != 1).long()}
+
+@pytest.fixture(scope="module")
+def model():
+    torch.manual_seed(0)
+    config = BartConfig(vocab_size=64, d_model=16, encoder_layers=1, decoder_layers=1, encoder_attention_heads=2, decoder_attention_heads=2,
+                        encoder_ffn_dim=32, decoder_ffn_dim=32, max_position_embeddings=64,
+                        id2label={0: "contradiction", 1: "neutral", 2: "entailment"}, label2id={"contradiction": 0, "neutral": 1, "entailment": 2})
+    return BartForSequenceClassification(config).eval()
+
+LABELS = ['save', 'question', 'update', 'delete', 'suggestion', 'emotion']
+
+def test_labels_are_scored_in_one_forward_pass(model):
+    """
+    Test that every candidate label is scored in a single batched forward pass with pipeline-style output.
+    """
+    classifier = ZeroShotClassifier("tiny-bart", "torch", tokenizer=WordTokenizer(), model=model)
+    with torch.no_grad():
+        handle = model.register_forward_hook(lambda module, args, output: calls.append(1))
+        calls = []
+        result = classifier("Please remember my birthday", LABELS)
+        handle.remove()
+    assert calls == [1]
+    assert sorted(result['labels']) == sorted(LABELS)
+    assert result['scores'] == sorted(result['scores'], reverse=True)
+    assert abs(sum(result['scores']) - 1) < 1e-5
+    assert all(0 <= score <= 1 for score in classifier("Please remember", LABELS[:2], multi_label=True)['scores'])
+
+@pytest.mark.parametrize("backend", ["torch-int8", "onnx", "onnx-int8"])
+def test_accelerated_backends_match_torch(model, backend, tmp_path):
+    """
+    Test that the quantized and ONNX backends score labels like the float32 model.
+    """
+    reference = ZeroShotClassifier("tiny-bart", "torch", tokenizer=WordTokenizer(), model=model)
+    classifier = ZeroShotClassifier("tiny-bart", backend, cache_dir=str(tmp_path), tokenizer=WordTokenizer(), model=model)
+    for text in ["Please remember my birthday", "Where do I live now?"]:
+        expected = reference(text, LABELS)
+        result = classifier(text, LABELS)
+        assert dict(zip(result['labels'], result['scores'])) == pytest.approx(dict(zip(expected['labels'], expected['scores'])), abs=0.02)